@@ -1,6 +1,8 @@
 #ifndef _RGB_H_
 #define _RGB_H_
 
+#include <stdint.h>
+
 void rgb_init(void);
 void rgb_mode_idle(void);
 void rgb_mode_done(void);
@@ -8,4 +10,13 @@ void rgb_mode_writing(void);
 void rgb_mode_error(void);
 void rgb_wheel(unsigned char);
 
+// Keyframe colours are 0xBBGGRR
+#define RGB_KEYFRAME_FADE (1 << 16)
+#define RGB_KEYFRAME_LAST (1 << 17)
+#define RGB_KEYFRAME_HOLD (1 << 18)
+
+void rgb_pattern_begin(unsigned int pattern, unsigned int first);
+void rgb_pattern_keyframe(uint32_t colour, unsigned int ms, uint32_t flags);
+void rgb_pattern_play(unsigned int pattern);
+
 #endif /* _RGB_H_ */
\ No newline at end of file
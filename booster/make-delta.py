@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Turn a Booster image into a delta update.
+
+Booster normally reads back every erase block of the running image and
+compares it against the new one before deciding whether to rewrite it.
+When the image that is currently installed is known ahead of time (for
+example when upgrading between two releases), the list of changed blocks
+can be computed on the host instead.  This script compares the old release
+multiboot image against the image embedded in an installable Booster image
+produced by `make-booster`, and records the result in the Booster header:
+
+    base_hash   XXH32 of the old image as it sits on flash
+    delta_map   Bitmap of erase blocks that need to be rewritten
+
+Booster only trusts `delta_map` if `base_hash` matches what is actually on
+flash.  Otherwise it falls back to comparing every block, so applying a
+delta to the wrong device is harmless.
+
+The payload still carries the full new image, since the FPGA boots it from
+0x40000 in order to run Booster, and it serves as the fallback if power is
+lost while the update is running.
+"""
+
+import argparse
+import struct
+import sys
+
+BOOSTER_SIGNATURE = 0xfaa999b1
+BOOSTER_SEED = 0xc38b9e66
+
+# The new image always lives at the start of the installable image, and is
+# padded out to this length.  Booster itself follows it.
+IMAGE_SIZE = 0x1a000
+ERASE_SIZE = 4096
+
+# Offsets of the Booster header fields, relative to the start of Booster
+HEADER_FORMAT = "<IIIIIIIIII"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+CHECKSUM_START = 0x20
+CHECKSUM_OFFSET = 12
+BASE_HASH_OFFSET = 32
+DELTA_MAP_OFFSET = 36
+
+PRIME32_1 = 0x9E3779B1
+PRIME32_2 = 0x85EBCA77
+PRIME32_3 = 0xC2B2AE3D
+PRIME32_4 = 0x27D4EB2F
+PRIME32_5 = 0x165667B1
+
+def _rotl32(x, r):
+    return ((x << r) | (x >> (32 - r))) & 0xffffffff
+
+def xxh32(data, seed=0):
+    """Compute the 32-bit xxHash of `data`, as done by `XXH32()` on the device"""
+    length = len(data)
+    offset = 0
+    if length >= 16:
+        v1 = (seed + PRIME32_1 + PRIME32_2) & 0xffffffff
+        v2 = (seed + PRIME32_2) & 0xffffffff
+        v3 = seed & 0xffffffff
+        v4 = (seed - PRIME32_1) & 0xffffffff
+        limit = length - 16
+        while offset <= limit:
+            w1, w2, w3, w4 = struct.unpack_from("<IIII", data, offset)
+            v1 = (_rotl32((v1 + w1 * PRIME32_2) & 0xffffffff, 13) * PRIME32_1) & 0xffffffff
+            v2 = (_rotl32((v2 + w2 * PRIME32_2) & 0xffffffff, 13) * PRIME32_1) & 0xffffffff
+            v3 = (_rotl32((v3 + w3 * PRIME32_2) & 0xffffffff, 13) * PRIME32_1) & 0xffffffff
+            v4 = (_rotl32((v4 + w4 * PRIME32_2) & 0xffffffff, 13) * PRIME32_1) & 0xffffffff
+            offset += 16
+        h32 = (_rotl32(v1, 1) + _rotl32(v2, 7) + _rotl32(v3, 12) + _rotl32(v4, 18)) & 0xffffffff
+    else:
+        h32 = (seed + PRIME32_5) & 0xffffffff
+
+    h32 = (h32 + length) & 0xffffffff
+
+    while offset + 4 <= length:
+        (w,) = struct.unpack_from("<I", data, offset)
+        h32 = (_rotl32((h32 + w * PRIME32_3) & 0xffffffff, 17) * PRIME32_4) & 0xffffffff
+        offset += 4
+
+    while offset < length:
+        h32 = (_rotl32((h32 + data[offset] * PRIME32_5) & 0xffffffff, 11) * PRIME32_1) & 0xffffffff
+        offset += 1
+
+    h32 ^= h32 >> 15
+    h32 = (h32 * PRIME32_2) & 0xffffffff
+    h32 ^= h32 >> 13
+    h32 = (h32 * PRIME32_3) & 0xffffffff
+    h32 ^= h32 >> 16
+    return h32
+
+def flash_contents(image, length):
+    """Return `length` bytes of flash as they look after `image` was installed.
+
+    Booster only programs the bytes of the image itself, so anything past the
+    end of it is left in the erased (0xff) state."""
+    image = image[:length]
+    return image + b'\xff' * (length - len(image))
+
+def changed_blocks(old_image, new_image, length):
+    """Return a bitmap of the erase blocks that differ within the first `length` bytes"""
+    old_flash = flash_contents(old_image, length)
+    delta_map = 0
+    for block, offset in enumerate(range(0, length, ERASE_SIZE)):
+        end = min(offset + ERASE_SIZE, length)
+        if old_flash[offset:end] != new_image[offset:end]:
+            delta_map |= 1 << block
+    # Block 0 carries the patched boot address, so it is always written.
+    return delta_map | 1
+
+def make_delta(old_image, installable):
+    installable = bytearray(installable)
+    if len(installable) < IMAGE_SIZE + HEADER_SIZE + 4:
+        raise ValueError("installable image is too short to contain Booster")
+
+    (_, signature, booster_size, _, image_length, hash_length, image_seed, _, _, _) = \
+        struct.unpack_from(HEADER_FORMAT, installable, IMAGE_SIZE)
+    if signature != BOOSTER_SIGNATURE:
+        raise ValueError("no Booster signature found (got 0x{:08x})".format(signature))
+    if hash_length + 4 != len(installable):
+        raise ValueError("hash length {} doesn't match file size {}".format(hash_length, len(installable)))
+    if image_length > IMAGE_SIZE:
+        raise ValueError("image length {} is too large".format(image_length))
+    (expected_hash,) = struct.unpack_from("<I", installable, hash_length)
+    if xxh32(bytes(installable[:hash_length]), image_seed) != expected_hash:
+        raise ValueError("installable image hash mismatch -- is the file corrupt?")
+    if 32 * ERASE_SIZE < image_length:
+        raise ValueError("image has more erase blocks than fit in the delta map")
+
+    delta_map = changed_blocks(old_image, installable, image_length)
+    base_hash = xxh32(flash_contents(old_image, image_length), image_seed)
+
+    booster = IMAGE_SIZE
+    struct.pack_into("<I", installable, booster + BASE_HASH_OFFSET, base_hash)
+    struct.pack_into("<I", installable, booster + DELTA_MAP_OFFSET, delta_map)
+
+    # Both new fields are covered by the checksum Foboot uses to validate
+    # Booster, as well as by the overall image hash.
+    booster_sum = sum(installable[booster + CHECKSUM_START:booster + booster_size]) & 0xffffffff
+    struct.pack_into("<I", installable, booster + CHECKSUM_OFFSET, booster_sum)
+    struct.pack_into("<I", installable, hash_length, xxh32(bytes(installable[:hash_length]), image_seed))
+    return (bytes(installable), delta_map)
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert a Booster image into a delta update")
+    parser.add_argument("old", help="multiboot image currently installed on the device")
+    parser.add_argument("infile", help="installable image generated by make-booster")
+    parser.add_argument("outfile", help="delta image to write")
+    args = parser.parse_args()
+
+    with open(args.old, "rb") as f:
+        old_image = f.read()
+    with open(args.infile, "rb") as f:
+        installable = f.read()
+
+    try:
+        (delta, delta_map) = make_delta(old_image, installable)
+    except ValueError as e:
+        print("Error: {}".format(e), file=sys.stderr)
+        return 1
+
+    with open(args.outfile, "wb") as f:
+        f.write(delta)
+
+    blocks = bin(delta_map).count("1")
+    print("Delta image written to \"{}\".  {} erase blocks to update (map 0x{:08x})".format(
+        args.outfile, blocks, delta_map))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
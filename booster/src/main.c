@@ -12,11 +12,14 @@ extern uint32_t image_length;
 extern uint32_t hash_length;
 extern uint32_t image_seed;
 extern uint32_t spi_id;
+extern uint32_t base_hash;
+extern uint32_t delta_map;
 
 extern struct booster_data booster_src;
 uint32_t read_spi_id;
 uint32_t cached_image_length;
 uint32_t cached_spi_id;
+uint32_t cached_delta_map;
 
 // Note: This multiboot reference has the initial image
 // booting to offset 0x40000, which is where the recovery
@@ -132,8 +135,22 @@ volatile enum error_code error_code;
 __attribute__((noreturn)) static void error(enum error_code code)
 {
     error_code = code;
+#ifdef CSR_RGB_SEQ_PLAY_ADDR
+    // Load the blink pattern into the LED sequencer, which then plays it
+    // without any help.
+    int i;
+    rgb_ctrl_write((1 << CSR_RGB_CTRL_CURREN_OFFSET) | (1 << CSR_RGB_CTRL_RGBLEDEN_OFFSET));
+    rgb_pattern_begin(0, 0);
+    for (i = 0; i < 3; i++) {
+        int ms = 500 * (((int)code >> i) & 1) + 250;
+        rgb_pattern_keyframe(0x0000ff, ms, 0);
+        rgb_pattern_keyframe(0x000000, ms + (i == 2 ? 1000 : 0), i == 2 ? RGB_KEYFRAME_LAST : 0);
+    }
+    rgb_pattern_play(0);
+#else
     rgb_ctrl_write((1 << CSR_RGB_CTRL_CURREN_OFFSET) | (1 << CSR_RGB_CTRL_RGBLEDEN_OFFSET)
       | (1 << CSR_RGB_CTRL_RRAW_OFFSET) | (1 << CSR_RGB_CTRL_GRAW_OFFSET) | (1 << CSR_RGB_CTRL_BRAW_OFFSET));
+#endif
     erase_booster();
     ftfl_busy_wait();
 
@@ -142,6 +159,10 @@ __attribute__((noreturn)) static void error(enum error_code code)
     // which might happen if it's installed on an incorrect device.
     usb_connect();
 
+#ifdef CSR_RGB_SEQ_PLAY_ADDR
+    while (1)
+        ;
+#else
     // Blink a pattern depending on the error code
     while(1) {
         int i;
@@ -153,6 +174,7 @@ __attribute__((noreturn)) static void error(enum error_code code)
         }
         msleep(1000);
     }
+#endif
 }
 
 void isr(void)
@@ -211,6 +233,16 @@ __attribute__((noreturn)) void fobooster_main(void)
         }
     }
 
+    // If this is a delta payload, make sure the flash still contains the image
+    // the delta was generated against.  If it doesn't (for example because a
+    // previous update was interrupted), fall back to comparing every block.
+    // Block 0 always gets rewritten, since it carries the patched boot address.
+    cached_delta_map = 0;
+    if (delta_map && (XXH32((const void *)0x20000000, image_length, image_seed) == base_hash))
+    {
+        cached_delta_map = delta_map | 1;
+    }
+
     // Now that everything is copied to RAM, disable memory-mapped SPI mode.
     // This puts the SPI into bit-banged mode, which allows us to write to it.
     cached_spi_id = spi_id; // Copy spi_id over first, since it is still on the flash.
@@ -242,13 +274,25 @@ __attribute__((noreturn)) void fobooster_main(void)
     while (bytes_left && (target_addr < 131072))
     {
         // Check to see if the sector has changed -- don't do anything if it hasn't.
-        spi_bb_disable();
-        memcpy(check_block, (void *)(target_addr + 0x20000000), SPI_ERASE_SECTOR_SIZE);
-        spi_bb_enable();
-        if (!memcmp(check_block, current_ptr, SPI_ERASE_SECTOR_SIZE)) {
+        // Delta payloads already list the changed sectors, so there's no need to
+        // read them back.
+        bool unchanged;
+        if (cached_delta_map) {
+            unchanged = !(cached_delta_map & (1 << (target_addr / SPI_ERASE_SECTOR_SIZE)));
+        }
+        else {
+            spi_bb_disable();
+            memcpy(check_block, (void *)(target_addr + 0x20000000), SPI_ERASE_SECTOR_SIZE);
+            spi_bb_enable();
+            unchanged = !memcmp(check_block, current_ptr, SPI_ERASE_SECTOR_SIZE);
+        }
+        if (unchanged) {
             current_ptr += SPI_ERASE_SECTOR_SIZE;
             target_addr += SPI_ERASE_SECTOR_SIZE;
-            bytes_left  -= SPI_ERASE_SECTOR_SIZE;
+            if (bytes_left > SPI_ERASE_SECTOR_SIZE)
+                bytes_left -= SPI_ERASE_SECTOR_SIZE;
+            else
+                bytes_left = 0;
             continue;
         }
 
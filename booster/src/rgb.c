@@ -122,3 +122,24 @@ void rgb_init(void)
 
     rgb_mode_writing();
 }
+
+#ifdef CSR_RGB_SEQ_PLAY_ADDR
+// Patterns are played by the sequencer in the RGB block, so once one has
+// been started the CPU is free to do other work.
+void rgb_pattern_begin(unsigned int pattern, unsigned int first)
+{
+    rgb_seq_define_write((pattern << 16) | first);
+    rgb_seq_address_write(first);
+}
+
+void rgb_pattern_keyframe(uint32_t colour, unsigned int ms, uint32_t flags)
+{
+    rgb_seq_colour_write(colour);
+    rgb_seq_timing_write((ms & 0xffff) | flags);
+}
+
+void rgb_pattern_play(unsigned int pattern)
+{
+    rgb_seq_play_write((1 << 7) | pattern);
+}
+#endif
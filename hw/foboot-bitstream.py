@@ -37,9 +37,20 @@ import argparse
 import os
 import subprocess
 
+from util import resourcereport
+
 from rtl.version import Version
 from rtl.romgen import RandomFirmwareROM, FirmwareROMHex
 from rtl.messible import Messible
+from rtl.flashcache import FlashCache
+from rtl.spiprogrammer import SpiProgrammer
+from rtl.wbdma import WishboneDMA
+from rtl.hashaccel import HashAccelerator
+from rtl.wbcrossbar import WishboneCrossbar
+from rtl.perfcounters import PerfCounters
+from rtl.pcsampler import PCSampler
+from rtl.usblogger import USBLogger
+from rtl.ledsequencer import LEDSequencer
         
 
 
@@ -75,6 +86,15 @@ class BaseSoC(SoCCore, AutoDoc):
         "lxspi":          15,
         "messible":       16,
         "button":         17,
+        "flash_cache":    18,
+        "spi_programmer": 19,
+        "dma":            20,
+        "hash":           21,
+        "crossbar":       22,
+        "perf":           23,
+        "pcsampler":      24,
+        "usblogger":      25,
+        "analyzer":       26,
     }
 
     SoCCore.mem_map = {
@@ -82,13 +102,31 @@ class BaseSoC(SoCCore, AutoDoc):
         "sram":             0x10000000,  # (default shadow @0xa0000000)
         "spiflash":         0x20000000,  # (default shadow @0xa0000000)
         "main_ram":         0x40000000,  # (default shadow @0xc0000000)
+        "messible":         0x60000000,
+        "pcsampler":        0x70000000,
+        "usblogger":        0x71000000,
         "csr":              0xe0000000,  # (default shadow @0xe0000000)
         "vexriscv_debug":   0xf00f0000,
     }
 
+    # Every interrupt the SoC can have, so that collisions show up here.
+    # Blocks that always exist with an event manager go into interrupt_map.
+    # The rest are registered at the end of __init__(), if the build has
+    # them and they have an event manager, since LiteX refuses an interrupt
+    # for a module without one.
+    interrupts = {
+        "timer0":         2,
+        "usb":            3,
+        "spi_programmer": 4,
+        "dma":            5,
+        "hash":           6,
+        "messible":       7,
+        "touch":          8,
+        "button":         9,
+    }
     interrupt_map = {
-        "timer0": 2,
-        "usb": 3,
+        "timer0": interrupts["timer0"],
+        "usb":    interrupts["usb"],
     }
     interrupt_map.update(SoCCore.interrupt_map)
 
@@ -97,17 +135,27 @@ class BaseSoC(SoCCore, AutoDoc):
     def __init__(self, platform, boot_source="rand",
                  debug=None, bios_file=None,
                  use_dsp=False, placer="heap", output_dir="build",
-                 pnr_seed=0,
-                 **kwargs):
+                 pnr_seed=0, flash_cache_lines=0, with_spi_programmer=False,
+                 with_dma=False, with_hash=False,
+                 messible_width=8, messible_depth=64, messible_window=False, messible_irq=False,
+                 with_crossbar=False, sys_clk_freq=12e6,
+                 with_perf_counters=False, with_pc_sampler=False, with_usb_logger=False,
+                 analyzer_groups=[], analyzer_depth=None, with_led_sequencer=False, **kwargs):
         # Disable integrated RAM as we'll add it later
         self.integrated_sram_size = 0
         if hasattr(platform, "get_integrated_sram_size"):
             self.integrated_sram_size = platform.get_integrated_sram_size()
 
         self.output_dir = output_dir
+        self.with_crossbar = with_crossbar
+        self.with_perf_counters = with_perf_counters
 
-        clk_freq = int(12e6)
-        platform.add_crg(self)
+        clk_freq = int(sys_clk_freq)
+        platform.add_crg(self, sys_clk_freq)
+
+        # USB always runs at 12 MHz, so if sys runs any faster, the USB core
+        # needs to cross between the two domains itself.
+        usb_cdc = clk_freq != int(12e6)
 
         SoCCore.__init__(self, platform, clk_freq, integrated_sram_size=self.integrated_sram_size, with_uart=False, csr_data_width=32, **kwargs)
         
@@ -132,7 +180,11 @@ class BaseSoC(SoCCore, AutoDoc):
                 ]
                 platform.add_extension(debug_device)
                 spi_pads = platform.request("spidebug")
-                self.submodules.spibone = ClockDomainsRenamer("usb_12")(spibone.SpiWishboneBridge(spi_pads, wires=4))
+                if usb_cdc:
+                    # The bridge's Wishbone port has to be in sys
+                    self.submodules.spibone = spibone.SpiWishboneBridge(spi_pads, wires=4)
+                else:
+                    self.submodules.spibone = ClockDomainsRenamer("usb_12")(spibone.SpiWishboneBridge(spi_pads, wires=4))
                 self.add_wb_master(self.spibone.wishbone)
             if hasattr(self, "cpu") and not isinstance(self.cpu, CPUNone):
                 platform.add_cpu_variant(self, debug=True)
@@ -148,7 +200,10 @@ class BaseSoC(SoCCore, AutoDoc):
             self.register_mem("sram", self.mem_map["sram"], self.spram.bus, spram_size)
 
         # Add a Messible for device->host communications
-        self.submodules.messible = Messible()
+        self.submodules.messible = Messible(width=messible_width, depth=messible_depth,
+                                            with_window=messible_window, with_irq=messible_irq)
+        if messible_window:
+            self.register_mem("messible", self.mem_map["messible"], self.messible.bus, size=0x1000)
 
         if boot_source == "rand":
             kwargs['cpu_reset_address'] = 0
@@ -183,19 +238,71 @@ class BaseSoC(SoCCore, AutoDoc):
         spi_pads = platform.request("spiflash4x")
         self.submodules.lxspi = spi_flash.SpiFlashDualQuad(spi_pads, dummy=platform.spi_dummy, endianness="little")
         self.lxspi.add_clk_primitive(platform.device)
-        self.register_mem("spiflash", self.mem_map["spiflash"], self.lxspi.bus, size=platform.spi_size)
+        if flash_cache_lines:
+            # Cache reads from flash, which speeds up code that executes in place.
+            self.submodules.flash_cache = FlashCache(lines=flash_cache_lines)
+            self.comb += self.flash_cache.flash.connect(self.lxspi.bus)
+            self.comb += self.flash_cache.flush.eq(self.lxspi.bitbang_en.re)
+            self.register_mem("spiflash", self.mem_map["spiflash"], self.flash_cache.bus, size=platform.spi_size)
+        else:
+            self.register_mem("spiflash", self.mem_map["spiflash"], self.lxspi.bus, size=platform.spi_size)
+
+        # Let hardware shift out flash commands and page data, rather than
+        # having the CPU bit-bang every bit.  It takes over the bit-bang
+        # register of `lxspi` while it's running.
+        if with_spi_programmer:
+            self.submodules.spi_programmer = SpiProgrammer()
+            self.add_wb_master(self.spi_programmer.bus)
+            self.comb += self.spi_programmer.miso.eq(self.lxspi.miso.status)
+            self.sync += If(self.spi_programmer.active,
+                self.lxspi.bitbang.storage.eq(self.spi_programmer.bitbang),
+            )
+
+        # Copy blocks between spiflash, sram and rom without using the CPU
+        if with_dma:
+            self.submodules.dma = WishboneDMA()
+            self.add_wb_master(self.dma.bus)
+
+        # Compute XXH32 and CRC-32 in hardware, reading directly from the bus
+        if with_hash:
+            self.submodules.hash = HashAccelerator()
+            self.add_wb_master(self.hash.bus)
 
         # Add USB pads, as well as the appropriate USB controller.  If no CPU is
         # present, use the DummyUsb controller.
         usb_pads = platform.request_usb()
-        usb_iobuf = usbio.IoBuf(usb_pads.d_p, usb_pads.d_n, usb_pads.pullup)
+        self.usb_iobuf = usb_iobuf = usbio.IoBuf(usb_pads.d_p, usb_pads.d_n, usb_pads.pullup)
+        usb_args = {"cdc": True} if usb_cdc else {}
         if hasattr(self, "cpu") and not isinstance(self.cpu, CPUNone):
-            self.submodules.usb = eptri.TriEndpointInterface(usb_iobuf, debug=usb_debug)
+            self.submodules.usb = eptri.TriEndpointInterface(usb_iobuf, debug=usb_debug, **usb_args)
         else:
-            self.submodules.usb = dummyusb.DummyUsb(usb_iobuf, debug=usb_debug)
+            self.submodules.usb = dummyusb.DummyUsb(usb_iobuf, debug=usb_debug, **usb_args)
 
         if usb_debug:
             self.add_wb_master(self.usb.debug_bridge.wishbone)
+
+        # Log every USB transaction with a timestamp, to see where time goes
+        # during enumeration and DFU.
+        if with_usb_logger:
+            if not hasattr(self.usb, "usb_core"):
+                raise ValueError("the usb logger needs the eptri usb core")
+            self.submodules.usblogger = USBLogger(self.usb.usb_core)
+            self.register_mem("usblogger", self.mem_map["usblogger"], self.usblogger.bus, size=0x1000)
+
+        # Sample the program counter into a buffer that the host can read
+        # over the debug bridge, without halting the CPU.
+        if with_pc_sampler:
+            if debug is None or not hasattr(self, "cpu") or isinstance(self.cpu, CPUNone):
+                raise ValueError("the pc sampler needs a cpu and a debug bridge")
+            if hasattr(platform, "add_cpu_trace"):
+                platform.add_cpu_trace(self)
+            # Instruction fetch addresses are no substitute, since with an
+            # instruction cache they only show the misses.
+            if not hasattr(self, "cpu_trace"):
+                raise ValueError("the pc sampler needs a cpu that exports the pc of each instruction it completes")
+            (pc, pc_valid) = self.cpu_trace
+            self.submodules.pcsampler = PCSampler(pc, pc_valid)
+            self.register_mem("pcsampler", self.mem_map["pcsampler"], self.pcsampler.bus, size=0x1000)
         # For the EVT board, ensure the pulldown pin is tristated as an input
         if hasattr(usb_pads, "pulldown"):
             pulldown = TSTriple()
@@ -221,7 +328,10 @@ class BaseSoC(SoCCore, AutoDoc):
                 i_externalResetVector=self.reboot.addr.storage,
             )
 
-        platform.add_rgb(self)
+        led_sequencer = None
+        if with_led_sequencer:
+            led_sequencer = LEDSequencer(clk_freq)
+        platform.add_rgb(self, sequencer=led_sequencer)
 
         self.submodules.version = Version(platform.revision, platform.hw_platform, self, pnr_seed, models=[
                 ("0x45", "E", "Fomu EVT"),
@@ -231,9 +341,24 @@ class BaseSoC(SoCCore, AutoDoc):
                 ("0x11", "1", "OrangeCrab r0.1"),
                 ("0x12", "2", "OrangeCrab r0.2"),
                 ("0x63", "c", "OrangeCart"),
+                ("0x73", "s", "Simulation"),
                 ("0x3f", "?", "Unknown model"),
             ])
 
+        for (name, irq) in self.interrupts.items():
+            if name not in self.interrupt_map and hasattr(getattr(self, name, None), "ev"):
+                self.add_interrupt(name, irq)
+
+        # The simulator has no flash chip, so it puts a model of one on the
+        # flash pads, along with a monitor that reports how far boot has got.
+        if hasattr(platform, "add_models"):
+            platform.add_models(self)
+
+        if analyzer_groups:
+            if debug is None:
+                raise ValueError("the analyzer needs a debug bridge to read captures")
+            self.add_analyzer(analyzer_groups, analyzer_depth or platform.analyzer_depth)
+
         if hasattr(platform, "build_templates"):
             platform.build_templates(use_dsp, pnr_seed, placer)
 
@@ -242,6 +367,112 @@ class BaseSoC(SoCCore, AutoDoc):
         for (name,value) in platform.get_config(git_version):
             self.add_constant("CONFIG_" + name, value)
 
+    def analyzer_signals(self, group):
+        """Signals that make up each analyzer group"""
+        if group == "wishbone":
+            signals = []
+            if hasattr(self, "cpu") and not isinstance(self.cpu, CPUNone):
+                for bus in [self.cpu.ibus, self.cpu.dbus]:
+                    signals += [bus.cyc, bus.stb, bus.ack, bus.we, bus.cti, bus.adr]
+            return signals
+        if group == "spiflash":
+            bus = self.lxspi.bus
+            return [bus.cyc, bus.stb, bus.ack, bus.adr,
+                    self.lxspi.bitbang_en.storage, self.lxspi.bitbang.storage]
+        if group == "usb":
+            iobuf = self.usb_iobuf
+            signals = [iobuf.usb_p_rx, iobuf.usb_n_rx, iobuf.usb_tx_en]
+            if hasattr(self.usb, "usb_core"):
+                usb_core = self.usb.usb_core
+                signals += [usb_core.start, usb_core.end, usb_core.commit,
+                            usb_core.arm, usb_core.sta, usb_core.tok, usb_core.endp]
+            return signals
+        raise ValueError("unknown analyzer group: {}".format(group))
+
+    def add_analyzer(self, groups, depth):
+        from litescope import LiteScopeAnalyzer
+        # Each group can be selected at capture time without rebuilding
+        analyzer_groups = {i: self.analyzer_signals(group) for (i, group) in enumerate(groups)}
+        self.submodules.analyzer = LiteScopeAnalyzer(analyzer_groups, depth)
+
+    def do_exit(self, vns):
+        SoCCore.do_exit(self, vns)
+        if hasattr(self, "analyzer"):
+            # The host side needs the names of the captured signals
+            self.analyzer.export_csv(vns, os.path.join(self.output_dir, "analyzer.csv"))
+
+    def do_finalize(self):
+        # Every bus slave is known by now, so the counters can watch them all
+        if self.with_perf_counters:
+            self.add_perf_counters()
+
+        # Replace the shared bus with a crossbar, so that a debug bridge
+        # reading SRAM doesn't hold up the CPU fetching from ROM or flash.
+        # With no masters left, SoCCore won't build its own interconnect.
+        if self.with_crossbar:
+            masters = list(self.bus.masters.items())
+            slaves = [(self.bus.regions[name].decoder(self.bus), slave)
+                      for name, slave in self.bus.slaves.items()]
+            self.bus.masters.clear()
+            self.submodules.crossbar = WishboneCrossbar(masters, slaves, timeout=self.bus.timeout)
+        SoCCore.do_finalize(self)
+
+    def add_perf_counters(self, usb_endpoints=2):
+        events = []
+        for name, slave in self.bus.slaves.items():
+            stall = Signal()
+            self.comb += stall.eq(slave.cyc & slave.stb & ~slave.ack)
+            events.append(("stall_" + name, stall, "sys",
+                "Clocks a master spent waiting on ``{}``.".format(name)))
+
+        flash_busy = Signal()
+        self.comb += flash_busy.eq(self.lxspi.bus.cyc & self.lxspi.bus.stb & ~self.lxspi.bus.ack)
+        events.append(("lxspi_busy", flash_busy, "sys",
+            "Clocks ``lxspi`` spent fetching from flash."))
+
+        if hasattr(self, "cpu") and not isinstance(self.cpu, CPUNone):
+            # Count each time the CPU goes from having no interrupt pending
+            # to having one.
+            irq = Signal()
+            irq_last = Signal()
+            irq_entry = Signal()
+            self.comb += [
+                irq.eq(self.cpu.interrupt != 0),
+                irq_entry.eq(irq & ~irq_last),
+            ]
+            self.sync += irq_last.eq(irq)
+            events.append(("irq_entries", irq_entry, "sys",
+                "Number of times an interrupt was raised while none was pending."))
+
+        if hasattr(self.usb, "usb_core"):
+            # The transfer engine runs in usb_12.  `commit` marks a completed
+            # transaction, and one that starts while the endpoint isn't
+            # armed or stalled is answered with a NAK.
+            usb_core = self.usb.usb_core
+            for ep in range(usb_endpoints):
+                packet = Signal()
+                nak = Signal()
+                self.comb += [
+                    packet.eq(usb_core.commit & (usb_core.endp == ep)),
+                    nak.eq(usb_core.start & ~usb_core.arm & ~usb_core.sta & (usb_core.endp == ep)),
+                ]
+                events.append(("usb_ep{}_packets".format(ep), packet, "usb_12",
+                    "Transactions completed on endpoint {}.".format(ep)))
+                events.append(("usb_ep{}_naks".format(ep), nak, "usb_12",
+                    "Transactions NAKed on endpoint {}.".format(ep)))
+
+        self.submodules.perf = PerfCounters(events)
+
+# VexRiscv variants provided by LiteX, and what each adds to the core.  Which
+# ones fit is listed by each platform's `cpu_variants`.
+CPU_VARIANTS = {
+    "minimal":  "rv32i, no caches (2 kB instruction cache on Fomu)",
+    "lite":     "rv32i, instruction and data caches",
+    "standard": "rv32im, instruction and data caches, hardware multiply and divide",
+    "imac":     "rv32imac, as standard plus compressed instructions and atomics",
+    "full":     "rv32im, as standard plus full exception and CSR support",
+}
+
 def main():
     parser = argparse.ArgumentParser(
         description="Build Fomu Main Gateware")
@@ -263,6 +494,10 @@ def main():
     parser.add_argument(
         "--with-debug", help="enable debug support", choices=["usb", "uart", "spi", None]
     )
+    parser.add_argument(
+        "--cpu-variant", choices=CPU_VARIANTS.keys(), default="minimal",
+        help="VexRiscv configuration to use: " + "; ".join("{}: {}".format(k, v) for k, v in CPU_VARIANTS.items())
+    )
     parser.add_argument(
         "--with-dsp", help="use dsp inference in yosys (not all yosys builds have -dsp)", action="store_true"
     )
@@ -281,6 +516,58 @@ def main():
     parser.add_argument(
         "--skip-gateware", help="Skip generating gateware", default=False
     )
+    parser.add_argument(
+        "--with-spi-programmer", help="add a hardware engine for erasing and programming SPI flash", action="store_true"
+    )
+    parser.add_argument(
+        "--with-dma", help="add a DMA engine for copying between memory regions", action="store_true"
+    )
+    parser.add_argument(
+        "--with-hash", help="add an XXH32/CRC-32 hash accelerator", action="store_true"
+    )
+    parser.add_argument(
+        "--messible-width", type=int, default=8, help="width of each Messible entry, in bits (up to 32)"
+    )
+    parser.add_argument(
+        "--messible-depth", type=int, default=64, help="number of entries in the Messible FIFO"
+    )
+    parser.add_argument(
+        "--messible-window", help="map the Messible onto the bus so the host can drain it in bulk", action="store_true"
+    )
+    parser.add_argument(
+        "--messible-irq", help="interrupt the CPU when the Messible stops being full", action="store_true"
+    )
+    parser.add_argument(
+        "--sys-clk-freq", type=int, choices=[12, 24, 36, 48], default=12,
+        help="frequency in MHz to run the CPU, bus and SPI flash at (USB always runs at 12 MHz)"
+    )
+    parser.add_argument(
+        "--with-analyzer", nargs="+", default=[], choices=["wishbone", "spiflash", "usb"], metavar="GROUP",
+        help="add a LiteScope analyzer that captures these signal groups: wishbone, spiflash, usb (needs --with-debug)"
+    )
+    parser.add_argument(
+        "--analyzer-depth", type=int, default=None,
+        help="number of samples the analyzer holds (defaults to what fits on the platform)"
+    )
+    parser.add_argument(
+        "--with-led-sequencer", help="play LED patterns from a keyframe memory, without the CPU", action="store_true"
+    )
+    parser.add_argument(
+        "--with-usb-logger", help="log each USB transaction with a timestamp, for util/usblog.py", action="store_true"
+    )
+    parser.add_argument(
+        "--with-pc-sampler", help="sample the CPU program counter for profiling over the debug bridge (needs --with-debug, and a core that exports its pc)", action="store_true"
+    )
+    parser.add_argument(
+        "--with-perf-counters", help="add counters for bus stalls, flash, USB and interrupt activity", action="store_true"
+    )
+    parser.add_argument(
+        "--with-crossbar", help="connect bus masters through a crossbar, so debug bridges don't stall the CPU", action="store_true"
+    )
+    parser.add_argument(
+        "--flash-cache-lines", type=int, default=0,
+        help="add a read cache with this many 16-byte lines in front of SPI flash (power of two, 0 to disable)"
+    )
     args, _ = parser.parse_known_args()
 
     # Select platform based arguments
@@ -301,7 +588,7 @@ def main():
     elif args.platform == "orangecart":
         platform = Platform(device=args.device)
     elif args.platform == "fomu":
-        platform = Platform(revision=args.revision)
+        platform = Platform(revision=args.revision, captouch=args.with_captouch)
 
     output_dir = 'build'
     #if args.export_random_rom_file is not None:
@@ -317,7 +604,10 @@ def main():
         compile_gateware = False
 
     cpu_type = "vexriscv"
-    cpu_variant = "minimal"
+    cpu_variant = args.cpu_variant
+    if cpu_variant not in platform.cpu_variants:
+        raise ValueError("cpu variant {} does not fit on {}, choose one of: {}".format(
+            cpu_variant, platform.hw_platform, ", ".join(platform.cpu_variants)))
     if args.with_debug:
         cpu_variant = cpu_variant + "+debug"
 
@@ -339,6 +629,19 @@ def main():
                             bios_file=args.bios,
                             use_dsp=args.with_dsp, placer=args.placer,
                             pnr_seed=int(args.seed),
+                            flash_cache_lines=args.flash_cache_lines,
+                            with_spi_programmer=args.with_spi_programmer,
+                            with_dma=args.with_dma,
+                            with_hash=args.with_hash,
+                            messible_width=args.messible_width, messible_depth=args.messible_depth,
+                            messible_window=args.messible_window, messible_irq=args.messible_irq,
+                            with_crossbar=args.with_crossbar,
+                            sys_clk_freq=args.sys_clk_freq*1e6,
+                            with_perf_counters=args.with_perf_counters,
+                            with_pc_sampler=args.with_pc_sampler,
+                            with_usb_logger=args.with_usb_logger,
+                            analyzer_groups=args.with_analyzer, analyzer_depth=args.analyzer_depth,
+                            with_led_sequencer=args.with_led_sequencer,
                             output_dir=output_dir)
     builder = Builder(soc, output_dir=output_dir, csr_csv="build/csr.csv", csr_svd="build/soc.svd",
                       compile_software=compile_software, compile_gateware=compile_gateware)
@@ -348,6 +651,13 @@ def main():
         ]
     vns = builder.build()
     soc.do_exit(vns)
+
+    # Report what the chosen CPU variant cost, so variants can be compared
+    build_name = getattr(platform, "name", None) or "top"
+    yosys_log = os.path.join(output_dir, "gateware", build_name + ".rpt")
+    if compile_gateware and os.path.exists(yosys_log):
+        summary = resourcereport.summarise(resourcereport.read_cells(yosys_log))
+        print(resourcereport.format_summary(summary, "Resources used with cpu variant {}:".format(cpu_variant)))
     lxsocdoc.generate_docs(soc, "build/documentation/", project_name="Fomu Bootloader", author="Sean Cross")
 
     if not args.document_only:
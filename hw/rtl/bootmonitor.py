@@ -0,0 +1,42 @@
+from migen import Module, Signal, Instance, ClockSignal
+
+class BootMonitor(Module):
+    """Reports the clock at which boot first reaches each milestone.
+
+    This only makes sense in the simulator, where it prints a line for
+    each milestone and then stops the simulation.  `milestones` is a list
+    of `(name, signal)`, where `signal` is high in any cycle that counts as
+    reaching that milestone.  Reaching any of the names in `final`, or
+    running for `timeout` clocks, ends the simulation.  Milestones are
+    printed by their index in the list, as ``bootmonitor: milestone N
+    CLOCKS``."""
+    def __init__(self, platform, milestones, final, timeout):
+        self.names = [name for (name, _) in milestones]
+        n = len(milestones)
+
+        cycles = Signal(32)
+        seen = Signal(n)
+        reached = Signal(n)
+        done = Signal()
+        expired = Signal()
+        for (num, (name, signal)) in enumerate(milestones):
+            self.comb += reached[num].eq(signal & ~seen[num])
+        final_mask = sum(1 << self.names.index(name) for name in final)
+        self.comb += [
+            done.eq((reached & final_mask) != 0),
+            expired.eq(cycles == timeout),
+        ]
+        self.sync += [
+            cycles.eq(cycles + 1),
+            seen.eq(seen | reached),
+        ]
+
+        self.specials += Instance("bootmonitor",
+            p_MILESTONES = n,
+            i_clk = ClockSignal(),
+            i_reached = reached,
+            i_cycles = cycles,
+            i_done = done,
+            i_timeout = expired,
+        )
+        platform.add_source("rtl/bootmonitor.v")
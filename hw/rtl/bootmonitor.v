@@ -0,0 +1,26 @@
+// Reports boot milestones from the simulator, for tests/boot-bench.py.
+//
+// Each bit of `reached` is high in the one cycle its milestone is first
+// reached, and `cycles` counts clocks since reset.  The simulation ends
+// once `done` or `timeout` goes high.
+module bootmonitor #(
+    parameter MILESTONES = 1
+) (
+    input clk,
+    input [MILESTONES-1:0] reached,
+    input [31:0] cycles,
+    input done,
+    input timeout
+);
+    integer n;
+
+    always @(posedge clk) begin
+        for (n = 0; n < MILESTONES; n = n + 1)
+            if (reached[n])
+                $display("bootmonitor: milestone %0d %0d", n, cycles);
+        if (timeout)
+            $display("bootmonitor: timeout %0d", cycles);
+        if (done || timeout)
+            $finish;
+    end
+endmodule
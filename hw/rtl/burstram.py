@@ -0,0 +1,96 @@
+from migen import Module, Signal, Memory, Instance, ClockSignal, Cat, If, log2_int
+from litex.soc.interconnect import wishbone
+
+# Wishbone Cycle Type Identifier values
+CTI_CLASSIC = 0b000
+CTI_INCREMENTING = 0b010
+CTI_END_OF_BURST = 0b111
+
+def burst_control(module, bus):
+    """Add Wishbone ack logic for a RAM with one cycle of read latency.
+
+    Classic cycles take two clocks, the same as `wishbone.SRAM`.  During a
+    linear incrementing burst, the following address is read while the
+    current beat is being acknowledged, so each further beat takes one clock.
+
+    Returns `(adr, write)`, the address to present to the RAM and the write
+    strobe for the current beat."""
+    ack = Signal()
+    adr = Signal(len(bus.adr))
+    write = Signal()
+    burst = Signal()
+    module.comb += [
+        burst.eq((bus.cti == CTI_INCREMENTING) & (bus.bte == 0b00)),
+        bus.ack.eq(ack & bus.cyc & bus.stb),
+        write.eq(bus.ack & bus.we),
+        If(bus.ack & burst & ~bus.we,
+            adr.eq(bus.adr + 1),
+        ).Else(
+            adr.eq(bus.adr),
+        ),
+    ]
+    module.sync += ack.eq(bus.cyc & bus.stb & (~ack | burst))
+    return (adr, write)
+
+class BurstSRAM(Module):
+    """Block RAM that supports Wishbone incrementing bursts"""
+    def __init__(self, size, read_only=False, init=None):
+        self.bus = bus = wishbone.Interface()
+
+        self.specials.mem = mem = Memory(32, size//4, init=init)
+        port = mem.get_port(write_capable=not read_only, we_granularity=8)
+        self.specials += port
+
+        (adr, write) = burst_control(self, bus)
+        self.comb += [
+            port.adr.eq(adr),
+            bus.dat_r.eq(port.dat_r),
+        ]
+        if not read_only:
+            self.comb += [
+                port.dat_w.eq(bus.dat_w),
+                If(write, port.we.eq(bus.sel)),
+            ]
+
+class BurstUp5kSPRAM(Module):
+    """UP5K single-port RAM that supports Wishbone incrementing bursts"""
+    def __init__(self, size=128*1024):
+        self.bus = bus = wishbone.Interface()
+
+        # Each SB_SPRAM256KA is 16 bits wide and 16k deep, so two of them make
+        # up 64 kB of 32-bit words.
+        banks = size // (64*1024)
+        bank_bits = log2_int(banks, need_pow2=True)
+
+        (adr, write) = burst_control(self, bus)
+
+        # The RAM output is registered, so remember which bank was read.
+        read_bank = Signal(max(bank_bits, 1))
+        if bank_bits:
+            self.sync += read_bank.eq(adr[14:14+bank_bits])
+
+        for bank in range(banks):
+            selected = Signal()
+            dataout = Signal(32)
+            if bank_bits:
+                self.comb += selected.eq(adr[14:14+bank_bits] == bank)
+                self.comb += If(read_bank == bank, bus.dat_r.eq(dataout))
+            else:
+                self.comb += [
+                    selected.eq(1),
+                    bus.dat_r.eq(dataout),
+                ]
+            for half in range(2):
+                self.specials += Instance("SB_SPRAM256KA",
+                    i_ADDRESS=adr[:14],
+                    i_DATAIN=bus.dat_w[16*half:16*(half+1)],
+                    i_MASKWREN=Cat(bus.sel[2*half], bus.sel[2*half],
+                                   bus.sel[2*half+1], bus.sel[2*half+1]),
+                    i_WREN=write & selected,
+                    i_CHIPSELECT=selected,
+                    i_CLOCK=ClockSignal("sys"),
+                    i_STANDBY=0,
+                    i_SLEEP=0,
+                    i_POWEROFF=1,
+                    o_DATAOUT=dataout[16*half:16*(half+1)],
+                )
@@ -1,16 +1,22 @@
-from migen import Module
-from litex.soc.interconnect.csr import AutoCSR, CSRStatus, CSRStorage
+from litex.soc.interconnect.csr import CSRStatus
 from litex.soc.integration.doc import ModuleDoc
 
-class Button(Module, AutoCSR):
-    def __init__(self, pad):
+from .inputevents import InputEvents
+
+class Button(InputEvents):
+    def __init__(self, pad, sys_clk_freq, debounce_ms=10):
         self.intro = ModuleDoc("""Button
 
-        This block simply provides CPU readable input.  It has
-        one register which returns status of the Input button state connected to this pins.
+        This block provides a CPU readable user button.  ``I`` returns the raw state
+        of the pin the button is connected to, which reads ``0`` while the button
+        is held.  The button is also debounced in hardware, and presses and releases
+        are reported through ``STATE``, ``EVENT`` and the ``CHANGE`` interrupt
+        described below.
         """)
         self.i  = CSRStatus(1, description="Input value from user button")
 
         self.comb += [
             self.i.status.eq(pad)
         ]
+
+        self.add_inputs([(pad, True)], sys_clk_freq, debounce_ms=debounce_ms)
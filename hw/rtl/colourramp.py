@@ -0,0 +1,68 @@
+# Generated from util/colours.png by util/colourramp.py.  Do not edit.
+
+COLOURS = [
+    0xe34949, 0xe3494a, 0xe3494a, 0xe3494a, 0xe3494b, 0xe3494b, 0xe3494c, 0xe3494c,
+    0xe3494d, 0xe3494d, 0xe3494e, 0xe3494f, 0xe34950, 0xe34951, 0xe34952, 0xe34953,
+    0xe34954, 0xe34955, 0xe34957, 0xe34958, 0xe34a59, 0xe34a5b, 0xe34a5d, 0xe34a5e,
+    0xe34a5f, 0xe34a61, 0xe34a62, 0xe34a64, 0xe34a66, 0xe34a67, 0xe34a69, 0xe34a6b,
+    0xe34a6c, 0xe34a6f, 0xe34a71, 0xe34a73, 0xe34b75, 0xe34b77, 0xe34b79, 0xe34b7b,
+    0xe34b7d, 0xe34b7f, 0xe34b81, 0xe34b83, 0xe34b85, 0xe34b87, 0xe34c8a, 0xe34c8c,
+    0xe34c8e, 0xe44c90, 0xe44c92, 0xe44c94, 0xe44c96, 0xe44c99, 0xe44d9b, 0xe44d9d,
+    0xe44d9f, 0xe44da2, 0xe44da5, 0xe44da6, 0xe44da9, 0xe44eac, 0xe44eae, 0xe44eb0,
+    0xe44eb3, 0xe44eb4, 0xe44eb8, 0xe44fb9, 0xe44fbc, 0xe44fbe, 0xe44fc0, 0xe44fc4,
+    0xe450c5, 0xe550c8, 0xe550ca, 0xe550cd, 0xe550cf, 0xe551d2, 0xe551d5, 0xe551d7,
+    0xe551d9, 0xe551db, 0xe552de, 0xe552e0, 0xe552e3, 0xe552e5, 0xe351e5, 0xe051e5,
+    0xdd50e5, 0xda4fe4, 0xd84ee4, 0xd54de4, 0xd34ce4, 0xd04ce3, 0xcd4be3, 0xcb4ae3,
+    0xc849e3, 0xc548e3, 0xc348e2, 0xc047e2, 0xbe46e2, 0xbb45e2, 0xb945e2, 0xb644e2,
+    0xb343e1, 0xb142e1, 0xaf42e1, 0xab41e1, 0xa940e1, 0xa63fe1, 0xa43fe0, 0xa13ee0,
+    0x9f3de0, 0x9c3ce0, 0x993be0, 0x963be0, 0x953ae0, 0x9139df, 0x8f39df, 0x8c38df,
+    0x8a37df, 0x8837df, 0x8436df, 0x8235df, 0x7f35df, 0x7d34df, 0x7a33de, 0x7833de,
+    0x7632de, 0x7332de, 0x7031de, 0x6e30de, 0x6c30de, 0x692fde, 0x672fde, 0x642ede,
+    0x622ede, 0x5f2ddd, 0x5d2ddd, 0x5a2cdd, 0x582cdd, 0x562cdd, 0x542bdd, 0x512bdd,
+    0x4f2add, 0x4d2add, 0x4a29dd, 0x4829dd, 0x4629dd, 0x4428dd, 0x4228dd, 0x3f28dd,
+    0x3e27dd, 0x3c27dd, 0x3a27dd, 0x3827dd, 0x3626dd, 0x3426dd, 0x3226dd, 0x3126dc,
+    0x2f26dc, 0x2e26dc, 0x2c25dc, 0x2b25dc, 0x2a25dc, 0x2925dc, 0x2825dc, 0x2725dc,
+    0x2625dc, 0x2625dc, 0x2525dc, 0x2525dc, 0x2526dc, 0x2527dc, 0x2528dc, 0x2629dc,
+    0x262add, 0x262bdd, 0x272cdd, 0x272edd, 0x272fdd, 0x2832dd, 0x2933dd, 0x2935dd,
+    0x2a37dd, 0x2a39dd, 0x2b3bdd, 0x2c3ddd, 0x2c3fdd, 0x2d42dd, 0x2e43de, 0x2f47de,
+    0x3049de, 0x314bde, 0x324dde, 0x334fde, 0x3453de, 0x3555df, 0x3657df, 0x375adf,
+    0x385cdf, 0x395fdf, 0x3a61e0, 0x3b64e0, 0x3d68e0, 0x3d69e0, 0x3f6ce1, 0x4070e1,
+    0x4171e1, 0x4274e1, 0x4477e2, 0x457ae2, 0x467ce2, 0x477fe2, 0x4982e3, 0x4a85e3,
+    0x4b87e3, 0x4d8ae4, 0x4e8de4, 0x4f90e4, 0x5192e5, 0x5295e5, 0x5498e6, 0x559be6,
+    0x569ee6, 0x58a0e7, 0x59a3e7, 0x5ba6e8, 0x5ba8e8, 0x5dace8, 0x5faee9, 0x60b1e9,
+    0x61b3ea, 0x63b7ea, 0x64b9eb, 0x66bdeb, 0x67bfec, 0x69c2ec, 0x6ac5ed, 0x6bc7ed,
+    0x6dcbee, 0x6fceee, 0x70d0ef, 0x72d3f0, 0x73d6f0, 0x74d8f0, 0x76dcf1, 0x78dff2,
+    0x79e1f2, 0x7ae3f3, 0x7ce6f3, 0x7de9f4, 0x7fecf5, 0x80eff5, 0x82f3f6, 0x84f5f7,
+    0x85f7f7, 0x85f7f6, 0x84f7f4, 0x84f7f1, 0x84f7ee, 0x84f7ed, 0x84f7eb, 0x84f7e9,
+    0x84f7e6, 0x84f7e4, 0x84f7e2, 0x83f7df, 0x83f7de, 0x83f7dc, 0x83f7d9, 0x83f7d7,
+    0x83f7d5, 0x83f7d3, 0x83f6d1, 0x83f6cf, 0x83f6cd, 0x82f6cb, 0x82f6c8, 0x82f6c7,
+    0x82f6c5, 0x82f6c3, 0x82f6c1, 0x82f6bf, 0x82f6bd, 0x82f6bc, 0x82f6ba, 0x82f6b8,
+    0x82f6b6, 0x81f6b4, 0x81f6b2, 0x81f6b1, 0x81f6af, 0x81f6ad, 0x81f6ab, 0x81f6aa,
+    0x81f6a8, 0x81f6a6, 0x81f6a5, 0x81f6a3, 0x81f6a2, 0x81f6a0, 0x81f69f, 0x81f69d,
+    0x81f69c, 0x81f69a, 0x81f699, 0x80f698, 0x80f696, 0x80f596, 0x80f594, 0x80f593,
+    0x80f592, 0x80f591, 0x80f58f, 0x80f58e, 0x80f58d, 0x80f58c, 0x80f58c, 0x80f58b,
+    0x80f58a, 0x80f589, 0x80f588, 0x80f587, 0x80f586, 0x80f586, 0x80f585, 0x80f585,
+    0x80f584, 0x80f584, 0x80f583, 0x80f583, 0x80f582, 0x80f582, 0x80f581, 0x80f581,
+    0x80f581, 0x80f581, 0x80f580, 0x80f580, 0x80f580, 0x80f580, 0x80f580, 0x80f580,
+    0x80f580, 0x80f580, 0x81f580, 0x81f580, 0x81f580, 0x81f580, 0x82f580, 0x82f580,
+    0x83f580, 0x83f580, 0x84f580, 0x84f580, 0x85f580, 0x85f580, 0x86f580, 0x87f680,
+    0x88f680, 0x88f681, 0x89f681, 0x8af681, 0x8bf681, 0x8cf681, 0x8df681, 0x8ef681,
+    0x8ff681, 0x90f681, 0x91f681, 0x93f682, 0x94f682, 0x95f682, 0x96f682, 0x97f682,
+    0x99f682, 0x9af682, 0x9cf683, 0x9df783, 0x9ff783, 0xa0f783, 0xa2f783, 0xa4f783,
+    0xa5f784, 0xa6f784, 0xa8f784, 0xaaf784, 0xacf784, 0xaef785, 0xb0f785, 0xb1f885,
+    0xb3f885, 0xb5f885, 0xb6f886, 0xb9f886, 0xbaf886, 0xbdf887, 0xbef887, 0xc0f887,
+    0xc3f987, 0xc5f988, 0xc7f988, 0xc8f988, 0xcbf989, 0xccf989, 0xcef989, 0xd1fa89,
+    0xd3fa8a, 0xd5fa8a, 0xd8fa8a, 0xd9fa8b, 0xdbfa8b, 0xddfa8b, 0xdffb8c, 0xe2fb8c,
+    0xe4fb8c, 0xe6fb8d, 0xe8fb8d, 0xebfb8d, 0xedfc8e, 0xeffc8e, 0xf1fc8f, 0xf4fc8f,
+    0xf6fc8f, 0xf8fd90, 0xfbfd90, 0xfdfd91, 0xfcfa8f, 0xfcf78e, 0xfbf58d, 0xfaf28b,
+    0xfaef8a, 0xf9ec89, 0xf9eb88, 0xf8e786, 0xf7e485, 0xf7e284, 0xf6e083, 0xf6dc81,
+    0xf5d980, 0xf5d77f, 0xf4d57d, 0xf4d17c, 0xf3cf7b, 0xf3cd7a, 0xf2ca79, 0xf2c777,
+    0xf1c476, 0xf1c275, 0xf0be73, 0xf0bc72, 0xefba71, 0xefb670, 0xeeb46f, 0xeeb16d,
+    0xeeaf6d, 0xedad6c, 0xeda96a, 0xeca769, 0xeca468, 0xeca267, 0xeb9f66, 0xeb9d65,
+    0xeb9b64, 0xea9863, 0xea9662, 0xea9361, 0xe99160, 0xe98e5f, 0xe98c5e, 0xe8895d,
+    0xe8875c, 0xe8845b, 0xe8825b, 0xe7805a, 0xe77d59, 0xe77b58, 0xe77957, 0xe67756,
+    0xe67456, 0xe67255, 0xe67054, 0xe66e54, 0xe56c53, 0xe56a52, 0xe56852, 0xe56651,
+    0xe56450, 0xe56250, 0xe4604f, 0xe45f4f, 0xe45d4e, 0xe45b4e, 0xe45a4d, 0xe4594d,
+    0xe4574d, 0xe4554c, 0xe3544c, 0xe3534b, 0xe3524b, 0xe3514b, 0xe3504b, 0xe34f4a,
+    0xe34e4a, 0xe34d4a, 0xe34c4a, 0xe34c4a, 0xe34b4a, 0xe34b49, 0xe34a49, 0xe34a49,
+]
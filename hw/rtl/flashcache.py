@@ -0,0 +1,218 @@
+from migen import Module, Signal, Memory, Array, Cat, If, Mux, log2_int
+from migen.genlib.fsm import FSM, NextState, NextValue
+from litex.soc.integration.doc import AutoDoc, ModuleDoc
+from litex.soc.interconnect.csr import AutoCSR, CSRStatus, CSRStorage, CSRField
+from litex.soc.interconnect import wishbone
+
+from .burstram import CTI_INCREMENTING, CTI_END_OF_BURST
+
+class FlashCache(Module, AutoCSR, AutoDoc):
+    """Read cache for memory-mapped SPI flash"""
+    def __init__(self, lines=16, line_words=4):
+        assert lines >= 2 and line_words >= 2
+        self.intro = ModuleDoc("""Flash Read Cache
+
+            Every read from memory-mapped SPI flash costs a command, an address, and
+            a number of dummy cycles before any data comes back.  This makes executing
+            code directly from flash very slow, particularly for loops.
+
+            This block sits between the Wishbone bus and the flash controller, and keeps
+            a small direct-mapped cache of {} lines of {} words each.  A miss fills an
+            entire line with one Wishbone incrementing burst.  Whether that saves flash
+            commands depends on the controller: PicoRVSpi (spimemio) keeps its read open
+            and continues from the next address, while ``lxspi`` sends a new command and
+            address for every word.  Once a line has been filled, the following line is
+            prefetched in the background, provided the CPU isn't waiting on anything else.
+
+            Hits take two clocks, or one clock for each further word of a linear
+            incrementing burst that stays within the same line.
+
+            Writes are passed straight through to the flash controller, and invalidate
+            the line they fall in.  The cache is flushed automatically whenever the flash
+            controller switches in or out of bit-bang mode, since the flash contents may
+            have changed.  If you modify flash in some other way, write ``1`` to
+            ``CTRL.FLUSH``.
+            """.format(lines, line_words))
+
+        self.bus = bus = wishbone.Interface()
+        self.flash = flash = wishbone.Interface()
+
+        # Strobe this to invalidate the entire cache
+        self.flush = Signal()
+
+        self.ctrl = CSRStorage(fields=[
+            CSRField("flush", description="Write ``1`` to invalidate every line in the cache."),
+            CSRField("reset", description="Write ``1`` to reset the ``HITS`` and ``MISSES`` counters."),
+        ])
+        self.hits = CSRStatus(32, description="Number of reads that were served from the cache.")
+        self.misses = CSRStatus(32, description="Number of reads that had to wait for a line to be filled from flash.")
+
+        offset_bits = log2_int(line_words)
+        index_bits = log2_int(lines)
+        tag_bits = len(bus.adr) - offset_bits - index_bits
+
+        adr_offset = bus.adr[:offset_bits]
+        adr_index = bus.adr[offset_bits:offset_bits+index_bits]
+        adr_tag = bus.adr[offset_bits+index_bits:]
+
+        tags = Array(Signal(tag_bits) for _ in range(lines))
+        valid = Array(Signal() for _ in range(lines))
+
+        self.specials.data = data = Memory(32, lines*line_words)
+        rd_port = data.get_port()
+        wr_port = data.get_port(write_capable=True)
+        self.specials += rd_port, wr_port
+        self.autocsr_exclude = ['data']
+
+        hit = Signal()
+        burst = Signal()
+        read_next = Signal()
+        next_offset = Signal(offset_bits)
+        self.comb += [
+            hit.eq(valid[adr_index] & (tags[adr_index] == adr_tag)),
+            burst.eq((bus.cti == CTI_INCREMENTING) & (bus.bte == 0b00)),
+            next_offset.eq(adr_offset + 1),
+            # While acknowledging one word of a burst, read the next one
+            rd_port.adr.eq(Cat(Mux(read_next, next_offset, adr_offset), adr_index)),
+            bus.dat_r.eq(rd_port.dat_r),
+        ]
+
+        # The line currently being filled
+        fill_tag = Signal(tag_bits)
+        fill_index = Signal(index_bits)
+        fill_offset = Signal(offset_bits)
+        fill_prefetch = Signal()
+        fill_stale = Signal()
+
+        # The line to prefetch once the bus is idle
+        prefetch_pending = Signal()
+        prefetch_line = Signal(index_bits + tag_bits)
+        prefetch_index = prefetch_line[:index_bits]
+        prefetch_tag = prefetch_line[index_bits:]
+        prefetch_hit = Signal()
+        self.comb += prefetch_hit.eq(valid[prefetch_index] & (tags[prefetch_index] == prefetch_tag))
+
+        # Set once a demand fill completes, so the retried read isn't counted as a hit
+        refilled = Signal()
+
+        flush = Signal()
+        start_fill = Signal()
+        start_index = Signal(index_bits)
+        fill_done = Signal()
+        invalidate = Signal()
+        count_hit = Signal()
+        count_miss = Signal()
+        self.comb += flush.eq(self.flush | (self.ctrl.re & self.ctrl.fields.flush))
+
+        self.submodules.fsm = fsm = FSM(reset_state="IDLE")
+        fsm.act("IDLE",
+            If(bus.cyc & bus.stb,
+                If(bus.we,
+                    NextState("WRITE"),
+                ).Elif(hit,
+                    count_hit.eq(~refilled),
+                    NextValue(refilled, 0),
+                    NextState("HIT"),
+                ).Else(
+                    count_miss.eq(1),
+                    start_fill.eq(1),
+                    start_index.eq(adr_index),
+                    NextValue(fill_tag, adr_tag),
+                    NextValue(fill_index, adr_index),
+                    NextValue(fill_offset, 0),
+                    NextValue(fill_prefetch, 0),
+                    NextState("FILL"),
+                )
+            ).Elif(prefetch_pending & ~flush,
+                NextValue(prefetch_pending, 0),
+                If(~prefetch_hit,
+                    start_fill.eq(1),
+                    start_index.eq(prefetch_index),
+                    NextValue(fill_tag, prefetch_tag),
+                    NextValue(fill_index, prefetch_index),
+                    NextValue(fill_offset, 0),
+                    NextValue(fill_prefetch, 1),
+                    NextState("FILL"),
+                )
+            )
+        )
+        fsm.act("HIT",
+            bus.ack.eq(bus.cyc & bus.stb),
+            If(bus.cyc & bus.stb & burst & (adr_offset != line_words - 1),
+                read_next.eq(1),
+                count_hit.eq(1),
+            ).Else(
+                NextState("IDLE"),
+            )
+        )
+        fsm.act("FILL",
+            flash.cyc.eq(1),
+            flash.stb.eq(1),
+            flash.we.eq(0),
+            flash.sel.eq(0xf),
+            flash.cti.eq(Mux(fill_offset == line_words - 1, CTI_END_OF_BURST, CTI_INCREMENTING)),
+            flash.adr.eq(Cat(fill_offset, fill_index, fill_tag)),
+            wr_port.adr.eq(Cat(fill_offset, fill_index)),
+            wr_port.dat_w.eq(flash.dat_r),
+            If(flash.ack,
+                wr_port.we.eq(1),
+                NextValue(fill_offset, fill_offset + 1),
+                If(fill_offset == line_words - 1,
+                    fill_done.eq(1),
+                    If(~fill_prefetch,
+                        NextValue(refilled, 1),
+                        NextValue(prefetch_pending, 1),
+                        NextValue(prefetch_line, Cat(fill_index, fill_tag) + 1),
+                    ),
+                    NextState("IDLE"),
+                )
+            )
+        )
+        fsm.act("WRITE",
+            flash.cyc.eq(1),
+            flash.stb.eq(1),
+            flash.we.eq(1),
+            flash.sel.eq(bus.sel),
+            flash.adr.eq(bus.adr),
+            flash.dat_w.eq(bus.dat_w),
+            bus.ack.eq(flash.ack),
+            invalidate.eq(1),
+            If(flash.ack,
+                NextState("IDLE"),
+            )
+        )
+
+        hit_count = Signal(32)
+        miss_count = Signal(32)
+        self.sync += [
+            If(start_fill,
+                valid[start_index].eq(0),
+                fill_stale.eq(0),
+            ),
+            If(fill_done & ~fill_stale & ~flush,
+                tags[fill_index].eq(fill_tag),
+                valid[fill_index].eq(1),
+            ),
+            If(invalidate,
+                valid[adr_index].eq(0),
+            ),
+            If(flush,
+                # A fill that is in progress may have read old data, so don't
+                # let it mark its line as valid.
+                fill_stale.eq(1),
+                prefetch_pending.eq(0),
+                *[v.eq(0) for v in valid]
+            ),
+
+            If(self.ctrl.re & self.ctrl.fields.reset,
+                hit_count.eq(0),
+                miss_count.eq(0),
+            ).Else(
+                If(count_hit, hit_count.eq(hit_count + 1)),
+                If(count_miss, miss_count.eq(miss_count + 1)),
+            ),
+        ]
+        self.comb += [
+            self.hits.status.eq(hit_count),
+            self.misses.status.eq(miss_count),
+        ]
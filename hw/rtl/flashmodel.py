@@ -0,0 +1,229 @@
+from migen import Module, Signal, Record, Cat, C, If, Case, Mux
+
+# Flash commands and how the model answers them:
+# (address width, mode byte, clocks from address to data, data width, DDR).
+# A latency of None means the flash's configured dummy cycles, which
+# include the clocks taken by the mode byte.
+COMMANDS = {
+    0x03: (1, False, 0,    1, False),  # Read
+    0x0b: (1, False, 8,    1, False),  # Fast Read
+    0x3b: (1, False, 8,    2, False),  # Fast Read Dual Output
+    0x6b: (1, False, 8,    4, False),  # Fast Read Quad Output
+    0xbb: (2, True,  4,    2, False),  # Fast Read Dual I/O
+    0xeb: (4, True,  None, 4, False),  # Fast Read Quad I/O
+    0xed: (4, True,  None, 4, True),   # DTR Fast Read Quad I/O
+}
+
+PHASE_CMD = 0
+PHASE_ADDR = 1
+PHASE_WAIT = 2
+PHASE_DATA = 3
+PHASE_IGNORE = 4
+
+class SimTristateImpl(Module):
+    def __init__(self, target, o, oe, i):
+        # The target becomes what the far end sees: the near end's output
+        # while it drives the line, otherwise the pad's idle level.  The near
+        # end sees the far end wherever the far end drives.
+        (pin, idle) = SimTristate.pins[id(target)]
+        self.comb += [
+            target.eq(Mux(oe, o, idle)),
+            i.eq((pin.o & pin.oe) | (target & ~pin.oe)),
+        ]
+
+class SimTristate:
+    """Lowers tristates on `SimPads` into plain signals, so a controller and
+    a model of the chip it talks to can be joined up without an inout.  Use
+    it as a special override for `Tristate`."""
+    pins = {}
+
+    @staticmethod
+    def lower(dr):
+        return SimTristateImpl(dr.target, dr.o, dr.oe, dr.i)
+
+class SimPads:
+    """Pads for simulation, given as `(name, width)` or `(name, width, idle)`.
+
+    Each pad is a signal holding the level the far end sees, and has a pin
+    that the far end drives back through.  Undriven pads rest at `idle`,
+    which is all ones, like a pull-up, unless given."""
+    def __init__(self, pads):
+        self.pin = {}
+        for pad in pads:
+            (name, width) = pad[:2]
+            idle = pad[2] if len(pad) > 2 else 2**width - 1
+            target = Signal(width, name=name)
+            pin = Record([("o", width), ("oe", width)])
+            setattr(self, name, target)
+            self.pin[name] = pin
+            SimTristate.pins[id(target)] = (pin, idle)
+
+class FlashModel(Module):
+    """Behavioural SPI flash, watched on the system clock.
+
+    `dq` is the level on IO0-IO3 as driven by the controller, and the model
+    drives back through `dq_o` and `dq_oe`.  Inputs are taken as they were
+    just before each clock edge, and outputs change in the same cycle as the
+    edge that shifts them out, so the model answers with zero delay.
+
+    `read_byte` is called once with the byte address being shown, as a
+    migen expression, and returns the flash contents at that address.
+
+    Single, dual and quad I/O, DDR and continuous read mode are supported,
+    as listed in `COMMANDS`.  Setting bits 5:4 of the mode byte to ``10``
+    keeps the flash in continuous read mode, so the next transaction starts
+    with the address instead of a command.  Anything else, such as reading
+    the ID or status, is ignored and reads back as the pull-ups."""
+    def __init__(self, clk, cs_n, dq, dummy, read_byte):
+        self.dq_o = Signal(4)
+        self.dq_oe = Signal(4)
+
+        clk_prev = Signal()
+        cs_n_prev = Signal(reset=1)
+        dq_prev = Signal(4)
+        self.sync += [
+            clk_prev.eq(clk),
+            cs_n_prev.eq(cs_n),
+            dq_prev.eq(dq),
+        ]
+        rise = Signal()
+        fall = Signal()
+        deselect = Signal()
+        self.comb += [
+            rise.eq(~cs_n & clk & ~clk_prev),
+            fall.eq(~cs_n & ~clk & clk_prev),
+            deselect.eq(cs_n & ~cs_n_prev),
+        ]
+
+        phase = Signal(3)
+        bits = Signal(5)
+        shift = Signal(24)
+        width = Signal(3)
+        has_mode = Signal()
+        latency = Signal(5)
+        data_width = Signal(3)
+        ddr = Signal()
+        mode = Signal(8)
+        mode_bits = Signal(4)
+        waited = Signal(5)
+        addr = Signal(24)
+
+        # Input, `width` bits at a time
+        unit = Signal(4)
+        self.comb += Case(width, {
+            1: unit.eq(dq_prev[0]),
+            2: unit.eq(dq_prev[0:2]),
+            "default": unit.eq(dq_prev[0:4]),
+        })
+        sample = Signal()
+        self.comb += sample.eq(rise | (ddr & fall))
+
+        # Output.  `shown_addr` and `shown_bit` are the byte and bit offset
+        # of the bits on the lines, and `showing` is set once there are any.
+        showing = Signal()
+        shown_addr = Signal(24)
+        shown_bit = Signal(3)
+        out_event = Signal()
+        next_showing = Signal()
+        next_addr = Signal(24)
+        next_bit = Signal(3)
+        self.comb += [
+            out_event.eq((phase == PHASE_DATA) & (fall | (ddr & rise))),
+            next_showing.eq(1),
+            If(~showing,
+                next_addr.eq(addr),
+                next_bit.eq(0),
+            ).Elif(shown_bit + data_width == 8,
+                next_addr.eq(shown_addr + 1),
+                next_bit.eq(0),
+            ).Else(
+                next_addr.eq(shown_addr),
+                next_bit.eq(shown_bit + data_width),
+            ),
+        ]
+        disp_showing = Signal()
+        disp_addr = Signal(24)
+        disp_bit = Signal(3)
+        disp_byte = Signal(16)
+        out_unit = Signal(4)
+        self.comb += [
+            disp_showing.eq(Mux(out_event, next_showing, showing)),
+            disp_addr.eq(Mux(out_event, next_addr, shown_addr)),
+            disp_bit.eq(Mux(out_event, next_bit, shown_bit)),
+            disp_byte.eq(read_byte(disp_addr) << disp_bit),
+            If((phase == PHASE_DATA) & disp_showing & ~cs_n,
+                Case(data_width, {
+                    1: [out_unit.eq(disp_byte[7]), self.dq_oe.eq(0b0010), self.dq_o.eq(Cat(C(0, 1), out_unit[0]))],
+                    2: [out_unit.eq(disp_byte[6:8]), self.dq_oe.eq(0b0011), self.dq_o.eq(out_unit)],
+                    "default": [out_unit.eq(disp_byte[4:8]), self.dq_oe.eq(0b1111), self.dq_o.eq(out_unit)],
+                })
+            ),
+        ]
+        self.sync += If(out_event,
+            showing.eq(next_showing),
+            shown_addr.eq(next_addr),
+            shown_bit.eq(next_bit),
+        )
+
+        commands = {}
+        for (cmd, (cmd_width, cmd_mode, cmd_latency, cmd_data_width, cmd_ddr)) in COMMANDS.items():
+            commands[cmd] = [
+                phase.eq(PHASE_ADDR),
+                width.eq(cmd_width),
+                has_mode.eq(cmd_mode),
+                latency.eq(dummy if cmd_latency is None else cmd_latency),
+                data_width.eq(cmd_data_width),
+                ddr.eq(cmd_ddr),
+            ]
+        commands["default"] = phase.eq(PHASE_IGNORE)
+
+        self.sync += [
+            If(deselect,
+                bits.eq(0),
+                showing.eq(0),
+                # Stay in continuous read mode if the mode byte asked for it
+                If(has_mode & (mode_bits == 8) & (mode[4:6] == 0b10),
+                    phase.eq(PHASE_ADDR),
+                ).Else(
+                    phase.eq(PHASE_CMD),
+                    width.eq(1),
+                    ddr.eq(0),
+                ),
+            ).Elif(phase == PHASE_CMD,
+                If(rise,
+                    shift.eq(Cat(dq_prev[0], shift[:7])),
+                    bits.eq(bits + 1),
+                    If(bits == 7,
+                        bits.eq(0),
+                        Case(Cat(dq_prev[0], shift[:7]), commands),
+                    ),
+                ),
+            ).Elif(phase == PHASE_ADDR,
+                If(sample,
+                    shift.eq((shift << width) | unit),
+                    bits.eq(bits + width),
+                    If(bits + width == 24,
+                        bits.eq(0),
+                        addr.eq((shift << width) | unit),
+                        mode_bits.eq(0),
+                        waited.eq(0),
+                        If(latency == 0,
+                            phase.eq(PHASE_DATA),
+                        ).Else(
+                            phase.eq(PHASE_WAIT),
+                        ),
+                    ),
+                ),
+            ).Elif(phase == PHASE_WAIT,
+                If(sample & has_mode & (mode_bits != 8),
+                    mode.eq((mode << width) | unit),
+                    mode_bits.eq(mode_bits + width),
+                ),
+                If(rise,
+                    waited.eq(waited + 1),
+                    If(waited + 1 == latency,
+                        phase.eq(PHASE_DATA),
+                    ),
+                ),
+            )
+        ]
@@ -1,10 +1,80 @@
-from migen import Module, TSTriple, Cat, Signal, If, wrap
-from litex.soc.interconnect.csr import AutoCSR, CSRStatus, CSRStorage, CSRField
+from migen import Module, TSTriple, Signal, If, Mux
+from litex.soc.interconnect.csr import CSRStatus, CSRStorage, CSRField
 from litex.soc.integration.doc import ModuleDoc
 from litex.build.generic_platform import Pins, Subsignal
-from litex.soc.interconnect import csr_eventmanager as ev
 
-class CapTouchPads(Module, AutoCSR):
+from .inputevents import InputEvents
+
+class CapTouchPad(Module):
+    """Measurement and filtering for a single captouch pad"""
+    def __init__(self, i, enable, tick, press, release, count_bits=16,
+                 filter_shift=2, baseline_shift=5):
+        # While enabled, the pad is driven high whenever it reads low, and
+        # this counts how many clocks it spends reading low in each sample
+        # period.  A finger adds capacitance, which makes the pad slower to
+        # charge.
+        self.oe = Signal()
+        self.count = count = Signal(count_bits)
+        self.filtered = filtered = Signal(count_bits)
+        self.baseline = baseline = Signal(count_bits)
+        self.state = state = Signal()
+        self.changed = changed = Signal()
+
+        self.sync += self.oe.eq(enable & ~i)
+
+        # Differences are signed, with one extra bit so they can't overflow
+        delta = Signal((count_bits + 1, True))
+        filter_step = Signal((count_bits + 1, True))
+        baseline_step = Signal((count_bits + 2, True))
+        started = Signal()
+        self.comb += [
+            filter_step.eq(count - filtered),
+            # Round away from zero, so the baseline always moves towards the
+            # filtered count.  Otherwise drift of less than 2**baseline_shift
+            # is never followed, and builds up until it looks like a press.
+            baseline_step.eq((filtered - baseline
+                              + Mux(filtered > baseline, 2**baseline_shift - 1, 0)) >> baseline_shift),
+            delta.eq(filtered - baseline),
+            changed.eq(tick & started & Mux(state, delta < release, delta > press)),
+        ]
+
+        self.sync += [
+            If(~enable,
+                count.eq(0),
+                started.eq(0),
+                state.eq(0),
+            ).Elif(tick,
+                count.eq(0),
+                If(~started,
+                    # Start both averages from the first full period
+                    started.eq(1),
+                    filtered.eq(count),
+                    baseline.eq(count),
+                ).Else(
+                    # Moving average of the count over about 2**filter_shift periods
+                    filtered.eq(filtered + (filter_step >> filter_shift)),
+                    # The baseline follows slow drift, such as temperature, but
+                    # stops while the pad is touched so a long press isn't
+                    # mistaken for the new normal.
+                    If(~state,
+                        baseline.eq(baseline + baseline_step),
+                    ),
+                    # Never let the baseline fall more than `press` below the
+                    # filtered count, even while touched, so that a release
+                    # is seen however far the count has drifted since.
+                    If(delta > press,
+                        baseline.eq(filtered - press),
+                    ),
+                ),
+                If(changed,
+                    state.eq(~state),
+                ),
+            ).Elif(~i & (count != 2**count_bits - 1),
+                count.eq(count + 1),
+            )
+        ]
+
+class CapTouchPads(InputEvents):
     touch_device = [
         ("touch_pads", 0,
             Subsignal("t1", Pins("touch_pins:0")),
@@ -13,139 +83,99 @@ class CapTouchPads(Module, AutoCSR):
             Subsignal("t4", Pins("touch_pins:3")),
         )
     ]
-    def __init__(self, pads, debugging=False):
+    def __init__(self, pads, sys_clk_freq, debugging=False, npads=4, period=524288,
+                 press=0x0a, release=0x03, fifo_depth=8):
         self.intro = ModuleDoc("""Fomu Touchpads
 
         Fomu has four single-ended exposed pads on its side.  These pads are designed
         to be connected to some captouch block, or driven in a resistive touch mode
         in order to get simple touchpad support.
 
-        This block attempts to implement capacative touch, while still providing
+        This block implements capacitive touch, while still providing
         backwards-compatibility with the original Fomu touchpad interface.
 
-        More research will need to be done in order to determine sane defaults for the
-        trigger levels.
-        """)
-
-        cap_signal_size = 8
-
-        touch1 = TSTriple()
-        touch2 = TSTriple()
-        touch3 = TSTriple()
-        touch4 = TSTriple()
-        self.specials += touch1.get_tristate(pads.t1)
-        self.specials += touch2.get_tristate(pads.t2)
-        self.specials += touch3.get_tristate(pads.t3)
-        self.specials += touch4.get_tristate(pads.t4)
-        ios = [touch1, touch2, touch3, touch4]
-
-        self.o      = CSRStorage(4, description="Output values for pads 1-4", fields=[
-            CSRField("o1", description="Output value for pad 1"),
-            CSRField("o2", description="Output value for pad 2"),
-            CSRField("o3", description="Output value for pad 3"),
-            CSRField("o4", description="Output value for pad 4"),
+        Each pad enabled in ``CAPEN`` is measured once every {} clocks.  The
+        measurement is smoothed with a moving average, and compared against a
+        baseline that slowly follows the untouched pad.  A pad counts as pressed once
+        it rises more than ``{}`` above its baseline, and as released once it falls
+        back below ``{}``.
+
+        The pressed state of each pad is reported through ``STATE``, ``EVENT`` and the
+        ``TOUCH`` interrupt described below, in the same way as a board's button, so
+        the CPU doesn't need to poll pads that haven't changed.  ``CSTAT`` also holds
+        the pressed state of each pad, for firmware written before ``STATE``.
+        """.format(period, press, release))
+
+        self.o      = CSRStorage(npads, description="Output values for pads 1-{}".format(npads), fields=[
+            CSRField("o{}".format(n), description="Output value for pad {}".format(n))
+            for n in range(1, npads + 1)
         ])
-        self.oe     = CSRStorage(4, description="Output enable control for pads 1-4", fields=[
-            CSRField("oe1", description="Output Enable value for pad 1"),
-            CSRField("oe2", description="Output Enable value for pad 2"),
-            CSRField("oe3", description="Output Enable value for pad 3"),
-            CSRField("oe4", description="Output Enable value for pad 4"),
+        self.oe     = CSRStorage(npads, description="Output enable control for pads 1-{}".format(npads), fields=[
+            CSRField("oe{}".format(n), description="Output Enable value for pad {}".format(n))
+            for n in range(1, npads + 1)
         ])
-        self.i      = CSRStatus(4, description="Input value for pads 1-4", fields=[
-            CSRField("i1", description="Input value for pad 1"),
-            CSRField("i2", description="Input value for pad 2"),
-            CSRField("i3", description="Input value for pad 3"),
-            CSRField("i4", description="Input value for pad 4"),
+        self.i      = CSRStatus(npads, description="Input value for pads 1-{}".format(npads), fields=[
+            CSRField("i{}".format(n), description="Input value for pad {}".format(n))
+            for n in range(1, npads + 1)
         ])
-        self.capen  = CSRStorage(4, description="Enable captouch for pads 1-4", fields=[
-            CSRField("t1", description="Enable captouch for pad 1"),
-            CSRField("t2", description="Enable captouch for pad 2"),
-            CSRField("t3", description="Enable captouch for pad 3"),
-            CSRField("t4", description="Enable captouch for pad 4"),
+        self.capen  = CSRStorage(npads, description="Enable captouch for pads 1-{}".format(npads), fields=[
+            CSRField("t{}".format(n), description="Enable captouch for pad {}".format(n))
+            for n in range(1, npads + 1)
         ])
 
-        cper = 524288
-        cap_count_len = 20
-        if debugging:
-            cap_count_len = 32
-            self.cper   = CSRStorage(cap_count_len, description="""The number of clock cycles for one sample period
-
-            The hardware will count how many times the touchpad discharges within this sample
-            period and reflect that value in the corresponding `count` register.""", reset=524288)
-            cper = self.cper.storage
-
-        self.cstat  = CSRStatus(4, description="Current status of the captouch buttons", fields=[
-            CSRField("s1", description="State of pad 1"),
-            CSRField("s2", description="State of pad 2"),
-            CSRField("s3", description="State of pad 3"),
-            CSRField("s4", description="State of pad 4"),
+        self.cstat  = CSRStatus(npads, description="Current status of the captouch buttons", fields=[
+            CSRField("s{}".format(n), description="State of pad {}".format(n))
+            for n in range(1, npads + 1)
         ])
 
-        cpress = 0x0a
-        crel = 0x03
-        if debugging:
-            self.cpress = CSRStorage(cap_signal_size, reset=0x0a, description="Count threshold for triggering a ``press`` event")
-            cpress = self.cpress.storage
-            self.crel   = CSRStorage(cap_signal_size, reset=0x03, description="Count threshold for triggering a ``release`` event")
-            crel = self.crel.storage
+        count_bits = 16
         if debugging:
-            self.c1     = CSRStatus(cap_signal_size, description="Count of events for pad 1")
-            self.c2     = CSRStatus(cap_signal_size, description="Count of events for pad 2")
-            self.c3     = CSRStatus(cap_signal_size, description="Count of events for pad 3")
-            self.c4     = CSRStatus(cap_signal_size, description="Count of events for pad 4")
-
-        cap_count = Signal(cap_count_len)
-        cap1_count = Signal(cap_signal_size)
-        cap2_count = Signal(cap_signal_size)
-        cap3_count = Signal(cap_signal_size)
-        cap4_count = Signal(cap_signal_size)
-
-        self.submodules.ev = ev.EventManager()
-        self.ev.submodules.touch = ev.EventSourcePulse(name="touch", description="""
-            Indicates a touch event such as a "press" or "release" has occurred.""")
-        self.ev.finalize()
-
-        ar = []
-        syn = []
-        cmb = []
-        for num, pad in enumerate(ios, start=1):
-            print("touch{}".format(num))
-            if debugging:
-                exec("ar.append(self.c{}.status.eq(cap{}_count))".format(num, num))
-            exec("ar.append(cap{}_count.eq(0))".format(num))
-
-            # Implement a schmitt trigger in Verilog
-            # 1: Value is 1 and count > crel OR value is 0 and count > cpress
-            # 0: Value is 1 and count < crel OR value is 0 and count < cpress
-            exec("""ar.append(self.cstat.fields.s{}.eq(
-                    (self.cstat.fields.s{} & wrap(cap{}_count > crel)) |
-                    (~self.cstat.fields.s{} & wrap(cap{}_count > cpress))))""".format(num, num, num, num, num))
-
-            exec("cmb.append(pad.o.eq(self.o.fields.o{} | self.capen.fields.t{}))".format(num, num))
-            exec("cmb.append(self.i.fields.i{}.eq(pad.i))".format(num))
-            exec("syn.append(cap{}_count.eq(cap{}_count + (self.capen.fields.t{} & ~pad.i)))".format(num, num, num))
-            exec("syn.append(pad.oe.eq(self.oe.fields.oe{} | (self.capen.fields.t{} & ~pad.i)))".format(num, num))
-
-        # This is used to trigger an interrupt when this value changes
-        last_stat = Signal(4)
-
+            self.cper   = CSRStorage(32, description="""The number of clock cycles for one sample period
+
+            The hardware will count how many clocks each touchpad spends discharged within this
+            sample period and reflect the average in the corresponding `count` register.""", reset=period)
+            period = self.cper.storage
+            self.cpress = CSRStorage(count_bits, reset=press, description="Rise above the baseline for triggering a ``press`` event")
+            press = self.cpress.storage
+            self.crel   = CSRStorage(count_bits, reset=release, description="Rise above the baseline below which a ``release`` event triggers")
+            release = self.crel.storage
+
+        # Count down to the end of each sample period
+        period_count = Signal(32)
+        tick = Signal()
+        self.comb += tick.eq(period_count == 0)
         self.sync += [
-            self.ev.touch.trigger.eq(0),
-
-            last_stat.eq(self.cstat.status),
-            self.ev.touch.trigger.eq(self.cstat.status != last_stat),
-
-            *syn,
-
-            # Perform a captouch tick
-            If(cap_count > 0,
-                cap_count.eq(cap_count - 1),
+            If(tick,
+                period_count.eq(period),
             ).Else(
-                cap_count.eq(cper),
-                *ar,
-            ),
+                period_count.eq(period_count - 1),
+            )
         ]
 
-        self.comb += [
-            *cmb,
-        ]
+        pads_pressed = []
+        for n in range(npads):
+            io = TSTriple()
+            self.specials += io.get_tristate(getattr(pads, "t{}".format(n + 1)))
+
+            pad = CapTouchPad(io.i, self.capen.storage[n], tick, press, release, count_bits=count_bits)
+            setattr(self.submodules, "pad{}".format(n + 1), pad)
+            self.comb += [
+                io.o.eq(self.o.storage[n] | self.capen.storage[n]),
+                io.oe.eq(self.oe.storage[n] | pad.oe),
+                self.i.status[n].eq(io.i),
+                self.cstat.status[n].eq(pad.state),
+            ]
+            pads_pressed.append((pad.state, False))
+
+            if debugging:
+                c = CSRStatus(count_bits, name="c{}".format(n + 1), description="Filtered count for pad {}".format(n + 1))
+                b = CSRStatus(count_bits, name="b{}".format(n + 1), description="Baseline count for pad {}".format(n + 1))
+                setattr(self, "c{}".format(n + 1), c)
+                setattr(self, "b{}".format(n + 1), b)
+                self.comb += [
+                    c.status.eq(pad.filtered),
+                    b.status.eq(pad.baseline),
+                ]
+
+        # The pads filter out noise themselves, so don't debounce them again
+        self.add_inputs(pads_pressed, sys_clk_freq, debounce_ms=0, fifo_depth=fifo_depth, event_name="touch")
@@ -0,0 +1,340 @@
+from migen import Module, Signal, Array, Cat, If, Mux
+from migen.genlib import fifo
+from migen.genlib.fsm import FSM, NextState, NextValue
+from litex.soc.integration.doc import AutoDoc, ModuleDoc
+from litex.soc.interconnect.csr import AutoCSR, CSRStatus, CSRStorage, CSRField
+from litex.soc.interconnect import csr_eventmanager as ev
+from litex.soc.interconnect import wishbone
+
+PRIME32_1 = 0x9E3779B1
+PRIME32_2 = 0x85EBCA77
+PRIME32_3 = 0xC2B2AE3D
+PRIME32_4 = 0x27D4EB2F
+PRIME32_5 = 0x165667B1
+
+CRC32_POLYNOMIAL = 0xEDB88320
+
+ALGORITHM_XXH32 = 0
+ALGORITHM_CRC32 = 1
+
+def rotl(value, amount):
+    return Cat(value[32-amount:], value[:32-amount])
+
+def crc32_byte(crc, byte):
+    """Return an expression for the reflected CRC-32 of `crc` after `byte`"""
+    bits = [crc[i] ^ byte[i] if i < 8 else crc[i] for i in range(32)]
+    for _ in range(8):
+        lsb = bits[0]
+        bits = [(bits[i+1] if i < 31 else 0) ^ (lsb if (CRC32_POLYNOMIAL >> i) & 1 else 0)
+                for i in range(32)]
+    return Cat(*bits)
+
+class _Multiplier(Module):
+    """Iterative 32x32 multiplier, returning the low 32 bits of the product.
+
+    This takes `32/radix` cycles, and avoids needing DSP blocks or a large
+    array multiplier."""
+    def __init__(self, radix=4):
+        self.a = Signal(32)
+        self.b = Signal(32)
+        self.start = Signal()
+        self.done = Signal()
+        self.p = Signal(32)
+
+        acc = Signal(32)
+        a = Signal(32)
+        b = Signal(32)
+        steps = Signal(max=32//radix + 1)
+        self.comb += [
+            self.done.eq(steps == 0),
+            self.p.eq(acc),
+        ]
+        self.sync += [
+            If(self.start,
+                acc.eq(0),
+                a.eq(self.a),
+                b.eq(self.b),
+                steps.eq(32//radix),
+            ).Elif(steps != 0,
+                acc.eq(acc + a * b[:radix]),
+                a.eq(a << radix),
+                b.eq(b >> radix),
+                steps.eq(steps - 1),
+            )
+        ]
+
+class HashAccelerator(Module, AutoCSR, AutoDoc):
+    """XXH32 and CRC-32 hash engine"""
+    def __init__(self, fifo_depth=8, radix=4):
+        self.intro = ModuleDoc("""Hash Accelerator
+
+            Computes the 32-bit xxHash (``XXH32()``, as used by Booster to check
+            updates) or the zlib CRC-32 of a stream of bytes.  On a CPU without a
+            multiplier, XXH32 in software costs hundreds of cycles per word.
+
+            Write ``SEED`` and ``CTRL`` with ``RESET`` set and ``ALGORITHM`` chosen, then
+            feed it data.  Data can either be written a word at a time to ``DATA``
+            (four bytes, little-endian) or a byte at a time to ``BYTE``, as long as
+            ``STATUS.FULL`` is ``0``.  Alternatively, set ``SRC`` and ``LENGTH`` and
+            write ``CTRL.READ`` to have the block fetch the data over the bus by itself,
+            for example straight out of ``spiflash``.  Don't write to ``DATA`` or ``BYTE``
+            while a read is in progress.
+
+            Finally write ``CTRL.FINISH``.  When ``STATUS.BUSY`` goes to ``0`` (or the
+            ``DONE`` interrupt fires), the result is in ``DIGEST``.  For CRC-32, ``SEED``
+            is the running CRC value to continue from, as with zlib's ``crc32()``.
+            """)
+
+        self.bus = bus = wishbone.Interface()
+
+        self.seed = CSRStorage(32, description="XXH32 seed, or initial CRC-32 value.")
+        self.data = CSRStorage(32, description="Write to add four bytes, least significant byte first.")
+        self.byte = CSRStorage(8, description="Write to add a single byte.")
+        self.src = CSRStorage(32, description="Bus address to read data from when ``CTRL.READ`` is written.")
+        self.length = CSRStorage(32, description="Number of bytes to read from ``SRC``.")
+        self.ctrl = CSRStorage(fields=[
+            CSRField("reset", description="Write ``1`` to start a new hash, using ``SEED`` and ``ALGORITHM``."),
+            CSRField("algorithm", values=[
+                ("0", "XXH32", "32-bit xxHash"),
+                ("1", "CRC32", "zlib CRC-32"),
+            ], description="Which hash to compute."),
+            CSRField("read", description="Write ``1`` to read ``LENGTH`` bytes from ``SRC``."),
+            CSRField("finish", description="Write ``1`` once all data has been added to compute ``DIGEST``."),
+        ])
+        self.status = CSRStatus(fields=[
+            CSRField("busy", description="``1`` while data is being processed or read."),
+            CSRField("full", description="``1`` if there is no room to write to ``DATA`` or ``BYTE``."),
+        ])
+        self.digest = CSRStatus(32, description="Result of the hash, valid once ``FINISH`` has completed.")
+
+        self.submodules.ev = ev.EventManager()
+        self.ev.submodules.done = ev.EventSourcePulse(name="done", description="""
+            Indicates that ``DIGEST`` is ready.""")
+        self.ev.finalize()
+
+        # Input words, along with the number of bytes in each that are valid
+        self.submodules.input = inp = fifo.SyncFIFO(32 + 3, fifo_depth)
+        self.submodules.mul = mul = _Multiplier(radix)
+
+        algorithm = Signal()
+        seed = Signal(32)
+        total = Signal(32)
+        finish_pending = Signal()
+
+        # Bus reader
+        read_adr = Signal(30)
+        read_left = Signal(32)
+        reader_busy = Signal()
+        din_word = Signal(32)
+        din_bytes = Signal(3)
+        self.comb += [
+            If(bus.ack,
+                din_word.eq(bus.dat_r),
+                din_bytes.eq(Mux(read_left > 4, 4, read_left[:3])),
+            ).Elif(self.data.re,
+                din_word.eq(self.data.storage),
+                din_bytes.eq(4),
+            ).Else(
+                din_word.eq(self.byte.storage),
+                din_bytes.eq(1),
+            ),
+            inp.din.eq(Cat(din_word, din_bytes)),
+            inp.we.eq(bus.ack | self.data.re | self.byte.re),
+            bus.sel.eq(0xf),
+            bus.adr.eq(read_adr),
+            bus.cyc.eq(reader_busy & inp.writable),
+            bus.stb.eq(reader_busy & inp.writable),
+            reader_busy.eq(read_left != 0),
+        ]
+        self.sync += [
+            If(self.ctrl.re & self.ctrl.fields.read,
+                read_adr.eq(self.src.storage[2:]),
+                read_left.eq(self.length.storage),
+            ).Elif(bus.ack,
+                read_adr.eq(read_adr + 1),
+                read_left.eq(Mux(read_left > 4, read_left - 4, 0)),
+            )
+        ]
+
+        # Bytes waiting to be fed in, from the word at the head of the FIFO
+        word = Signal(32)
+        word_bytes = Signal(3)
+
+        # XXH32 state: accumulators, and a 16-byte stripe buffer
+        acc = Array(Signal(32) for _ in range(4))
+        stripe = Array(Signal(8) for _ in range(16))
+        stripe_words = Array(Cat(*[stripe[4*i+j] for j in range(4)]) for i in range(4))
+        fill = Signal(5)
+        lane = Signal(2)
+        h = Signal(32)
+        pos = Signal(5)
+
+        crc = Signal(32)
+
+        # Sums wrap at 32 bits, so keep the carry out of the rotations
+        lane_sum = Signal(32)
+        tail_sum = Signal(32)
+        self.comb += [
+            lane_sum.eq(acc[lane] + mul.p),
+            tail_sum.eq(h + mul.p),
+        ]
+
+        busy = Signal()
+        self.comb += [
+            self.status.fields.busy.eq(busy),
+            self.status.fields.full.eq(~inp.writable),
+        ]
+
+        self.submodules.fsm = fsm = FSM(reset_state="IDLE")
+        self.comb += busy.eq(~fsm.ongoing("IDLE") | inp.readable | reader_busy | finish_pending)
+        self.sync += [
+            If(self.ctrl.re & self.ctrl.fields.finish,
+                finish_pending.eq(1),
+            ).Elif(fsm.ongoing("DONE"),
+                finish_pending.eq(0),
+            )
+        ]
+
+        fsm.act("IDLE",
+            If(self.ctrl.re & self.ctrl.fields.reset,
+                NextValue(algorithm, self.ctrl.fields.algorithm),
+                NextValue(seed, self.seed.storage),
+                NextValue(acc[0], self.seed.storage + PRIME32_1 + PRIME32_2),
+                NextValue(acc[1], self.seed.storage + PRIME32_2),
+                NextValue(acc[2], self.seed.storage),
+                NextValue(acc[3], self.seed.storage - PRIME32_1),
+                NextValue(crc, ~self.seed.storage),
+                NextValue(total, 0),
+                NextValue(fill, 0),
+            ).Elif(inp.readable,
+                inp.re.eq(1),
+                NextValue(word, inp.dout[:32]),
+                NextValue(word_bytes, inp.dout[32:]),
+                NextState("BYTES"),
+            ).Elif(finish_pending & ~reader_busy,
+                If(algorithm == ALGORITHM_CRC32,
+                    NextValue(self.digest.status, ~crc),
+                    NextState("DONE"),
+                ).Else(
+                    NextState("MERGE"),
+                )
+            )
+        )
+        # Feed one byte per cycle into either the CRC or the stripe buffer.
+        fsm.act("BYTES",
+            If(word_bytes == 0,
+                NextState("IDLE"),
+            ).Else(
+                NextValue(word, word[8:]),
+                NextValue(word_bytes, word_bytes - 1),
+                NextValue(total, total + 1),
+                NextValue(crc, crc32_byte(crc, word[:8])),
+                If(algorithm == ALGORITHM_XXH32,
+                    NextValue(stripe[fill[:4]], word[:8]),
+                    NextValue(fill, fill + 1),
+                    If(fill == 15,
+                        NextValue(lane, 0),
+                        NextState("LANE"),
+                    )
+                )
+            )
+        )
+        # acc[lane] = rotl(acc[lane] + word * PRIME32_2, 13) * PRIME32_1
+        fsm.act("LANE",
+            mul.a.eq(stripe_words[lane]),
+            mul.b.eq(PRIME32_2),
+            mul.start.eq(1),
+            NextState("LANE_ROUND"),
+        )
+        fsm.act("LANE_ROUND",
+            If(mul.done,
+                mul.a.eq(rotl(lane_sum, 13)),
+                mul.b.eq(PRIME32_1),
+                mul.start.eq(1),
+                NextState("LANE_STORE"),
+            )
+        )
+        fsm.act("LANE_STORE",
+            If(mul.done,
+                NextValue(acc[lane], mul.p),
+                NextValue(lane, lane + 1),
+                If(lane == 3,
+                    NextValue(fill, 0),
+                    NextState("BYTES"),
+                ).Else(
+                    NextState("LANE"),
+                )
+            )
+        )
+        # Combine the accumulators, then mix in whatever is left in the stripe.
+        fsm.act("MERGE",
+            If(total >= 16,
+                NextValue(h, rotl(acc[0], 1) + rotl(acc[1], 7) + rotl(acc[2], 12) + rotl(acc[3], 18) + total),
+            ).Else(
+                NextValue(h, seed + PRIME32_5 + total),
+            ),
+            NextValue(pos, 0),
+            NextState("TAIL"),
+        )
+        fsm.act("TAIL",
+            If(pos + 4 <= fill,
+                # h = rotl(h + word * PRIME32_3, 17) * PRIME32_4
+                mul.a.eq(stripe_words[pos[2:4]]),
+                mul.b.eq(PRIME32_3),
+                mul.start.eq(1),
+                NextState("TAIL_WORD"),
+            ).Elif(pos < fill,
+                # h = rotl(h + byte * PRIME32_5, 11) * PRIME32_1
+                mul.a.eq(stripe[pos[:4]]),
+                mul.b.eq(PRIME32_5),
+                mul.start.eq(1),
+                NextState("TAIL_BYTE"),
+            ).Else(
+                mul.a.eq(h ^ h[15:]),
+                mul.b.eq(PRIME32_2),
+                mul.start.eq(1),
+                NextState("AVALANCHE"),
+            )
+        )
+        fsm.act("TAIL_WORD",
+            If(mul.done,
+                mul.a.eq(rotl(tail_sum, 17)),
+                mul.b.eq(PRIME32_4),
+                mul.start.eq(1),
+                NextValue(pos, pos + 4),
+                NextState("TAIL_STORE"),
+            )
+        )
+        fsm.act("TAIL_BYTE",
+            If(mul.done,
+                mul.a.eq(rotl(tail_sum, 11)),
+                mul.b.eq(PRIME32_1),
+                mul.start.eq(1),
+                NextValue(pos, pos + 1),
+                NextState("TAIL_STORE"),
+            )
+        )
+        fsm.act("TAIL_STORE",
+            If(mul.done,
+                NextValue(h, mul.p),
+                NextState("TAIL"),
+            )
+        )
+        fsm.act("AVALANCHE",
+            If(mul.done,
+                mul.a.eq(mul.p ^ mul.p[13:]),
+                mul.b.eq(PRIME32_3),
+                mul.start.eq(1),
+                NextState("AVALANCHE_FINAL"),
+            )
+        )
+        fsm.act("AVALANCHE_FINAL",
+            If(mul.done,
+                NextValue(self.digest.status, mul.p ^ mul.p[16:]),
+                NextState("DONE"),
+            )
+        )
+        fsm.act("DONE",
+            self.ev.done.trigger.eq(1),
+            NextState("IDLE"),
+        )
@@ -0,0 +1,130 @@
+from migen import Module, Signal, Cat, C, If
+from migen.genlib import fifo
+from migen.genlib.cdc import MultiReg
+from litex.soc.interconnect.csr import AutoCSR, CSRStatus, CSRField
+from litex.soc.integration.doc import AutoDoc, ModuleDoc
+from litex.soc.interconnect import csr_eventmanager as ev
+
+class InputEvents(Module, AutoCSR, AutoDoc):
+    """Debounced, timestamped press and release events for a set of inputs.
+
+    This is the common part of the button and touch pad blocks, which call
+    `add_inputs()` with their own signals so that firmware sees the same
+    registers whichever kind of input a board has."""
+    def add_inputs(self, inputs, sys_clk_freq, debounce_ms=10, fifo_depth=8, event_name="change"):
+        """`inputs` is a list of `(signal, active_low)`.  Inputs that are
+        already filtered, such as captouch pads, can use a `debounce_ms`
+        of `0`.  `event_name` names the interrupt, so that blocks which
+        already had one can keep its name."""
+        n = len(inputs)
+        self.events_intro = ModuleDoc("""Input Events
+
+            ``STATE`` holds the debounced state of each input, where ``1`` means pressed.
+            An input must hold a new value for {} ms before it is believed.  ``STATE`` is
+            loaded from the inputs straight out of reset, without waiting for the debounce
+            time, so early boot code can read it at once.
+
+            Each press and release after that is written to a FIFO, along with the time it
+            happened in milliseconds since reset, and raises the ``{}`` interrupt.  Read
+            ``EVENT`` to take the oldest one.  If inputs change in the same cycle, the
+            lowest-numbered input is recorded first.
+            """.format(debounce_ms, event_name.upper()))
+
+        self.state  = CSRStatus(n, description="Debounced state of each input, ``1`` when pressed.")
+        self.event  = CSRStatus(32, description="Oldest input event.  Reading this register removes it from the FIFO.", fields=[
+            CSRField("time", size=24, description="Milliseconds since reset, modulo 2**24, when the event happened."),
+            CSRField("input", size=4, description="Input that changed, counting from ``0``."),
+            CSRField("pressed", offset=31, description="``1`` if the input was pressed, ``0`` if it was released."),
+        ])
+        self.status = CSRStatus(fields=[
+            CSRField("have", description="``1`` if ``EVENT`` holds an event."),
+            CSRField("overflow", description="``1`` if events were lost because the FIFO was full.  Cleared by reading ``EVENT``."),
+        ])
+
+        self.submodules.ev = ev.EventManager()
+        setattr(self.ev.submodules, event_name, ev.EventSourcePulse(name=event_name, description="""
+            An input was pressed or released, and the event is waiting in ``EVENT``."""))
+        self.ev.finalize()
+        event = getattr(self.ev, event_name)
+
+        # Millisecond tick, used for both debouncing and timestamps
+        ms_period = int(sys_clk_freq // 1000)
+        ms_count = Signal(max=ms_period)
+        ms_tick = Signal()
+        timestamp = Signal(24)
+        self.comb += ms_tick.eq(ms_count == 0)
+        self.sync += [
+            If(ms_tick,
+                ms_count.eq(ms_period - 1),
+                timestamp.eq(timestamp + 1),
+            ).Else(
+                ms_count.eq(ms_count - 1),
+            )
+        ]
+
+        # Wait for the synchronisers to fill before taking the initial state
+        primed = Signal()
+        prime_count = Signal(2)
+        self.sync += If(~primed,
+            prime_count.eq(prime_count + 1),
+            If(prime_count == 3, primed.eq(1)),
+        )
+
+        changed = Signal(n)
+        for num, (signal, active_low) in enumerate(inputs):
+            raw = Signal()
+            self.specials += MultiReg(~signal if active_low else signal, raw)
+            state = self.state.status[num]
+            if debounce_ms:
+                stable = Signal(max=debounce_ms + 1)
+                self.comb += changed[num].eq(primed & (raw != state) & (stable == debounce_ms))
+                self.sync += [
+                    If(raw == state,
+                        stable.eq(0),
+                    ).Elif(changed[num],
+                        stable.eq(0),
+                    ).Elif(ms_tick,
+                        stable.eq(stable + 1),
+                    )
+                ]
+            else:
+                self.comb += changed[num].eq(primed & (raw != state))
+            self.sync += [
+                If(~primed,
+                    state.eq(raw),
+                ).Elif(changed[num],
+                    state.eq(raw),
+                )
+            ]
+
+        self.submodules.fifo = events = fifo.SyncFIFO(32, fifo_depth)
+        overflow = Signal()
+
+        # Several inputs can change at once, so record them one after
+        # another, lowest input first.
+        pending = Signal(n)
+        pending_input = Signal(4)
+        pending_state = Signal()
+        push = Signal()
+        for num in reversed(range(n)):
+            self.comb += If(pending[num],
+                pending_input.eq(num),
+                pending_state.eq(self.state.status[num]),
+            )
+        for num in range(n):
+            self.sync += pending[num].eq(changed[num] | (pending[num] & ~(push & (pending_input == num))))
+
+        self.comb += [
+            push.eq(pending != 0),
+            events.din.eq(Cat(timestamp, pending_input, C(0, 3), pending_state)),
+            events.we.eq(push),
+            events.re.eq(self.event.we),
+            self.event.status.eq(events.dout),
+            self.status.fields.have.eq(events.readable),
+            self.status.fields.overflow.eq(overflow),
+            event.trigger.eq(push & events.writable),
+        ]
+        self.sync += [
+            If(push & ~events.writable, overflow.eq(1)),
+            If(self.event.we, overflow.eq(0)),
+        ]
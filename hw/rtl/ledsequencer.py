@@ -0,0 +1,170 @@
+from migen import Module, Signal, Array, Memory, Cat, If, Mux, log2_int
+from litex.soc.interconnect.csr import AutoCSR, CSRStatus, CSRStorage, CSRField
+from litex.soc.integration.doc import AutoDoc, ModuleDoc
+
+class LEDSequencer(Module, AutoCSR, AutoDoc):
+    """Plays colour keyframes on an RGB LED without the CPU"""
+    def __init__(self, sys_clk_freq, npatterns=8, nkeyframes=64):
+        """The LED block that owns this sequencer shows `r`, `g` and `b`
+        instead of its own colour whenever `active` is set."""
+        self.intro = ModuleDoc("""LED Pattern Sequencer
+
+            Holds up to {} keyframes, which can be grouped into {} patterns, and plays
+            them on the LED so the CPU doesn't have to.  Each keyframe is a colour and a
+            duration in milliseconds.  If the keyframe fades, the LED moves smoothly from
+            the previous colour to the new one over the duration; otherwise it changes
+            straight away and holds the new colour.
+
+            To load a pattern, write the index of its first keyframe to ``ADDRESS``, then
+            for each keyframe write ``COLOUR`` followed by ``TIMING``.  Each write to
+            ``TIMING`` stores a keyframe and moves on to the next index.  Mark the final
+            keyframe with ``TIMING.LAST``, and write the pattern number and first index
+            to ``DEFINE``.  Patterns loop until another is played, unless the final
+            keyframe also sets ``TIMING.HOLD``, in which case its colour is kept.
+
+            Writing ``PLAY`` with ``PLAY.ENABLE`` set starts a pattern from its first
+            keyframe.  Writing it with ``PLAY.ENABLE`` clear hands the LED back to the
+            rest of the LED block.
+            """.format(nkeyframes, npatterns))
+
+        self.r = Signal(8)
+        self.g = Signal(8)
+        self.b = Signal(8)
+        self.active = Signal()
+
+        index_bits = log2_int(nkeyframes)
+        pattern_bits = log2_int(npatterns)
+
+        self.address = CSRStorage(index_bits, description="Keyframe stored by the next write to ``TIMING``.")
+        self.colour = CSRStorage(fields=[
+            CSRField("r", size=8, description="Red level of the keyframe."),
+            CSRField("g", size=8, description="Green level of the keyframe."),
+            CSRField("b", size=8, description="Blue level of the keyframe."),
+        ], description="Colour of the next keyframe to store.")
+        self.timing = CSRStorage(fields=[
+            CSRField("duration", size=16, description="Milliseconds to spend on the keyframe."),
+            CSRField("fade", description="Set to ``1`` to fade from the previous colour instead of switching to this one at once."),
+            CSRField("last", description="Set to ``1`` on the final keyframe of a pattern."),
+            CSRField("hold", description="Set to ``1``, along with ``LAST``, to stop on this keyframe instead of looping."),
+        ], description="Writing this stores ``COLOUR`` and this timing as a keyframe, then advances to the next index.")
+        self.define = CSRStorage(fields=[
+            CSRField("start", size=index_bits, description="Index of the first keyframe of the pattern."),
+            CSRField("pattern", size=pattern_bits, offset=16, description="Pattern to define."),
+        ], description="Set where a pattern starts.")
+        self.play = CSRStorage(fields=[
+            CSRField("pattern", size=pattern_bits, description="Pattern to play."),
+            CSRField("enable", offset=7, description="Set to ``1`` to play the pattern, or ``0`` to stop."),
+        ], description="Start or stop playing a pattern.")
+        self.status = CSRStatus(fields=[
+            CSRField("playing", description="``1`` while a pattern is running, ``0`` once it has stopped or been held."),
+            CSRField("keyframe", size=index_bits, offset=8, description="Keyframe currently showing."),
+        ])
+
+        # Keyframes are the colour, then the timing
+        self.specials.mem = mem = Memory(24 + 19, nkeyframes)
+        wr_port = mem.get_port(write_capable=True)
+        rd_port = mem.get_port()
+        self.specials += wr_port, rd_port
+        self.autocsr_exclude = ['mem']
+
+        wr_index = Signal(index_bits)
+        self.comb += [
+            wr_port.adr.eq(wr_index),
+            wr_port.dat_w.eq(Cat(self.colour.storage[:24], self.timing.storage[:19])),
+            wr_port.we.eq(self.timing.re),
+        ]
+        self.sync += [
+            If(self.address.re,
+                wr_index.eq(self.address.storage),
+            ).Elif(self.timing.re,
+                wr_index.eq(wr_index + 1),
+            )
+        ]
+
+        starts = Array(Signal(index_bits) for _ in range(npatterns))
+        self.sync += If(self.define.re, starts[self.define.fields.pattern].eq(self.define.fields.start))
+
+        # Millisecond tick for timing the keyframes
+        ms_period = int(sys_clk_freq // 1000)
+        ms_count = Signal(max=ms_period)
+        ms_tick = Signal()
+        self.comb += ms_tick.eq(ms_count == 0)
+        self.sync += If(ms_tick, ms_count.eq(ms_period - 1)).Else(ms_count.eq(ms_count - 1))
+
+        index = Signal(index_bits)
+        first = Signal(index_bits)
+        loading = Signal()
+        starting = Signal()
+        running = Signal()
+        elapsed = Signal(16)
+        duration = Signal(16)
+        fade = Signal()
+        last = Signal()
+        hold = Signal()
+
+        self.comb += [
+            rd_port.adr.eq(index),
+            self.active.eq(self.play.fields.enable),
+            self.status.fields.playing.eq(loading | starting | running),
+            self.status.fields.keyframe.eq(index),
+        ]
+
+        # Each channel fades by stepping its level one at a time, spreading
+        # the distance to the target evenly across the keyframe's duration.
+        channels = []
+        for n, level in enumerate([self.r, self.g, self.b]):
+            target = Signal(8)
+            distance = Signal(8)
+            acc = Signal(18)
+            channels.append((level, target, distance, acc, rd_port.dat_r[8*n:8*(n + 1)]))
+
+        keyframe_duration = rd_port.dat_r[24:40]
+        self.sync += [
+            If(self.play.re,
+                index.eq(starts[self.play.fields.pattern]),
+                first.eq(starts[self.play.fields.pattern]),
+                loading.eq(self.play.fields.enable),
+                starting.eq(0),
+                running.eq(0),
+            ).Elif(loading,
+                # Give the memory a cycle to read the keyframe
+                loading.eq(0),
+                starting.eq(1),
+            ).Elif(starting,
+                starting.eq(0),
+                running.eq(1),
+                elapsed.eq(0),
+                duration.eq(keyframe_duration),
+                fade.eq(rd_port.dat_r[40]),
+                last.eq(rd_port.dat_r[41]),
+                hold.eq(rd_port.dat_r[42]),
+                *[[
+                    target.eq(new),
+                    distance.eq(Mux(new > level, new - level, level - new)),
+                    acc.eq(0),
+                    If(~rd_port.dat_r[40], level.eq(new)),
+                ] for (level, target, distance, acc, new) in channels],
+            ).Elif(running,
+                If(ms_tick,
+                    If(elapsed + 1 >= duration,
+                        running.eq(0),
+                        *[level.eq(target) for (level, target, _, _, _) in channels],
+                        If(~last,
+                            index.eq(index + 1),
+                            loading.eq(1),
+                        ).Elif(~hold,
+                            index.eq(first),
+                            loading.eq(1),
+                        ),
+                    ).Else(
+                        elapsed.eq(elapsed + 1),
+                        *[If(fade, acc.eq(acc + distance)) for (_, _, distance, acc, _) in channels],
+                    ),
+                ).Else(
+                    *[If((acc >= duration) & (level != target),
+                        acc.eq(acc - duration),
+                        level.eq(Mux(target > level, level + 1, level - 1)),
+                    ) for (level, target, _, acc, _) in channels],
+                ),
+            )
+        ]
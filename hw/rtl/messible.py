@@ -1,16 +1,19 @@
-from migen import Module
+from migen import Module, Signal, If
 from migen.genlib import fifo
 from litex.soc.integration.doc import AutoDoc, ModuleDoc
 from litex.soc.interconnect.csr import AutoCSR, CSRStatus, CSRStorage, CSRField
+from litex.soc.interconnect import csr_eventmanager as ev
+from litex.soc.interconnect import wishbone
 
 class Messible(Module, AutoCSR, AutoDoc):
     """Messaging-style Ansible"""
-    def __init__(self):
-        self.submodules.fifo = f = fifo.SyncFIFOBuffered(width=8, depth=64)
-        in_reg = CSRStorage(8, name="in", description="""
+    def __init__(self, width=8, depth=64, with_window=False, with_irq=False):
+        assert width <= 32
+        self.submodules.fifo = f = fifo.SyncFIFOBuffered(width=width, depth=depth)
+        in_reg = CSRStorage(width, name="in", description="""
                     Write half of the FIFO to send data out the Messible.
                     Writing to this register advances the write pointer automatically.""")
-        out_reg = CSRStatus(8, name="out", description="""
+        out_reg = CSRStatus(width, name="out", description="""
                     Read half of the FIFO to receive data on the Messible.
                     Reading from this register advances the read pointer automatically.""")
 
@@ -20,6 +23,8 @@ class Messible(Module, AutoCSR, AutoDoc):
             CSRField("full", description="``0`` if more data can fit into the IN FIFO."),
             CSRField("have", description="``1`` if data can be read from the OUT FIFO."),
         ])
+        self.level = CSRStatus(len(f.level), description="""
+                    Number of entries currently in the FIFO, out of {}.""".format(depth))
 
         self.intro = ModuleDoc("""
                 Messible: An Ansible for Messages
@@ -41,7 +46,10 @@ class Messible(Module, AutoCSR, AutoDoc):
                 From the host side, you need to read ``STATUS.HAVE`` to see if there is data
                 in the FIFO.  If there is, read ``OUT`` to get the most recent byte, which automatically
                 advances the ``READ`` pointer.
-                """)
+
+                Each entry is {} bits wide, and the FIFO holds {} of them.  Reading ``LEVEL``
+                tells the host how many entries it can take at once.
+                """.format(width, depth))
 
         self.comb += [
             f.din.eq(in_reg.storage),
@@ -50,4 +58,37 @@ class Messible(Module, AutoCSR, AutoDoc):
             f.re.eq(out_reg.we),
             status.fields.full.eq(~f.writable),
             status.fields.have.eq(f.readable),
+            self.level.status.eq(f.level),
         ]
+
+        if with_window:
+            self.window_doc = ModuleDoc("""Drain Window
+
+                Reading ``OUT`` costs a separate bridge transaction per entry, plus another
+                for ``STATUS``.  The Messible can also be mapped onto the bus as a window,
+                where a read from any address removes one entry from the FIFO and returns
+                it.  After reading ``LEVEL``, the host can drain that many entries with a
+                single bridge read of consecutive words from the window.  Reads from an
+                empty FIFO return ``0`` and do not wait.
+                """)
+            self.bus = bus = wishbone.Interface()
+            # Acknowledge a cycle after the request, popping the entry that is
+            # being returned at the same time.
+            window_ack = Signal()
+            self.comb += [
+                If(f.readable,
+                    bus.dat_r.eq(f.dout),
+                ),
+                bus.ack.eq(window_ack),
+                If(window_ack & ~bus.we & f.readable,
+                    f.re.eq(1),
+                ),
+            ]
+            self.sync += window_ack.eq(bus.cyc & bus.stb & ~window_ack)
+
+        if with_irq:
+            self.submodules.ev = ev.EventManager()
+            self.ev.submodules.space = ev.EventSourceProcess(description="""
+                Indicates the FIFO is no longer full, so the device can resume writing.""")
+            self.ev.finalize()
+            self.comb += self.ev.space.trigger.eq(~f.writable)
@@ -0,0 +1,75 @@
+from migen import Module, Signal, Memory, If, log2_int
+from litex.soc.integration.doc import AutoDoc, ModuleDoc
+from litex.soc.interconnect.csr import AutoCSR, CSRStatus, CSRStorage, CSRField
+from litex.soc.interconnect import wishbone
+
+class PCSampler(Module, AutoCSR, AutoDoc):
+    """Statistical program counter sampler"""
+    def __init__(self, pc, valid, depth=1024):
+        """`pc` is sampled on a clock where `valid` is high, once each period."""
+        self.intro = ModuleDoc("""PC Sampler
+
+            Every ``PERIOD`` clocks, the address of the next instruction the CPU
+            completes is written into a ring buffer of {} words, without stopping the
+            CPU.  Over a long enough run, the number of samples that land in each
+            function is proportional to the time spent there.
+
+            The ring buffer is mapped onto the bus, so a host can read it through any
+            of the debug bridges.  ``SAMPLES`` counts every sample taken since the last
+            reset; the most recent one was written to entry ``(SAMPLES - 1) % {}``.
+            ``util/pcprofile.py`` does this and turns the result into input for
+            ``flamegraph.pl``.
+            """.format(depth, depth))
+
+        self.bus = bus = wishbone.Interface()
+
+        self.ctrl = CSRStorage(fields=[
+            CSRField("enable", description="Set to ``1`` to take samples."),
+            CSRField("reset", description="Write ``1`` to empty the buffer and reset ``SAMPLES``."),
+        ])
+        self.period = CSRStorage(32, reset=1000, description="Number of clocks between samples.")
+        self.samples = CSRStatus(32, description="Number of samples taken since the buffer was last reset.")
+
+        self.specials.mem = mem = Memory(32, depth)
+        wr_port = mem.get_port(write_capable=True)
+        rd_port = mem.get_port()
+        self.specials += wr_port, rd_port
+        self.autocsr_exclude = ['mem']
+
+        countdown = Signal(32)
+        pending = Signal()
+        samples = Signal(32)
+        self.comb += [
+            wr_port.adr.eq(samples[:log2_int(depth)]),
+            wr_port.dat_w.eq(pc),
+            wr_port.we.eq(self.ctrl.fields.enable & pending & valid),
+            self.samples.status.eq(samples),
+        ]
+        self.sync += [
+            If(self.ctrl.re & self.ctrl.fields.reset,
+                samples.eq(0),
+                pending.eq(0),
+                countdown.eq(0),
+            ).Elif(self.ctrl.fields.enable,
+                If(pending & valid,
+                    samples.eq(samples + 1),
+                    pending.eq(0),
+                ),
+                If(countdown == 0,
+                    countdown.eq(self.period.storage),
+                    pending.eq(1),
+                ).Else(
+                    countdown.eq(countdown - 1),
+                ),
+            )
+        ]
+
+        # Read-only window onto the buffer, acknowledged a clock after the
+        # request like block RAM.
+        ack = Signal()
+        self.comb += [
+            rd_port.adr.eq(bus.adr[:log2_int(depth)]),
+            bus.dat_r.eq(rd_port.dat_r),
+            bus.ack.eq(ack),
+        ]
+        self.sync += ack.eq(bus.cyc & bus.stb & ~ack)
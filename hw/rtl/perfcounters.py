@@ -0,0 +1,66 @@
+from migen import Module, Signal, If
+from migen.genlib.cdc import PulseSynchronizer
+from litex.soc.integration.doc import AutoDoc, ModuleDoc
+from litex.soc.interconnect.csr import AutoCSR, CSRStatus, CSRStorage, CSRField
+
+class PerfCounters(Module, AutoCSR, AutoDoc):
+    """Hardware performance counters"""
+    def __init__(self, events):
+        """`events` is a list of `(name, signal, domain, description)`.  Each
+        clock that `signal` is high in `domain` adds one to that counter."""
+        self.intro = ModuleDoc("""Performance Counters
+
+            A free-running 64-bit ``CYCLES`` counter, plus one 32-bit counter for each
+            event the SoC was built with, such as clocks that a bus slave kept a master
+            waiting, clocks the flash controller was busy, and USB packets and NAKs for
+            each endpoint.  The full list is below.
+
+            The counters run all the time, but reading them directly would tear as the
+            CPU reads one after another.  Instead, write ``1`` to ``CTRL.SNAPSHOT`` to
+            copy every counter into its register on the same clock, then read them at
+            leisure.  Set ``CTRL.RESET`` as well to start counting again from zero
+            straight after the snapshot.
+            """)
+
+        self.ctrl = CSRStorage(fields=[
+            CSRField("snapshot", description="Write ``1`` to copy every counter into its register."),
+            CSRField("reset", description="Write ``1`` to reset every counter to ``0``, after taking any snapshot."),
+        ])
+        self.cycles = CSRStatus(64, description="Clocks since the counters were last reset.")
+
+        snapshot = Signal()
+        reset = Signal()
+        self.comb += [
+            snapshot.eq(self.ctrl.re & self.ctrl.fields.snapshot),
+            reset.eq(self.ctrl.re & self.ctrl.fields.reset),
+        ]
+
+        cycles = Signal(64)
+        self.sync += [
+            If(snapshot, self.cycles.status.eq(cycles)),
+            If(reset,
+                cycles.eq(0),
+            ).Else(
+                cycles.eq(cycles + 1),
+            ),
+        ]
+
+        for (name, signal, domain, description) in events:
+            # Bring events from other clock domains over as single pulses
+            if domain != "sys":
+                ps = PulseSynchronizer(domain, "sys")
+                self.submodules += ps
+                self.comb += ps.i.eq(signal)
+                signal = ps.o
+
+            csr = CSRStatus(32, name=name, description=description)
+            setattr(self, name, csr)
+            count = Signal(32)
+            self.sync += [
+                If(snapshot, csr.status.eq(count)),
+                If(reset,
+                    count.eq(0),
+                ).Elif(signal,
+                    count.eq(count + 1),
+                ),
+            ]
@@ -2,11 +2,20 @@ from migen import Module, Signal, Cat, TSTriple, bits_for, ResetSignal, If, Cloc
 from litex.soc.interconnect.csr import AutoCSR, CSRStatus, CSRStorage, CSRField
 from litex.soc.interconnect import wishbone
 
+from .flashcache import FlashCache
+from .burstram import CTI_INCREMENTING, CTI_END_OF_BURST
+
 class PicoRVSpi(Module, AutoCSR):
-    def __init__(self, platform, pads, size=2*1024*1024):
+    def __init__(self, platform, pads, size=2*1024*1024, cache_lines=0, cache_line_words=4):
         self.size = size
 
-        self.bus = bus = wishbone.Interface()
+        if cache_lines:
+            # Put a read cache in front of spimemio, which is where `self.bus` now points.
+            self.submodules.cache = FlashCache(cache_lines, cache_line_words)
+            self.bus = self.cache.bus
+            bus = self.cache.flash
+        else:
+            self.bus = bus = wishbone.Interface()
 
         self.reset = Signal()
 
@@ -46,6 +55,9 @@ class PicoRVSpi(Module, AutoCSR):
             self.stat3.status.eq(cfg_out[16:24]),
             self.stat4.status.eq(cfg_out[24:32]),
         ]
+        if cache_lines:
+            # Switching to or from bit-bang mode means flash may have been modified
+            self.comb += self.cache.flush.eq(self.cfg4.re)
 
         mosi_pad = TSTriple()
         miso_pad = TSTriple()
@@ -75,21 +87,36 @@ class PicoRVSpi(Module, AutoCSR):
 
         read_active = Signal()
         spi_ready = Signal()
+        classic_ack = Signal()
+        burst = Signal()
         self.sync += [
-            If(bus.stb & bus.cyc & ~read_active,
+            If(bus.stb & bus.cyc & ~read_active & ~burst,
                 read_active.eq(1),
-                bus.ack.eq(0),
+                classic_ack.eq(0),
             )
             .Elif(read_active & spi_ready,
                 read_active.eq(0),
-                bus.ack.eq(1),
+                classic_ack.eq(1),
             )
             .Else(
-                bus.ack.eq(0),
+                classic_ack.eq(0),
                 read_active.eq(0),
             )
         ]
 
+        # spimemio keeps reading the following word once it has returned one,
+        # without sending a new command or address.  During an incrementing
+        # burst the next address is known to follow on, so acknowledge each
+        # word as soon as it arrives.
+        self.comb += [
+            burst.eq(((bus.cti == CTI_INCREMENTING) | (bus.cti == CTI_END_OF_BURST)) & (bus.bte == 0b00)),
+            If(burst,
+                bus.ack.eq(bus.stb & bus.cyc & spi_ready),
+            ).Else(
+                bus.ack.eq(classic_ack),
+            )
+        ]
+
         o_rdata = Signal(32)
         self.comb += bus.dat_r.eq(o_rdata)
 
@@ -1,4 +1,5 @@
 from migen import Module, Signal, Instance, ClockDomain, If
+from migen.genlib.resetsync import AsyncResetSynchronizer
 
 from litex.build.lattice.platform import LatticePlatform
 
@@ -11,11 +12,14 @@ import spibone
 
 from ..romgen import RandomFirmwareROM, FirmwareROM
 from ..fomutouch import TouchPads
+from ..fomucaptouch import CapTouchPads
 from ..sbwarmboot import SBWarmBoot
+from ..burstram import BurstUp5kSPRAM
 from rtl.sbled import SBLED
 
 import argparse
 import os
+import re
 
 
 def add_platform_args(parser):
@@ -23,12 +27,17 @@ def add_platform_args(parser):
         "--revision", choices=["evt", "dvt", "pvt", "hacker"], required=True,
         help="build foboot for a particular hardware revision"
     )
+    parser.add_argument(
+        "--with-captouch", action="store_true",
+        help="measure the touch pads capacitively and interrupt when one is pressed or released"
+    )
 
 
 
 class Platform(LatticePlatform):
-    def __init__(self, revision=None, toolchain="icestorm"):
+    def __init__(self, revision=None, toolchain="icestorm", captouch=False):
         self.revision = revision
+        self.captouch = captouch
         self.hw_platform = "fomu"
         if revision == "evt":
             from litex_boards.platforms.fomu_evt import _io, _connectors
@@ -74,29 +83,76 @@ class Platform(LatticePlatform):
                 "hacker":[("USB_PRODUCT_NAME", "Fomu Hacker running DFU Bootloader {}".format(git_version))],
             }[self.revision]
 
-    def add_crg(self, soc):
-        soc.submodules.crg = _CRG(self)
+    # Frequencies that can be divided down from the 48 MHz oscillator
+    sys_clk_freqs = [12e6, 24e6, 48e6]
+
+    # Samples the analyzer can hold in the block RAM the SoC leaves free
+    analyzer_depth = 128
+
+    def add_crg(self, soc, sys_clk_freq=12e6):
+        if sys_clk_freq not in self.sys_clk_freqs:
+            raise ValueError("unsupported sys_clk_freq: {}".format(sys_clk_freq))
+        if sys_clk_freq == 12e6:
+            soc.submodules.crg = _CRG(self)
+        else:
+            soc.submodules.crg = _FastCRG(self, sys_clk_freq)
+
+    # Only the smaller cores leave room for USB on the UP5K
+    cpu_variants = ["minimal", "lite"]
 
     def add_cpu_variant(self, soc, debug=False):
+        # The minimal core is replaced with one that has a 2 kB instruction
+        # cache, since that fits and makes executing from flash bearable.
+        if soc.cpu.variant.split("+")[0] != "minimal":
+            return
         if debug:
-            soc.cpu.use_external_variant("rtl/VexRiscv_Fomu_Debug.v")
+            self.cpu_variant_file = "rtl/VexRiscv_Fomu_Debug.v"
         else:
-            soc.cpu.use_external_variant("rtl/VexRiscv_Fomu.v")
+            self.cpu_variant_file = "rtl/VexRiscv_Fomu.v"
+        soc.cpu.use_external_variant(self.cpu_variant_file)
+
+    def add_cpu_trace(self, soc):
+        """Give the PC sampler the address of each instruction as it completes.
+
+        This only works with a core generated with ``lastStagePc`` and
+        ``lastStageIsFiring`` as ports.  The checked-in cores keep them
+        internal, and they mustn't be edited by hand, so until the cores are
+        regenerated this leaves `cpu_trace` unset."""
+        variant = getattr(self, "cpu_variant_file", None)
+        if variant is None:
+            return
+        with open(os.path.join(os.path.dirname(__file__), "..", "..", variant)) as f:
+            ports = re.search(r"module VexRiscv \((.*?)\);", f.read(), re.S).group(1)
+        if not (re.search(r"output\s*\[31:0\]\s*lastStagePc\b", ports)
+                and re.search(r"output\s+lastStageIsFiring\b", ports)):
+            return
+
+        pc = Signal(32)
+        pc_valid = Signal()
+        soc.cpu.cpu_params.update(
+            o_lastStagePc=pc,
+            o_lastStageIsFiring=pc_valid,
+        )
+        soc.cpu_trace = (pc, pc_valid)
     
     def add_sram(self, soc):
         spram_size = 128*1024
-        soc.submodules.spram = up5kspram.Up5kSPRAM(size=spram_size)
+        soc.submodules.spram = BurstUp5kSPRAM(size=spram_size)
         return spram_size
 
     def add_reboot(self, soc):
         soc.submodules.reboot = SBWarmBoot(soc, self.warmboot_offsets)
 
     def add_touch(self, soc):
-        self.add_extension(TouchPads.touch_device)
-        soc.submodules.touch = TouchPads(self.request("touch_pads"))
+        if self.captouch:
+            self.add_extension(CapTouchPads.touch_device)
+            soc.submodules.touch = CapTouchPads(self.request("touch_pads"), soc.clk_freq)
+        else:
+            self.add_extension(TouchPads.touch_device)
+            soc.submodules.touch = TouchPads(self.request("touch_pads"))
 
-    def add_rgb(self, soc):
-        soc.submodules.rgb = SBLED(self.revision, self.request("rgb_led"))
+    def add_rgb(self, soc, sequencer=None):
+        soc.submodules.rgb = SBLED(self.revision, self.request("rgb_led"), sequencer=sequencer)
 
     def request_usb(self):
         return self.request("usb")
@@ -210,3 +266,65 @@ def make_multiboot_header(filename, boot_offsets=[160]):
 
             for x in range(17, 32):
                 output.write(bytes([0]))
+
+
+class _FastCRG(Module):
+    """Clocks for running sys faster than USB
+
+    USB keeps its 48 MHz and 12 MHz domains, while sys runs at 24 or 48 MHz.
+    All three are divided from the same oscillator, but they are still
+    separate domains, and the USB core does its own clock-domain crossing."""
+    def __init__(self, platform, sys_clk_freq):
+        clk48_raw = platform.request("clk48")
+        clk48 = Signal()
+        # Not reset, since the POR counter is clocked from it
+        clk_div = Signal(2, reset_less=True)
+
+        reset_delay = Signal(12, reset=4095)
+        self.clock_domains.cd_por = ClockDomain()
+        self.reset = Signal()
+
+        self.clock_domains.cd_sys = ClockDomain()
+        self.clock_domains.cd_usb_12 = ClockDomain()
+        self.clock_domains.cd_usb_48 = ClockDomain()
+
+        platform.add_period_constraint(clk48_raw, 1e9/48e6)
+        platform.add_period_constraint(self.cd_usb_48.clk, 1e9/48e6)
+        platform.add_period_constraint(self.cd_sys.clk, 1e9/sys_clk_freq)
+        platform.add_period_constraint(self.cd_usb_12.clk, 1e9/12e6)
+
+        self.specials += Instance("SB_GB",
+            i_USER_SIGNAL_TO_GLOBAL_BUFFER=clk48_raw,
+            o_GLOBAL_BUFFER_OUTPUT=clk48,
+        )
+        self.comb += self.cd_usb_48.clk.eq(clk48)
+
+        # Divide 48 MHz by four for usb_12, and by two for a 24 MHz sys
+        self.sync.usb_48 += clk_div.eq(clk_div + 1)
+        self.specials += Instance("SB_GB",
+            i_USER_SIGNAL_TO_GLOBAL_BUFFER=clk_div[1],
+            o_GLOBAL_BUFFER_OUTPUT=self.cd_usb_12.clk,
+        )
+        if sys_clk_freq == 48e6:
+            self.comb += self.cd_sys.clk.eq(clk48)
+        else:
+            self.specials += Instance("SB_GB",
+                i_USER_SIGNAL_TO_GLOBAL_BUFFER=clk_div[0],
+                o_GLOBAL_BUFFER_OUTPUT=self.cd_sys.clk,
+            )
+
+        # POR reset logic- POR generated from usb_12, POR logic feeds every
+        # other reset.
+        self.comb += [
+            self.cd_por.clk.eq(self.cd_usb_12.clk),
+            self.cd_usb_12.rst.eq(reset_delay != 0),
+        ]
+        self.specials += [
+            AsyncResetSynchronizer(self.cd_sys, reset_delay != 0),
+            AsyncResetSynchronizer(self.cd_usb_48, reset_delay != 0),
+        ]
+        self.sync.por += \
+            If(reset_delay != 0,
+                reset_delay.eq(reset_delay - 1)
+            )
+        self.specials += AsyncResetSynchronizer(self.cd_por, self.reset)
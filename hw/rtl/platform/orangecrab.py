@@ -18,18 +18,19 @@ from ..pwmled import RGB
 from ..ecpreboot import ECPReboot
 from ..messible import Messible
 
-from litex.soc.interconnect.wishbone import SRAM
+from ..burstram import BurstSRAM
 
 from litex.build.generic_platform import *
 
 import argparse
 import os
-
-import struct
+import subprocess
 
 from litex.soc.integration.common import get_mem_data
 from litex_boards.platforms.orangecrab import Platform as PlatformOC
 
+from util import brampatch
+
 def add_platform_args(parser):
     parser.add_argument(
         "--revision", choices=["0.1", "0.2"], required=True,
@@ -73,22 +74,33 @@ class Platform(LatticePlatform):
         raise ValueError("programming is not supported")
 
 
-    def add_crg(self, soc):
-        soc.submodules.crg = _CRG(self)
+    # Frequencies the PLL can run the CPU, bus and SPI flash at
+    sys_clk_freqs = [12e6, 24e6, 36e6, 48e6]
+
+    # Samples the analyzer can hold in the block RAM the SoC leaves free
+    analyzer_depth = 1024
+
+    def add_crg(self, soc, sys_clk_freq=12e6):
+        if sys_clk_freq not in self.sys_clk_freqs:
+            raise ValueError("unsupported sys_clk_freq: {}".format(sys_clk_freq))
+        soc.submodules.crg = _CRG(self, sys_clk_freq)
+
+    # The ECP5 has room for any of the LiteX VexRiscv variants
+    cpu_variants = ["minimal", "lite", "standard", "imac", "full"]
 
     def add_cpu_variant(self, soc, debug=False):
         pass
 
     def add_sram(self, soc):
         spram_size = 16*1024
-        soc.submodules.spram = SRAM(spram_size)
+        soc.submodules.spram = BurstSRAM(spram_size)
         return spram_size
 
     def add_reboot(self, soc):
         soc.submodules.reboot = ECPReboot(soc)
     
-    def add_rgb(self, soc):
-        soc.submodules.rgb = RGB(self.request("rgb_led"))
+    def add_rgb(self, soc, sequencer=None):
+        soc.submodules.rgb = RGB(self.request("rgb_led"), sequencer=sequencer)
         #if platform.device[:4] == "LFE5":
         #    vdir = os.path.join(os.path.abspath(os.path.dirname(__file__)), "rtl")
         #    platform.add_source(os.path.join(vdir, "sbled.v"))
@@ -96,7 +108,7 @@ class Platform(LatticePlatform):
     def add_button(self, soc):
         try:
             btn = self.request("usr_btn")
-            soc.submodules.button = Button(btn)
+            soc.submodules.button = Button(btn, soc.clk_freq)
         except:
             ...
 
@@ -140,31 +152,18 @@ class Platform(LatticePlatform):
         input_rom_config = os.path.join(output_dir, "gateware", f"{self.name}_rom.config")
         input_rom_rand = os.path.join(output_dir, "gateware", "rand_rom.hex")
         input_bios_bin = os.path.join(output_dir, "software","bios", "bios.bin")
-        input_bios_hex = os.path.join(output_dir, "software","bios", "bios.init")
-        with open(input_bios_bin, "rb") as f:
-            with open(input_bios_hex, "w") as o:
-                i = 0
-                while True:
-                    w = f.read(4)
-                    if not w:
-                        break
-                    if len(w) != 4:
-                        for _ in range(len(w), 4):
-                            w += b'\x00'
-                    o.write(f'{struct.unpack("<I", w)[0]:08x}\n')
-                    i += 1
-        
-        os.system(f"ecpbram  --input {input_config} --output {input_rom_config} --from {input_rom_rand} --to {input_bios_hex}")
-
-
+        brampatch.patch(input_config, input_rom_config,
+                         brampatch.read_hex_words(input_rom_rand),
+                         brampatch.read_bin_words(input_bios_bin))
 
         # create a bitstream for loading into FLASH
         #input_config = os.path.join(output_dir, "gateware", "top.config")
         output_bitstream = os.path.join(output_dir, "gateware", "foboot.bit")
 
         # Don't enable QSPI mode on r0.1 (By default the SPI chips don't have QE set)
-        spi_mode = '' if self.revision == 'r0.1' else '--spimode qspi'
-        os.system(f"ecppack {spi_mode} --freq 38.8 --compress --bootaddr 0x80000 --input {input_rom_config} --bit {output_bitstream}")
+        spi_mode = [] if self.revision == 'r0.1' else ['--spimode', 'qspi']
+        subprocess.run(["ecppack"] + spi_mode + ["--freq", "38.8", "--compress", "--bootaddr", "0x80000",
+                        "--input", input_rom_config, "--bit", output_bitstream], check=True)
 
         # create a SVF for loading with JTAG adapter
         #output_svf = os.path.join(output_dir, "gateware", "top.svf")
@@ -190,7 +189,7 @@ class Platform(LatticePlatform):
 
 
 class _CRG(Module):
-    def __init__(self, platform):
+    def __init__(self, platform, sys_clk_freq=12e6):
         clk48_raw = platform.request("clk48")
 
         reset_delay = Signal(64, reset=int(12e6*500e-6))
@@ -202,14 +201,13 @@ class _CRG(Module):
         self.clock_domains.cd_usb_48 = ClockDomain()
 
         platform.add_period_constraint(self.cd_usb_48.clk, 1e9/48e6)
-        platform.add_period_constraint(self.cd_sys.clk, 1e9/12e6)
+        platform.add_period_constraint(self.cd_sys.clk, 1e9/sys_clk_freq)
         platform.add_period_constraint(self.cd_usb_12.clk, 1e9/12e6)
 
         # POR reset logic- POR generated from sys clk, POR logic feeds sys clk
         # reset.
         self.comb += [
             self.cd_por.clk.eq(self.cd_usb_12.clk),
-            self.cd_sys.rst.eq(reset_delay != 0),
             self.cd_usb_12.rst.eq(reset_delay != 0),
         ]
 
@@ -225,7 +223,16 @@ class _CRG(Module):
         pll.create_clkout(self.cd_usb_48, 48e6, 0)
         pll.create_clkout(self.cd_usb_12, 12e6, 0)
 
-        self.comb += self.cd_sys.clk.eq(self.cd_usb_12.clk)
+        if sys_clk_freq == 12e6:
+            self.comb += [
+                self.cd_sys.clk.eq(self.cd_usb_12.clk),
+                self.cd_sys.rst.eq(reset_delay != 0),
+            ]
+        else:
+            # Run sys from its own PLL output.  The USB core crosses into
+            # sys itself, so only the reset needs synchronising here.
+            pll.create_clkout(self.cd_sys, sys_clk_freq, 0, with_reset=False)
+            self.specials += AsyncResetSynchronizer(self.cd_sys, reset_delay != 0)
         
         self.sync.por += \
             If(reset_delay != 0,
@@ -0,0 +1,260 @@
+from migen import Module, Signal, Record, Memory, ClockDomain, If, Mux
+from migen.fhdl.specials import Tristate
+from migen.genlib.resetsync import AsyncResetSynchronizer
+
+from litex.build.generic_platform import Pins
+from litex.build.sim.platform import SimPlatform
+from litex.build.sim.config import SimConfig
+from litex.soc.interconnect.csr import AutoCSR, CSRStorage, CSRField
+
+from ..button import Button
+from ..fomutouch import TouchPads
+from ..pwmled import RGB
+from ..burstram import BurstSRAM
+from ..flashmodel import FlashModel, SimPads, SimTristate
+from ..bootmonitor import BootMonitor
+
+# Where reboot() looks for the user program, as an offset into flash
+USER_OFFSET = 0x80000
+
+# Where a Fomu bios looks for the FBM signature, as an offset into flash,
+# and how many bytes it scans
+FBM_OFFSET = 0x0
+FBM_SCAN = 64*4
+
+# What the boot monitor watches for, in the order they usually happen.
+# Boot ends at the first of `FINAL_MILESTONES`.
+MILESTONES = [
+    "rom_entry",      # First instruction fetched from ROM
+    "rgb_init",       # First write to the RGB registers
+    "usb_init",       # First write to the USB registers
+    "image_check",    # First time the CPU reads flash, looking for a program to run
+    "fbm_check",      # First read of the FBM signature, on a Fomu bios
+    "user_program",   # First instruction fetched from flash
+    "fpga_reboot",    # Reboot key written, which would reconfigure the FPGA
+    "dfu_ready",      # USB pull-up enabled, so the host would see the DFU device
+]
+FINAL_MILESTONES = ["user_program", "fpga_reboot", "dfu_ready"]
+
+_io = [
+    ("clk12", 0, Pins(1)),
+    ("clk48", 0, Pins(1)),
+    ("sys_clk", 0, Pins(1)),
+]
+
+class Platform(SimPlatform):
+    """Runs BaseSoC under Verilator, for tests/boot-bench.py.
+
+    The SPI flash is a `FlashModel` holding `flash_image`, the button is
+    held at `button_pressed`, and no host is plugged in, so the USB lines
+    idle in the J state.  The build stops at a Verilator binary, which runs
+    until boot finishes or `timeout` clocks have passed.
+
+    With `fomu` set, the bios is built as it would be for Fomu, which
+    checks for an updater and the FBM signature instead of the button.
+    The touch pads are there, but nothing bridges them, so there is no
+    nerve pinch."""
+    def __init__(self, flash_image=b"", button_pressed=False, timeout=10000000, fomu=False):
+        self.revision = "sim"
+        self.hw_platform = "fomu" if fomu else "sim"
+        self.fomu = fomu
+
+        self.spi_size = int(16*1024*1024)
+        self.spi_dummy = 6
+
+        self.flash_image = flash_image
+        self.button_pressed = button_pressed
+        self.timeout = timeout
+
+        # Clock pads the CRG asked for, and their frequencies
+        self.clocks = {}
+
+        SimPlatform.__init__(self, "SIM", _io)
+
+    def get_config(self, git_version):
+        return [
+            ("USB_VENDOR_ID", 0x1209),     # pid.codes
+            ("USB_PRODUCT_ID", 0x5bf0),    # Assigned to Fomu DFU
+            ("USB_DEVICE_VER", 0x0101),    # Bootloader version
+            ("USB_MANUFACTURER_NAME", "Foosn"),
+            ("USB_PRODUCT_NAME", "Foboot Simulation {}".format(git_version)),
+            ("USB_ALT0_NAME", "0x{:08x} User Program".format(USER_OFFSET)),
+            ("USB_ALT1_NAME", "0x00100000 RISC-V Firmware"),
+            ("USB_ALT0_ADDR", USER_OFFSET),
+            ("USB_ALT1_ADDR", 0x00100000),
+            ("RESCUE_IMAGE_OFFSET", USER_OFFSET),
+        ]
+
+    def create_programmer(self):
+        raise ValueError("programming is not supported")
+
+    # Any clock can be simulated, but keep to those the boards can run
+    sys_clk_freqs = [12e6, 24e6, 36e6, 48e6]
+
+    analyzer_depth = 1024
+
+    cpu_variants = ["minimal", "lite", "standard", "imac", "full"]
+
+    def request_clock(self, name, freq):
+        self.clocks[name] = freq
+        return self.request(name)
+
+    def request(self, name, number=None):
+        # The flash is modelled inside the SoC, so its pads aren't pins
+        if name == "spiflash4x":
+            self.spi_pads = SimPads([("clk", 1), ("cs_n", 1), ("dq", 4)])
+            return self.spi_pads
+        return SimPlatform.request(self, name, number)
+
+    def get_verilog(self, *args, special_overrides=dict(), **kwargs):
+        so = {Tristate: SimTristate}
+        so.update(special_overrides)
+        return SimPlatform.get_verilog(self, *args, special_overrides=so, **kwargs)
+
+    def build(self, *args, **kwargs):
+        # Drive the clocks the CRG used, and leave running the simulation
+        # to whoever asked for the build.
+        sim_config = SimConfig()
+        for (name, freq) in self.clocks.items():
+            sim_config.add_clocker(name, freq_hz=int(freq))
+        kwargs.setdefault("sim_config", sim_config)
+        kwargs.setdefault("run", False)
+        return SimPlatform.build(self, *args, **kwargs)
+
+    def add_crg(self, soc, sys_clk_freq=12e6):
+        if sys_clk_freq not in self.sys_clk_freqs:
+            raise ValueError("unsupported sys_clk_freq: {}".format(sys_clk_freq))
+        soc.submodules.crg = _CRG(self, sys_clk_freq)
+
+    def add_cpu_variant(self, soc, debug=False):
+        pass
+
+    def add_sram(self, soc):
+        spram_size = 16*1024
+        soc.submodules.spram = BurstSRAM(spram_size)
+        return spram_size
+
+    def add_reboot(self, soc):
+        soc.submodules.reboot = _SimReboot()
+
+    def add_rgb(self, soc, sequencer=None):
+        soc.submodules.rgb = RGB(Record([("r", 1), ("g", 1), ("b", 1)]), sequencer=sequencer)
+
+    def add_touch(self, soc):
+        if self.fomu:
+            soc.submodules.touch = TouchPads(SimPads([("t1", 1), ("t2", 1), ("t3", 1), ("t4", 1)]))
+
+    def add_button(self, soc):
+        # The button reads low while it's held
+        btn = Signal()
+        soc.comb += btn.eq(0 if self.button_pressed else 1)
+        soc.submodules.button = Button(btn, soc.clk_freq)
+
+    def request_usb(self):
+        # D+ high and D- low is the J state, which is how a full-speed bus
+        # idles with the host's pull-downs and our pull-up.
+        self.usb_pads = SimPads([("d_p", 1, 1), ("d_n", 1, 0)])
+        self.usb_pads.pullup = Signal()
+        return self.usb_pads
+
+    def add_models(self, soc):
+        soc.submodules.flash_model = _SimFlash(self.spi_pads, self.flash_image, self.spi_dummy)
+
+        if not hasattr(getattr(soc, "cpu", None), "ibus"):
+            raise ValueError("the boot monitor needs a cpu")
+        ibus = soc.cpu.ibus
+        dbus = soc.cpu.dbus
+
+        def access(bus, origin, size, we=None):
+            hit = Signal()
+            match = (bus.cyc & bus.stb & bus.ack
+                     & (bus.adr >= (origin >> 2)) & (bus.adr < ((origin + size) >> 2)))
+            if we is not None:
+                match = match & (bus.we == we)
+            soc.comb += hit.eq(match)
+            return hit
+
+        def region(name):
+            r = soc.bus.regions[name]
+            return (r.origin, r.size)
+
+        def csr_page(name):
+            return (soc.mem_map["csr"] + soc.csr_map[name]*soc.csr.paging, soc.csr.paging)
+
+        pullup_prev = Signal()
+        pullup_rise = Signal()
+        soc.sync += pullup_prev.eq(self.usb_pads.pullup)
+        soc.comb += pullup_rise.eq(self.usb_pads.pullup & ~pullup_prev)
+
+        signals = {
+            "rom_entry":    access(ibus, *region("rom")),
+            "rgb_init":     access(dbus, *csr_page("rgb"), we=1),
+            "usb_init":     access(dbus, *csr_page("usb"), we=1),
+            "image_check":  access(dbus, *region("spiflash"), we=0),
+            "fbm_check":    access(dbus, region("spiflash")[0] + FBM_OFFSET, FBM_SCAN, we=0),
+            "user_program": access(ibus, *region("spiflash")),
+            "fpga_reboot":  soc.reboot.reboot,
+            "dfu_ready":    pullup_rise,
+        }
+        soc.submodules.boot_monitor = BootMonitor(self,
+            [(name, signals[name]) for name in MILESTONES], FINAL_MILESTONES, self.timeout)
+
+    def finalise(self, output_dir):
+        pass
+
+class _SimFlash(Module):
+    def __init__(self, pads, image, dummy):
+        # Anything past the end of the image reads as erased
+        self.specials.mem = Memory(8, max(len(image), 1), init=list(image))
+        port = self.mem.get_port(async_read=True)
+        self.specials += port
+
+        def read_byte(adr):
+            self.comb += port.adr.eq(adr)
+            return Mux(adr < len(image), port.dat_r, 0xff)
+
+        self.submodules.flash = FlashModel(pads.clk, pads.cs_n, pads.dq, dummy, read_byte)
+        self.comb += [
+            pads.pin["dq"].o.eq(self.flash.dq_o),
+            pads.pin["dq"].oe.eq(self.flash.dq_oe),
+        ]
+
+class _SimReboot(Module, AutoCSR):
+    """The registers of `ECPReboot`, without an FPGA to reconfigure.
+    Writing the reboot key raises `reboot` for the boot monitor."""
+    def __init__(self):
+        self.ctrl = CSRStorage(fields=[
+            CSRField("image", size=2, description="Which image to reboot to."),
+            CSRField("key", size=6, description="Set to ``0b101011`` to reboot."),
+        ], description="Write ``0xac`` to reboot into the bootloader.")
+        self.addr = CSRStorage(size=32, description="Reset vector for the VexRiscv.")
+
+        self.reboot = Signal()
+        self.comb += self.reboot.eq(self.ctrl.re & (self.ctrl.fields.key == 0b101011))
+
+class _CRG(Module):
+    def __init__(self, platform, sys_clk_freq=12e6):
+        self.clock_domains.cd_por = ClockDomain(reset_less=True)
+        self.clock_domains.cd_sys = ClockDomain()
+        self.clock_domains.cd_usb_12 = ClockDomain()
+        self.clock_domains.cd_usb_48 = ClockDomain()
+
+        # Hold everything in reset for the first few clocks
+        reset_delay = Signal(4, reset=15)
+        self.comb += [
+            self.cd_usb_12.clk.eq(platform.request_clock("clk12", 12e6)),
+            self.cd_usb_48.clk.eq(platform.request_clock("clk48", 48e6)),
+            self.cd_por.clk.eq(self.cd_usb_12.clk),
+            self.cd_usb_12.rst.eq(reset_delay != 0),
+            self.cd_usb_48.rst.eq(reset_delay != 0),
+        ]
+        self.sync.por += If(reset_delay != 0, reset_delay.eq(reset_delay - 1))
+
+        if sys_clk_freq == 12e6:
+            self.comb += [
+                self.cd_sys.clk.eq(self.cd_usb_12.clk),
+                self.cd_sys.rst.eq(reset_delay != 0),
+            ]
+        else:
+            self.comb += self.cd_sys.clk.eq(platform.request_clock("sys_clk", sys_clk_freq))
+            self.specials += AsyncResetSynchronizer(self.cd_sys, reset_delay != 0)
@@ -1,22 +1,53 @@
-
 from migen import *
 
 from litex.soc.interconnect.csr import AutoCSR, CSRStorage, CSRField
 
+from .colourramp import COLOURS
+
+def gamma_table(n, gamma=1.5):
+    return [int(0xFFFF * pow((1.0 / (n - 1)) * i, gamma)) for i in range(n)]
+
+def sine_table(n):
+    from math import sin,pi
+    return [int(0x7FFF * (sin(((2*pi) / (n - 1)) * i) + 1.0)) for i in range(n)]
+
+class LEDTables(Module):
+    """Gamma correction for several levels, and a sine lookup, sharing one
+    memory.  Each lookup takes a turn at the read port, so an output follows
+    its input after at most `len(levels) + 2` clocks."""
+    def __init__(self, levels, phase, n=256):
+        self.corrected = [Signal(16) for _ in levels]
+        self.sine = Signal(16)
+
+        # Gamma in the lower half, sine in the upper
+        self.specials.mem = Memory(16, 2*n, init=gamma_table(n) + sine_table(n))
+        p = self.mem.get_port()
+        self.specials += p
+
+        outputs = self.corrected + [self.sine]
+        addresses = Array([Cat(level, C(0, 1)) for level in levels] + [Cat(phase, C(1, 1))])
+        slot = Signal(max=len(outputs))
+        last_slot = Signal(max=len(outputs))
+        self.comb += p.adr.eq(addresses[slot])
+        self.sync += [
+            If(slot == len(outputs) - 1,
+                slot.eq(0),
+            ).Else(
+                slot.eq(slot + 1),
+            ),
+            last_slot.eq(slot),
+        ]
+        for i, output in enumerate(outputs):
+            self.sync += If(last_slot == i, output.eq(p.dat_r))
+
 class PWM(Module):
     def __init__(self, bitwidth, tick, offset):
         self.out = pwm = Signal(1)
+        # The sine of `phase` is looked up in `LEDTables` and returned in `value`
+        self.phase = counter_value = Signal(8)
+        self.value = counter = Signal(16)
         pwm_counter = Signal(bitwidth)
-        counter_value = Signal(8)
-        counter = Signal(16)
 
-        # Sine Modulation
-        self.specials.mem = Memory(16, 256, init=self.gen_gamma_table(256))
-        p = self.mem.get_port()
-        self.specials += p
-        self.comb += p.adr.eq(counter_value)
-        self.comb += counter.eq(p.dat_r)
-        
         self.sync += [
             If(tick,
                 counter_value.eq(counter_value + 1)
@@ -26,36 +57,21 @@ class PWM(Module):
         self.comb += pwm.eq(pwm_counter < counter)
         self.sync += pwm_counter.eq(pwm_counter + 1)
 
-    def gen_gamma_table(self, n):
-        from math import sin,pi
-        return [int(0x7FFF * (sin(((2*pi) / 255.0) * i) + 1.0)) for i in range(n)]
-
 
 
 class PDM(Module):
     def __init__(self, width=16):
-        self.level = level = Signal(8)
-        level_corr = Signal(16)
+        # Already gamma corrected, by `LEDTables`
+        self.level = level_corr = Signal(16)
         self.out = out = Signal(1)
 
-        # Gamma correction
-        self.specials.mem = Memory(16, 256, init=self.gen_gamma_table(256))
-        p = self.mem.get_port()
-        self.specials += p
-        self.comb += p.adr.eq(level)
-        self.comb += level_corr.eq(p.dat_r)
-        
         sigma = Signal(width+1)
 
         self.comb += out.eq(sigma[width])
         self.sync += sigma.eq(sigma + Cat(level_corr, out, out))
 
-    def gen_gamma_table(self, n):
-        gamma = 1.5
-        return [int(0xFFFF * pow((1.0 / 255.0) * i, gamma)) for i in range(n)]
-
 class RGB(Module, AutoCSR):
-    def __init__(self, rgb_pins):
+    def __init__(self, rgb_pins, sequencer=None):
         
 
         self._r = CSRStorage(8)
@@ -74,16 +90,8 @@ class RGB(Module, AutoCSR):
         strobe = Signal()
 
 
-        from PIL import Image
-        im = Image.open('util/colours.png')
-        x,_ = im.size
-        colours = []
-        for i in range(x):
-            p_r,p_g,p_b = im.getpixel((i,0))
-            colours += [(p_r << 16) | (p_g << 8) | (p_b)]
-
-        rainbow_index = Signal(x)
-        self.specials.mem = Memory(24, x, init=colours)
+        rainbow_index = Signal(max=len(COLOURS))
+        self.specials.mem = Memory(24, len(COLOURS), init=COLOURS)
         p = self.mem.get_port()
         self.specials += p
         self.sync += p.adr.eq(rainbow_index)
@@ -93,7 +101,11 @@ class RGB(Module, AutoCSR):
         self.sync += [
             If(div_m_counter >= self._div_m.storage,
                 div_m_counter.eq(0),
-                rainbow_index.eq(rainbow_index + 1)
+                If(rainbow_index == len(COLOURS) - 1,
+                    rainbow_index.eq(0),
+                ).Else(
+                    rainbow_index.eq(rainbow_index + 1),
+                )
             ).Else(
                 div_m_counter.eq(div_m_counter + 1)
             )
@@ -108,8 +120,26 @@ class RGB(Module, AutoCSR):
     
         self.submodules.pwm0 = PWM(16, strobe, 1 << 0)
 
+        level_r = Signal(8)
+        level_g = Signal(8)
+        level_b = Signal(8)
+        self.submodules.tables = LEDTables([level_r, level_g, level_b], self.pwm0.phase)
+        self.comb += [
+            self.pdm_r.level.eq(self.tables.corrected[0]),
+            self.pdm_g.level.eq(self.tables.corrected[1]),
+            self.pdm_b.level.eq(self.tables.corrected[2]),
+            self.pwm0.value.eq(self.tables.sine),
+        ]
+
+        # A sequencer playing a pattern takes over the colour, and does its
+        # own fading
+        sequencing = Signal()
+        if sequencer is not None:
+            self.submodules.seq = sequencer
+            self.comb += sequencing.eq(sequencer.active)
+
         modulate = Signal()
-        self.comb += modulate.eq(Mux(self._config.fields.breath, self.pwm0.out, 1))
+        self.comb += modulate.eq(Mux(self._config.fields.breath & ~sequencing, self.pwm0.out, 1))
 
         self.comb += [
             rgb_pins.r.eq(~(self.pdm_r.out & modulate)),
@@ -117,14 +147,19 @@ class RGB(Module, AutoCSR):
             rgb_pins.b.eq(~(self.pdm_b.out & modulate)),
         ]
 
-        self.comb += [
-            If(self._config.fields.rainbow,
-                self.pdm_r.level.eq(p.dat_r[16:24]),
-                self.pdm_g.level.eq(p.dat_r[8:16]),
-                self.pdm_b.level.eq(p.dat_r[0:8])
-            ).Else(
-                self.pdm_r.level.eq(self._r.storage),
-                self.pdm_g.level.eq(self._g.storage),
-                self.pdm_b.level.eq(self._b.storage)
-            )
-        ]
\ No newline at end of file
+        colour = If(self._config.fields.rainbow,
+            level_r.eq(p.dat_r[16:24]),
+            level_g.eq(p.dat_r[8:16]),
+            level_b.eq(p.dat_r[0:8])
+        ).Else(
+            level_r.eq(self._r.storage),
+            level_g.eq(self._g.storage),
+            level_b.eq(self._b.storage)
+        )
+        if sequencer is not None:
+            colour = If(sequencing,
+                level_r.eq(sequencer.r),
+                level_g.eq(sequencer.g),
+                level_b.eq(sequencer.b)
+            ).Else(colour)
+        self.comb += colour
\ No newline at end of file
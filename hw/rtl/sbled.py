@@ -1,9 +1,9 @@
-from migen import Module, Signal, If, Instance, ClockSignal, ResetSignal
+from migen import Module, Signal, Cat, If, Instance, ClockSignal, ResetSignal
 from litex.soc.integration.doc import ModuleDoc
 from litex.soc.interconnect.csr import AutoCSR, CSRStatus, CSRStorage, CSRField
 
 class SBLED(Module, AutoCSR):
-    def __init__(self, revision, pads):
+    def __init__(self, revision, pads, sequencer=None):
         rgba_pwm = Signal(3)
 
         self.intro = ModuleDoc("""RGB LED Controller
@@ -50,29 +50,44 @@ class SBLED(Module, AutoCSR):
                 it is possible to manually control the three individual LEDs.""")
 
         ledd_value = Signal(3)
+
+        # Let a sequencer take over from the LEDDA block while it is playing
+        led_value = Signal(3)
+        if sequencer is not None:
+            self.submodules.seq = sequencer
+            pwm_count = Signal(8)
+            self.sync += pwm_count.eq(pwm_count + 1)
+            self.comb += If(sequencer.active,
+                led_value.eq(Cat(pwm_count < sequencer.r, pwm_count < sequencer.g, pwm_count < sequencer.b)),
+            ).Else(
+                led_value.eq(ledd_value),
+            )
+        else:
+            self.comb += led_value.eq(ledd_value)
+
         if revision == "pvt" or revision == "dvt":
             self.comb += [
-                If(self.ctrl.storage[3], rgba_pwm[1].eq(self.raw.storage[0])).Else(rgba_pwm[1].eq(ledd_value[0])),
-                If(self.ctrl.storage[4], rgba_pwm[0].eq(self.raw.storage[1])).Else(rgba_pwm[0].eq(ledd_value[1])),
-                If(self.ctrl.storage[5], rgba_pwm[2].eq(self.raw.storage[2])).Else(rgba_pwm[2].eq(ledd_value[2])),
+                If(self.ctrl.storage[3], rgba_pwm[1].eq(self.raw.storage[0])).Else(rgba_pwm[1].eq(led_value[0])),
+                If(self.ctrl.storage[4], rgba_pwm[0].eq(self.raw.storage[1])).Else(rgba_pwm[0].eq(led_value[1])),
+                If(self.ctrl.storage[5], rgba_pwm[2].eq(self.raw.storage[2])).Else(rgba_pwm[2].eq(led_value[2])),
             ]
         elif revision == "evt":
             self.comb += [
-                If(self.ctrl.storage[3], rgba_pwm[1].eq(self.raw.storage[0])).Else(rgba_pwm[1].eq(ledd_value[0])),
-                If(self.ctrl.storage[4], rgba_pwm[2].eq(self.raw.storage[1])).Else(rgba_pwm[2].eq(ledd_value[1])),
-                If(self.ctrl.storage[5], rgba_pwm[0].eq(self.raw.storage[2])).Else(rgba_pwm[0].eq(ledd_value[2])),
+                If(self.ctrl.storage[3], rgba_pwm[1].eq(self.raw.storage[0])).Else(rgba_pwm[1].eq(led_value[0])),
+                If(self.ctrl.storage[4], rgba_pwm[2].eq(self.raw.storage[1])).Else(rgba_pwm[2].eq(led_value[1])),
+                If(self.ctrl.storage[5], rgba_pwm[0].eq(self.raw.storage[2])).Else(rgba_pwm[0].eq(led_value[2])),
             ]
         elif revision == "hacker":
             self.comb += [
-                If(self.ctrl.storage[3], rgba_pwm[2].eq(self.raw.storage[0])).Else(rgba_pwm[2].eq(ledd_value[0])),
-                If(self.ctrl.storage[4], rgba_pwm[1].eq(self.raw.storage[1])).Else(rgba_pwm[1].eq(ledd_value[1])),
-                If(self.ctrl.storage[5], rgba_pwm[0].eq(self.raw.storage[2])).Else(rgba_pwm[0].eq(ledd_value[2])),
+                If(self.ctrl.storage[3], rgba_pwm[2].eq(self.raw.storage[0])).Else(rgba_pwm[2].eq(led_value[0])),
+                If(self.ctrl.storage[4], rgba_pwm[1].eq(self.raw.storage[1])).Else(rgba_pwm[1].eq(led_value[1])),
+                If(self.ctrl.storage[5], rgba_pwm[0].eq(self.raw.storage[2])).Else(rgba_pwm[0].eq(led_value[2])),
             ]
         else:
             self.comb += [
-                If(self.ctrl.storage[3], rgba_pwm[0].eq(self.raw.storage[0])).Else(rgba_pwm[0].eq(ledd_value[0])),
-                If(self.ctrl.storage[4], rgba_pwm[1].eq(self.raw.storage[1])).Else(rgba_pwm[1].eq(ledd_value[1])),
-                If(self.ctrl.storage[5], rgba_pwm[2].eq(self.raw.storage[2])).Else(rgba_pwm[2].eq(ledd_value[2])),
+                If(self.ctrl.storage[3], rgba_pwm[0].eq(self.raw.storage[0])).Else(rgba_pwm[0].eq(led_value[0])),
+                If(self.ctrl.storage[4], rgba_pwm[1].eq(self.raw.storage[1])).Else(rgba_pwm[1].eq(led_value[1])),
+                If(self.ctrl.storage[5], rgba_pwm[2].eq(self.raw.storage[2])).Else(rgba_pwm[2].eq(led_value[2])),
             ]
 
 
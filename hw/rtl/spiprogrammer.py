@@ -0,0 +1,253 @@
+from migen import Module, Signal, Array, Cat, If, Case
+from migen.genlib.fsm import FSM, NextState, NextValue
+from litex.soc.integration.doc import AutoDoc, ModuleDoc
+from litex.soc.interconnect.csr import AutoCSR, CSRStatus, CSRStorage, CSRField
+from litex.soc.interconnect import csr_eventmanager as ev
+from litex.soc.interconnect import wishbone
+
+# Which part of the command is being shifted out
+PHASE_WREN = 0
+PHASE_CMD = 1
+PHASE_ADDR = 2
+PHASE_DATA = 3
+PHASE_POLL_CMD = 4
+PHASE_POLL_READ = 5
+PHASE_DONE = 6
+
+class SpiProgrammer(Module, AutoCSR, AutoDoc):
+    """Hardware SPI flash program/erase engine"""
+    def __init__(self, miso_latency=2):
+        self.intro = ModuleDoc("""SPI Flash Programmer
+
+            Bit-banging SPI flash from the CPU costs several instructions for every bit,
+            which at 12 MHz makes writing flash much slower than the flash itself.  This
+            block runs a complete flash command in hardware: it optionally sends Write
+            Enable (``0x06``), then the command byte, an optional 24-bit address, and
+            an optional block of data that it reads from memory by itself.  Afterwards
+            it can poll the Read Status (``0x05``) register until the Write In Progress
+            bit clears, then raise an interrupt.
+
+            To erase a 4 kB sector, set ``CMD`` to ``0x20``, ``ADDR`` to the sector,
+            and write ``CTRL`` with ``START``, ``WREN``, ``ADDR`` and ``POLL`` set.
+            To program a page, set ``CMD`` to ``0x02``, ``SRC`` to the address of the
+            data in RAM and ``LENGTH`` to the number of bytes, and also set
+            ``CTRL.DATA``.  Wait for ``STATUS.BUSY`` to clear or for the ``DONE``
+            interrupt.
+
+            The engine drives the flash through the bit-bang port of the flash
+            controller, so bit-bang mode must already be enabled, and nothing may
+            read from memory-mapped flash while it is running.
+            """)
+
+        # Wishbone master used to fetch the data to be written
+        self.bus = bus = wishbone.Interface()
+
+        # Bit-bang port, laid out as MOSI, CLK, CS_N, MISO_EN like the `lxspi`
+        # BITBANG register.  `active` is high while `bitbang` should be driven.
+        self.bitbang = Signal(4)
+        self.active = Signal()
+        self.miso = Signal()
+
+        self.cmd = CSRStorage(8, description="Command byte to send, for example ``0x02`` (Page Program) or ``0x20`` (Sector Erase).")
+        self.addr = CSRStorage(24, description="24-bit flash address to send after the command, if ``CTRL.ADDR`` is set.")
+        self.src = CSRStorage(32, description="Bus address of the data to send after the address, if ``CTRL.DATA`` is set.")
+        self.length = CSRStorage(9, description="Number of bytes of data to send.  Flash pages are 256 bytes long.")
+        self.ctrl = CSRStorage(fields=[
+            CSRField("start", description="Write ``1`` to start the command."),
+            CSRField("wren", description="Send Write Enable (``0x06``) before the command."),
+            CSRField("addr", description="Send ``ADDR`` after the command byte."),
+            CSRField("data", description="Send ``LENGTH`` bytes from ``SRC`` after the address."),
+            CSRField("poll", description="Wait until the flash is no longer busy before finishing."),
+        ])
+        self.status = CSRStatus(fields=[
+            CSRField("busy", description="``1`` while a command is running."),
+        ])
+
+        self.submodules.ev = ev.EventManager()
+        self.ev.submodules.done = ev.EventSourcePulse(name="done", description="""
+            Indicates the command has finished, including waiting for the flash if ``CTRL.POLL`` was set.""")
+        self.ev.finalize()
+
+        phase = Signal(3)
+        use_addr = Signal()
+        use_data = Signal()
+        use_poll = Signal()
+        addr_bytes = Signal(2)
+        data_left = Signal(9)
+        ptr = Signal(32)
+        word = Signal(32)
+        fetched = Signal()
+
+        sr = Signal(8)
+        bits = Signal(3)
+        wait = Signal(max=miso_latency + 1)
+        reading = Signal()
+
+        # Outputs for the current state, assembled into `bitbang` below
+        mosi = Signal()
+        clk = Signal()
+        cs_n = Signal(reset=1)
+
+        start = Signal()
+        self.comb += [
+            start.eq(self.ctrl.re & self.ctrl.fields.start),
+            reading.eq(phase == PHASE_POLL_READ),
+            self.bitbang.eq(Cat(mosi, clk, cs_n, reading)),
+            self.status.fields.busy.eq(self.active),
+        ]
+
+        address = Array([self.addr.storage[16:24], self.addr.storage[8:16], self.addr.storage[0:8]])
+        data_byte = Array([word[0:8], word[8:16], word[16:24], word[24:32]])
+
+        self.submodules.fsm = fsm = FSM(reset_state="IDLE")
+        self.comb += self.active.eq(~fsm.ongoing("IDLE"))
+
+        fsm.act("IDLE",
+            If(start,
+                NextValue(use_addr, self.ctrl.fields.addr),
+                NextValue(use_data, self.ctrl.fields.data & (self.length.storage != 0)),
+                NextValue(use_poll, self.ctrl.fields.poll),
+                NextValue(addr_bytes, 0),
+                NextValue(data_left, self.length.storage),
+                NextValue(ptr, self.src.storage),
+                NextValue(fetched, 0),
+                If(self.ctrl.fields.wren,
+                    NextValue(phase, PHASE_WREN),
+                ).Else(
+                    NextValue(phase, PHASE_CMD),
+                ),
+                NextState("DESELECT"),
+            )
+        )
+        # Deselect the flash for a cycle between commands, then start on `phase`.
+        fsm.act("DESELECT",
+            If(phase == PHASE_DONE,
+                self.ev.done.trigger.eq(1),
+                NextState("IDLE"),
+            ).Else(
+                NextState("LOAD"),
+            )
+        )
+        fsm.act("LOAD",
+            cs_n.eq(0),
+            NextValue(bits, 7),
+            Case(phase, {
+                PHASE_WREN:      NextValue(sr, 0x06),
+                PHASE_CMD:       NextValue(sr, self.cmd.storage),
+                PHASE_ADDR:      NextValue(sr, address[addr_bytes]),
+                PHASE_DATA:      NextValue(sr, data_byte[ptr[0:2]]),
+                PHASE_POLL_CMD:  NextValue(sr, 0x05),
+                PHASE_POLL_READ: NextValue(sr, 0x00),
+            }),
+            If((phase == PHASE_DATA) & (~fetched | (ptr[0:2] == 0)),
+                NextState("FETCH"),
+            ).Else(
+                NextState("LOW"),
+            )
+        )
+        fsm.act("FETCH",
+            cs_n.eq(0),
+            bus.cyc.eq(1),
+            bus.stb.eq(1),
+            bus.we.eq(0),
+            bus.sel.eq(0xf),
+            bus.adr.eq(ptr[2:]),
+            If(bus.ack,
+                NextValue(word, bus.dat_r),
+                NextValue(fetched, 1),
+                NextState("FETCHED"),
+            )
+        )
+        fsm.act("FETCHED",
+            cs_n.eq(0),
+            NextValue(sr, data_byte[ptr[0:2]]),
+            NextState("LOW"),
+        )
+        fsm.act("LOW",
+            cs_n.eq(0),
+            mosi.eq(sr[7]),
+            NextValue(wait, miso_latency),
+            NextState("HIGH"),
+        )
+        # Hold the clock high long enough for MISO to make it back through
+        # the flash controller before sampling it.
+        fsm.act("HIGH",
+            cs_n.eq(0),
+            mosi.eq(sr[7]),
+            clk.eq(1),
+            If(reading & (wait != 0),
+                NextValue(wait, wait - 1),
+            ).Else(
+                NextValue(sr, Cat(self.miso, sr[:7])),
+                NextValue(bits, bits - 1),
+                If(bits == 0,
+                    NextState("NEXT"),
+                ).Else(
+                    NextState("LOW"),
+                )
+            )
+        )
+        # Decide what to send after a complete byte.
+        fsm.act("NEXT",
+            cs_n.eq(0),
+            Case(phase, {
+                PHASE_WREN: [
+                    NextValue(phase, PHASE_CMD),
+                    NextState("DESELECT"),
+                ],
+                PHASE_CMD: [
+                    If(use_addr,
+                        NextValue(phase, PHASE_ADDR),
+                        NextState("LOAD"),
+                    ).Elif(use_data,
+                        NextValue(phase, PHASE_DATA),
+                        NextState("LOAD"),
+                    ).Else(
+                        NextState("FINISH"),
+                    )
+                ],
+                PHASE_ADDR: [
+                    NextValue(addr_bytes, addr_bytes + 1),
+                    If(addr_bytes != 2,
+                        NextState("LOAD"),
+                    ).Elif(use_data,
+                        NextValue(phase, PHASE_DATA),
+                        NextState("LOAD"),
+                    ).Else(
+                        NextState("FINISH"),
+                    )
+                ],
+                PHASE_DATA: [
+                    NextValue(ptr, ptr + 1),
+                    NextValue(data_left, data_left - 1),
+                    If(data_left != 1,
+                        NextState("LOAD"),
+                    ).Else(
+                        NextState("FINISH"),
+                    )
+                ],
+                PHASE_POLL_CMD: [
+                    NextValue(phase, PHASE_POLL_READ),
+                    NextState("LOAD"),
+                ],
+                PHASE_POLL_READ: [
+                    # The status register repeats for as long as CS is held
+                    # low, so keep reading until Write In Progress clears.
+                    If(sr[0],
+                        NextState("LOAD"),
+                    ).Else(
+                        NextValue(phase, PHASE_DONE),
+                        NextState("DESELECT"),
+                    )
+                ],
+            })
+        )
+        # The command itself is complete, so either poll or finish.
+        fsm.act("FINISH",
+            If(use_poll,
+                NextValue(phase, PHASE_POLL_CMD),
+            ).Else(
+                NextValue(phase, PHASE_DONE),
+            ),
+            NextState("DESELECT"),
+        )
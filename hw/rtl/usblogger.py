@@ -0,0 +1,148 @@
+from migen import Module, Signal, Memory, Cat, C, If, Mux, log2_int
+from migen.genlib.cdc import MultiReg, PulseSynchronizer, BusSynchronizer
+from litex.soc.integration.doc import AutoDoc, ModuleDoc
+from litex.soc.interconnect.csr import AutoCSR, CSRStatus, CSRStorage, CSRField
+from litex.soc.interconnect import wishbone
+
+# Handshake recorded for each transaction
+HANDSHAKE_ACK = 0
+HANDSHAKE_NAK = 1
+HANDSHAKE_STALL = 2
+HANDSHAKE_NONE = 3
+
+class USBLogger(Module, AutoCSR, AutoDoc):
+    """USB transaction logger"""
+    def __init__(self, usb_core, depth=512):
+        """`usb_core` is the `UsbTransfer` engine inside the USB device, which
+        runs in the `usb_12` clock domain."""
+        self.intro = ModuleDoc("""USB Transaction Logger
+
+            Records every USB transaction the device takes part in, along with when it
+            happened, into a ring buffer of {} entries.  Each entry is two words:
+
+            * Word 0: ``usb_12`` clock count (12 MHz) when the token was received
+            * Word 1, bits 0-3: token PID (``0x1`` OUT, ``0x9`` IN, ``0xd`` SETUP)
+            * Word 1, bits 4-7: endpoint number
+            * Word 1, bits 8-9: handshake (``0`` ACK, ``1`` NAK, ``2`` STALL, ``3`` none)
+            * Word 1, bits 10-20: number of data bytes transferred, not counting the CRC16
+            * Word 1, bits 24-31: the second data byte, which for SETUP is ``bRequest``
+
+            Entries can be read back through ``INDEX`` and ``ENTRY``, or by a host
+            through the debug bridge from the memory window, where entry ``n`` is at
+            byte offset ``8 * n``.  ``COUNT`` is the number of transactions logged since
+            the last reset, so the most recent entry is ``(COUNT - 1) % {}``.  The host
+            tool ``util/usblog.py`` reads and decodes the log.
+            """.format(depth, depth))
+
+        self.bus = bus = wishbone.Interface()
+
+        self.ctrl = CSRStorage(fields=[
+            CSRField("enable", description="Set to ``1`` to log transactions."),
+            CSRField("reset", description="Write ``1`` to empty the log and reset the timestamp."),
+        ])
+        self.count = CSRStatus(32, description="Number of transactions logged since the last reset.")
+        self.index = CSRStorage(log2_int(depth), description="Entry to show in ``ENTRY``.")
+        self.entry = CSRStatus(64, description="The entry selected by ``INDEX``, in the format above.")
+
+        # Bring the controls over to usb_12
+        enable = Signal()
+        self.specials += MultiReg(self.ctrl.fields.enable, enable, "usb_12")
+        self.submodules.reset_sync = reset_sync = PulseSynchronizer("sys", "usb_12")
+        self.comb += reset_sync.i.eq(self.ctrl.re & self.ctrl.fields.reset)
+
+        timestamp = Signal(32)
+        count = Signal(32)
+        in_transaction = Signal()
+        start_time = Signal(32)
+        byte_count = Signal(11)
+        received = Signal()
+        length = Signal(11)
+        second_byte = Signal(8)
+        handshake = Signal(2)
+        committed = Signal()
+
+        self.specials.mem = mem = Memory(64, depth)
+        wr_port = mem.get_port(write_capable=True, clock_domain="usb_12")
+        rd_port = mem.get_port()
+        self.specials += wr_port, rd_port
+        self.autocsr_exclude = ['mem']
+
+        data_put = Signal()
+        self.comb += [
+            data_put.eq(usb_core.data_recv_put | usb_core.data_send_get),
+            # `commit` may come before the transaction ends
+            If(committed | usb_core.commit,
+                handshake.eq(HANDSHAKE_ACK),
+            ).Elif(usb_core.sta,
+                handshake.eq(HANDSHAKE_STALL),
+            ).Elif(~usb_core.arm,
+                handshake.eq(HANDSHAKE_NAK),
+            ).Else(
+                handshake.eq(HANDSHAKE_NONE),
+            ),
+            # Received packets end with their CRC16, which isn't payload.
+            # Packets sent by the device never include it.
+            If(received,
+                length.eq(Mux(byte_count >= 2, byte_count - 2, 0)),
+            ).Else(
+                length.eq(byte_count),
+            ),
+            wr_port.adr.eq(count[:log2_int(depth)]),
+            wr_port.dat_w.eq(Cat(
+                start_time,
+                usb_core.tok[:4], usb_core.endp[:4], handshake,
+                length, C(0, 3), second_byte,
+            )),
+            wr_port.we.eq(enable & in_transaction & usb_core.end),
+        ]
+        self.sync.usb_12 += [
+            If(reset_sync.o,
+                timestamp.eq(0),
+                count.eq(0),
+                in_transaction.eq(0),
+            ).Else(
+                timestamp.eq(timestamp + 1),
+                If(usb_core.start,
+                    in_transaction.eq(1),
+                    start_time.eq(timestamp),
+                    byte_count.eq(0),
+                    received.eq(0),
+                    second_byte.eq(0),
+                    committed.eq(0),
+                ),
+                If(usb_core.commit,
+                    committed.eq(1),
+                ),
+                If(in_transaction & data_put,
+                    byte_count.eq(byte_count + 1),
+                    If(usb_core.data_recv_put, received.eq(1)),
+                    If(byte_count == 1,
+                        second_byte.eq(Mux(usb_core.data_recv_put,
+                            usb_core.data_recv_payload, usb_core.data_send_payload)),
+                    ),
+                ),
+                If(in_transaction & usb_core.end,
+                    in_transaction.eq(0),
+                    If(enable, count.eq(count + 1)),
+                ),
+            )
+        ]
+
+        self.submodules.count_sync = count_sync = BusSynchronizer(32, "usb_12", "sys")
+        self.comb += [
+            count_sync.i.eq(count),
+            self.count.status.eq(count_sync.o),
+        ]
+
+        # The bus and the CSRs share one read port.  The bus wins, so `ENTRY`
+        # may briefly show the wrong entry while a host is reading the window.
+        ack = Signal()
+        bus_read = Signal()
+        self.comb += [
+            bus_read.eq(bus.cyc & bus.stb),
+            rd_port.adr.eq(Mux(bus_read, bus.adr[1:], self.index.storage)),
+            bus.dat_r.eq(Mux(bus.adr[0], rd_port.dat_r[32:], rd_port.dat_r[:32])),
+            bus.ack.eq(ack),
+            self.entry.status.eq(rd_port.dat_r),
+        ]
+        self.sync += ack.eq(bus_read & ~ack)
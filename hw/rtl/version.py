@@ -87,6 +87,8 @@ class Version(Module, AutoCSR, AutoDoc):
                 model_val = 0x50 # 'P'
             elif model == "hacker":
                 model_val = 0x48 # 'H'
+            elif model == "sim":
+                model_val = 0x73 # 's'
         elif hw_platform == "orangecrab":
             parent.config["ORANGECRAB_REV"] = model.upper().replace('.', '_')
             if model == "r0_1":
@@ -95,6 +97,8 @@ class Version(Module, AutoCSR, AutoDoc):
                 model_val = 0x11 # 'r0.2'
         elif hw_platform == "orangecart":
             model_val = 0x63 # 'c'
+        elif hw_platform == "sim":
+            model_val = 0x73 # 's'
 
         (major, minor, rev, gitrev, gitextra, dirty) = get_gitver()
 
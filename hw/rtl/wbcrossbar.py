@@ -0,0 +1,77 @@
+from functools import reduce
+from operator import or_
+
+from migen import Module, Signal, If
+from litex.soc.integration.doc import AutoDoc, ModuleDoc
+from litex.soc.interconnect.csr import AutoCSR, CSRStatus, CSRStorage, CSRField
+from litex.soc.interconnect import wishbone
+
+class WishboneCrossbar(Module, AutoCSR, AutoDoc):
+    """Wishbone crossbar with arbitration statistics"""
+    def __init__(self, masters, slaves, register=True, timeout=None):
+        """`masters` is a list of `(name, bus)`, and `slaves` is a list of
+        `(decoder, bus)` in the same form as `wishbone.Crossbar`."""
+        self.intro = ModuleDoc("""Bus Crossbar
+
+            The default interconnect shares a single bus between every master, so while
+            a debug bridge is reading memory, the CPU can't fetch instructions even from
+            an unrelated slave.  This crossbar gives each master its own path to every
+            slave, and only makes a master wait when another master is using the same
+            slave.  Each slave picks between competing masters in round-robin order.
+
+            For each master, ``<NAME>_ACTIVE`` counts the clocks it spent in a bus cycle
+            and ``<NAME>_STALLS`` counts the clocks it spent waiting for another master
+            to release a slave.  Write ``1`` to ``CTRL.RESET`` to clear the counters.
+            """)
+
+        self.ctrl = CSRStorage(fields=[
+            CSRField("reset", description="Write ``1`` to reset every counter."),
+        ])
+
+        matches, busses = zip(*slaves)
+        access = [[wishbone.Interface() for _ in slaves] for _ in masters]
+
+        # Decode each master into its own row of slave ports
+        for row, (_, master) in zip(access, masters):
+            if timeout is not None:
+                self.submodules += wishbone.Timeout(master, timeout)
+            self.submodules += wishbone.Decoder(master, list(zip(matches, row)), register)
+
+        # Arbitrate each column of slave ports onto its slave
+        arbiters = []
+        for column, bus in zip(zip(*access), busses):
+            arbiter = wishbone.Arbiter(column, bus)
+            self.submodules += arbiter
+            arbiters.append(arbiter)
+
+        for i, (name, master) in enumerate(masters):
+            active = Signal()
+            stalled = Signal()
+            self.comb += [
+                active.eq(master.cyc & master.stb),
+                stalled.eq(reduce(or_, [row.cyc & (arbiter.rr.grant != i)
+                    for row, arbiter in zip(access[i], arbiters)])),
+            ]
+
+            active_csr = CSRStatus(32, name=name + "_active", description="""
+                        Number of clocks ``{}`` spent in a bus cycle.""".format(name))
+            stalls_csr = CSRStatus(32, name=name + "_stalls", description="""
+                        Number of clocks ``{}`` spent waiting for a slave that another master was using.""".format(name))
+            setattr(self, name + "_active", active_csr)
+            setattr(self, name + "_stalls", stalls_csr)
+
+            active_count = Signal(32)
+            stall_count = Signal(32)
+            self.sync += [
+                If(self.ctrl.re & self.ctrl.fields.reset,
+                    active_count.eq(0),
+                    stall_count.eq(0),
+                ).Else(
+                    If(active, active_count.eq(active_count + 1)),
+                    If(stalled, stall_count.eq(stall_count + 1)),
+                )
+            ]
+            self.comb += [
+                active_csr.status.eq(active_count),
+                stalls_csr.status.eq(stall_count),
+            ]
@@ -0,0 +1,108 @@
+from migen import Module, Signal, If, Mux
+from migen.genlib import fifo
+from migen.genlib.fsm import FSM, NextState, NextValue
+from litex.soc.integration.doc import AutoDoc, ModuleDoc
+from litex.soc.interconnect.csr import AutoCSR, CSRStatus, CSRStorage, CSRField
+from litex.soc.interconnect import csr_eventmanager as ev
+from litex.soc.interconnect import wishbone
+
+from .burstram import CTI_INCREMENTING, CTI_END_OF_BURST
+
+class WishboneDMA(Module, AutoCSR, AutoDoc):
+    """Memory-to-memory copy engine"""
+    def __init__(self, burst_words=8):
+        self.intro = ModuleDoc("""Wishbone DMA
+
+            Copies a block of memory from one bus address to another without involving
+            the CPU, for example from ``spiflash`` into ``sram``.  Data is read in
+            incrementing bursts of up to {} words into a small buffer, then written
+            back out as a burst.
+
+            Set ``SRC``, ``DST`` and ``LENGTH``, then write ``1`` to ``CTRL.START``.
+            ``STATUS.BUSY`` stays ``1`` until the copy is finished, at which point the
+            ``DONE`` interrupt fires.  All three values must be multiples of four bytes.
+            """.format(burst_words))
+
+        self.bus = bus = wishbone.Interface()
+
+        self.src = CSRStorage(32, description="Bus address to copy from.")
+        self.dst = CSRStorage(32, description="Bus address to copy to.")
+        self.length = CSRStorage(32, description="Number of bytes to copy.")
+        self.ctrl = CSRStorage(fields=[
+            CSRField("start", description="Write ``1`` to start copying."),
+        ])
+        self.status = CSRStatus(fields=[
+            CSRField("busy", description="``1`` while a copy is in progress."),
+        ])
+
+        self.submodules.ev = ev.EventManager()
+        self.ev.submodules.done = ev.EventSourcePulse(name="done", description="""
+            Indicates that the copy has finished.""")
+        self.ev.finalize()
+
+        self.submodules.buffer = buf = fifo.SyncFIFO(32, burst_words)
+
+        src = Signal(30)
+        dst = Signal(30)
+        words_left = Signal(30)
+        chunk = Signal(max=burst_words + 1)
+        beat = Signal(max=burst_words + 1)
+        last = Signal()
+        self.comb += [
+            chunk.eq(Mux(words_left > burst_words, burst_words, words_left)),
+            last.eq(beat == chunk - 1),
+            bus.sel.eq(0xf),
+            bus.cti.eq(Mux(last, CTI_END_OF_BURST, CTI_INCREMENTING)),
+            buf.din.eq(bus.dat_r),
+            bus.dat_w.eq(buf.dout),
+        ]
+
+        self.submodules.fsm = fsm = FSM(reset_state="IDLE")
+        self.comb += self.status.fields.busy.eq(~fsm.ongoing("IDLE"))
+        fsm.act("IDLE",
+            If(self.ctrl.re & self.ctrl.fields.start,
+                NextValue(src, self.src.storage[2:]),
+                NextValue(dst, self.dst.storage[2:]),
+                NextValue(words_left, self.length.storage[2:]),
+                NextValue(beat, 0),
+                NextState("CHECK"),
+            )
+        )
+        fsm.act("CHECK",
+            If(words_left == 0,
+                self.ev.done.trigger.eq(1),
+                NextState("IDLE"),
+            ).Else(
+                NextState("READ"),
+            )
+        )
+        fsm.act("READ",
+            bus.cyc.eq(1),
+            bus.stb.eq(1),
+            bus.adr.eq(src),
+            If(bus.ack,
+                buf.we.eq(1),
+                NextValue(src, src + 1),
+                NextValue(beat, beat + 1),
+                If(last,
+                    NextValue(beat, 0),
+                    NextState("WRITE"),
+                )
+            )
+        )
+        fsm.act("WRITE",
+            bus.cyc.eq(1),
+            bus.stb.eq(1),
+            bus.we.eq(1),
+            bus.adr.eq(dst),
+            If(bus.ack,
+                buf.re.eq(1),
+                NextValue(dst, dst + 1),
+                NextValue(beat, beat + 1),
+                If(last,
+                    NextValue(beat, 0),
+                    NextValue(words_left, words_left - chunk),
+                    NextState("CHECK"),
+                )
+            )
+        )
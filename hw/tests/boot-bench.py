@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+# This variable defines all the external programs that this module
+# relies on.  lxbuildenv reads this variable in order to ensure
+# the build will finish without exiting due to missing third-party
+# programs.
+LX_DEPENDENCIES = ["riscv", "make"]
+
+# Import lxbuildenv to integrate the deps/ directory
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import lxbuildenv
+
+# Disable pylint's E1101, which breaks completely on migen
+#pylint:disable=E1101
+
+# Boot BaseSoC in Verilator, running the real bios from reset against a
+# flash model, and count the clocks it takes to reach each milestone in
+# rtl/platform/sim.py: ROM entry, rgb_init(), usb_init(), the first look at
+# flash for a program to boot, Fomu's FBM signature check, and then either
+# the jump to the user program or the USB pull-up that means DFU is ready.
+#
+# Each scenario is a separate build, since the flash image and button are
+# built into the simulation.  Results are written as JSON, and can be
+# compared against an earlier run to catch boot time regressions.
+#
+# Needs Verilator and a RISC-V toolchain.  Run from the hw/ directory:
+#
+#     python3 tests/boot-bench.py --output build/boot-bench.json
+#     python3 tests/boot-bench.py --baseline build/boot-bench.json
+
+import argparse
+import importlib.util
+import json
+import shutil
+import struct
+import subprocess
+
+from litex.soc.integration.builder import Builder
+from litex.soc.integration.common import get_mem_data
+
+from rtl.platform.sim import Platform, MILESTONES, USER_OFFSET, FBM_OFFSET
+
+HW_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# A user program that just spins: `j .`
+SPIN = struct.pack("<I", 0x0000006f)
+
+# The same, followed by the signature a Fomu bios looks for before
+# jumping to Foboot-main
+FBM = SPIN + struct.pack("<I", 0x032bd37d)
+
+# Button released boots whatever is in flash, and button held stays in
+# the bootloader for DFU.  fbm builds the bios for Fomu, with Foboot-main
+# in flash where the gateware would be, so it boots that after checking
+# for an updater.  Each is `(platform arguments, extra flash contents)`.
+SCENARIOS = {
+    "boot": (dict(button_pressed=False), []),
+    "dfu":  (dict(button_pressed=True), []),
+    "fbm":  (dict(fomu=True), [(FBM_OFFSET, FBM)]),
+}
+
+def load_basesoc():
+    """BaseSoC lives in a script whose name isn't a valid module name"""
+    spec = importlib.util.spec_from_file_location("foboot_bitstream", os.path.join(HW_DIR, "foboot-bitstream.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.BaseSoC
+
+def compose_image(parts):
+    """Lay out `(offset, data)` parts as a flash image, erased in between"""
+    image = bytearray(b"\xff" * max(offset + len(data) for (offset, data) in parts))
+    for (offset, data) in parts:
+        image[offset:offset + len(data)] = data
+    return bytes(image)
+
+def build(BaseSoC, scenario, image, args):
+    output_dir = os.path.join(args.build_dir, scenario)
+    platform = Platform(flash_image=image, timeout=args.timeout, **SCENARIOS[scenario][0])
+    soc = BaseSoC(platform, cpu_type="vexriscv", cpu_variant=args.cpu_variant,
+                  boot_source="bios", sys_clk_freq=args.sys_clk_freq*1e6,
+                  flash_cache_lines=args.flash_cache_lines, output_dir=output_dir)
+
+    # Build the bios first, so it can go into the ROM before the gateware
+    # is generated.
+    os.environ["LITEX"] = "1" # Give our Makefile something to look for
+    builder = Builder(soc, output_dir=output_dir, csr_csv=os.path.join(output_dir, "csr.csv"),
+                      compile_software=True, compile_gateware=False)
+    builder.software_packages = [
+        ("bios", os.path.abspath(os.path.join(HW_DIR, "..", "sw")))
+    ]
+    builder.build()
+    soc.initialize_rom(get_mem_data(os.path.join(builder.software_dir, "bios", "bios.bin"), "little"))
+
+    builder.compile_gateware = True
+    builder.build()
+    return builder.gateware_dir
+
+def run(gateware_dir):
+    """Run the simulation and return the clock of each milestone reached"""
+    output = subprocess.run([os.path.join(".", "obj_dir", "Vsim")], cwd=gateware_dir,
+                            check=True, stdout=subprocess.PIPE).stdout.decode("utf-8")
+    milestones = {}
+    timed_out = False
+    for line in output.splitlines():
+        fields = line.split()
+        if fields[:2] == ["bootmonitor:", "milestone"]:
+            milestones[MILESTONES[int(fields[2])]] = int(fields[3])
+        elif fields[:2] == ["bootmonitor:", "timeout"]:
+            timed_out = True
+    if not milestones and not timed_out:
+        raise RuntimeError("no result from the simulation:\n" + output)
+    return {"milestones": milestones, "timed_out": timed_out}
+
+def compare(results, baseline, tolerance):
+    """Print how each milestone moved since `baseline`, and return the
+    number that got slower by more than `tolerance` percent, or went
+    missing."""
+    regressions = 0
+    print("\nChange since baseline:")
+    for (scenario, result) in results["scenarios"].items():
+        old = baseline.get("scenarios", {}).get(scenario)
+        if old is None:
+            continue
+        for name in MILESTONES:
+            if name not in old["milestones"]:
+                continue
+            before = old["milestones"][name]
+            after = result["milestones"].get(name)
+            if after is None:
+                status = "missing"
+                regressions += 1
+            else:
+                change = 100.0 * (after - before) / max(before, 1)
+                status = "{:+.1f}%".format(change)
+                if change > tolerance:
+                    status += "  slower"
+                    regressions += 1
+            print("    {:6} {:14} {:>10} -> {:>10}  {}".format(
+                scenario, name, before, "-" if after is None else after, status))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure bootloader boot time in the simulator")
+    parser.add_argument("--scenario", nargs="+", choices=SCENARIOS.keys(), default=list(SCENARIOS.keys()),
+                        help="boot: button released, so boot what's in flash; dfu: button held, so wait for DFU; "
+                             "fbm: Fomu bios, which boots Foboot-main from the start of flash")
+    parser.add_argument("--image", help="flash image to use as-is, instead of composing one")
+    parser.add_argument("--gateware", help="file to put at the start of flash, where the bootloader bitstream goes")
+    parser.add_argument("--user-program", help="file to put at 0x{:x}, where the bios looks for a program to boot (default: a loop)".format(USER_OFFSET))
+    parser.add_argument("--cpu-variant", default="minimal", help="VexRiscv configuration to use")
+    parser.add_argument("--sys-clk-freq", type=int, choices=[12, 24, 36, 48], default=12, help="frequency in MHz to run the CPU at")
+    parser.add_argument("--flash-cache-lines", type=int, default=0, help="add a flash read cache with this many lines")
+    parser.add_argument("--timeout", type=int, default=10000000, help="clocks to give up after")
+    parser.add_argument("--build-dir", default=os.path.join("build", "boot-bench"), help="where to build the simulations")
+    parser.add_argument("--output", default=os.path.join("build", "boot-bench.json"), help="where to write the results")
+    parser.add_argument("--baseline", help="earlier results to compare against")
+    parser.add_argument("--tolerance", type=float, default=2.0, help="percent slower than the baseline to allow")
+    args = parser.parse_args()
+
+    if not shutil.which("verilator"):
+        raise SystemExit("verilator not found, which is needed to simulate the SoC")
+
+    image = None
+    parts = []
+    if args.image:
+        with open(args.image, "rb") as f:
+            image = f.read()
+    else:
+        if args.gateware:
+            with open(args.gateware, "rb") as f:
+                parts.append((0, f.read()))
+        if args.user_program:
+            with open(args.user_program, "rb") as f:
+                parts.append((USER_OFFSET, f.read()))
+        else:
+            parts.append((USER_OFFSET, SPIN))
+
+    BaseSoC = load_basesoc()
+    git_version = subprocess.run(["git", "describe", "--tags", "--always", "--dirty=+"],
+                                 stdout=subprocess.PIPE).stdout.decode("utf-8").strip()
+    results = {
+        "git": git_version,
+        "cpu_variant": args.cpu_variant,
+        "sys_clk_freq": args.sys_clk_freq*1000000,
+        "flash_cache_lines": args.flash_cache_lines,
+        "scenarios": {},
+    }
+    for scenario in args.scenario:
+        # Later parts go over earlier ones, so the scenario's own contents win
+        scenario_image = image if image is not None else compose_image(parts + SCENARIOS[scenario][1])
+        results["scenarios"][scenario] = run(build(BaseSoC, scenario, scenario_image, args))
+
+    print("{:6} {:14} {:>10} {:>10}".format("", "milestone", "clocks", "us"))
+    for (scenario, result) in results["scenarios"].items():
+        for name in MILESTONES:
+            if name in result["milestones"]:
+                cycles = result["milestones"][name]
+                print("{:6} {:14} {:10} {:10.1f}".format(scenario, name, cycles, cycles / args.sys_clk_freq))
+        if result["timed_out"]:
+            print("{:6} timed out after {} clocks".format(scenario, args.timeout))
+
+    # Read the baseline first, in case it's the file being replaced
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=4, sort_keys=True)
+        f.write("\n")
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            raise SystemExit("{} milestones regressed".format(regressions))
+
+if __name__ == "__main__":
+    main()
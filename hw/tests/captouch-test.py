@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# This variable defines all the external programs that this module
+# relies on.  lxbuildenv reads this variable in order to ensure
+# the build will finish without exiting due to missing third-party
+# programs.
+LX_DEPENDENCIES = []
+
+# Import lxbuildenv to integrate the deps/ directory
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import lxbuildenv
+
+# Disable pylint's E1101, which breaks completely on migen
+#pylint:disable=E1101
+
+# Simulate one captouch pad, giving it a count for each sample period, and
+# check when it reports a press.  Slow drift mustn't look like a touch, and
+# a touch must be released however far the count drifted while it was held.
+#
+# Run from the hw/ directory:  python3 tests/captouch-test.py
+
+from migen import Module, Signal, run_simulation
+
+from rtl.fomucaptouch import CapTouchPad
+
+# Clocks in each sample period, which must be more than any count
+PERIOD = 256
+PRESS = 0x0a
+RELEASE = 0x03
+
+# A finger on the pad
+TOUCH = 40
+
+class Bench(Module):
+    def __init__(self):
+        self.i = Signal(reset=1)
+        self.tick = Signal()
+        self.enable = Signal(reset=1)
+        self.submodules.pad = CapTouchPad(self.i, self.enable, self.tick, PRESS, RELEASE)
+
+def periods(dut, counts):
+    """Hold the pad low for each count's worth of clocks in a period, and
+    yield the pad's state at the end of every period"""
+    for count in counts:
+        for cycle in range(PERIOD):
+            yield dut.i.eq(0 if cycle < count else 1)
+            yield dut.tick.eq(cycle == PERIOD - 1)
+            yield
+        state = yield dut.pad.state
+        filtered = yield dut.pad.filtered
+        baseline = yield dut.pad.baseline
+        dut.trace.append((count, filtered, baseline, state))
+
+def ramp(start, end, length):
+    return [start + (end - start)*n//length for n in range(length)]
+
+def expect(dut, what, want, failures):
+    (count, filtered, baseline, state) = dut.trace[-1]
+    if state != want:
+        failures.append("{}: state {}, expected {} (count {}, filtered {}, baseline {})".format(
+            what, state, want, count, filtered, baseline))
+
+def check(dut, failures):
+    # Settle, then drift up by 25 counts: slower than a touch, but more
+    # than 2**baseline_shift, so a baseline that only moves by whole
+    # steps of that size is left behind.
+    yield from periods(dut, [60]*40)
+    expect(dut, "settled", 0, failures)
+    for count in ramp(60, 85, 200):
+        yield from periods(dut, [count])
+        expect(dut, "drifting up to 85", 0, failures)
+    yield from periods(dut, [85]*100)
+    expect(dut, "after drifting up", 0, failures)
+
+    # Drift back down
+    for count in ramp(85, 70, 100):
+        yield from periods(dut, [count])
+        expect(dut, "drifting down to 70", 0, failures)
+    yield from periods(dut, [70]*100)
+
+    # A touch is seen within a few periods, held for as long as the finger
+    # is there, and released when it lifts
+    yield from periods(dut, [70 + TOUCH]*5)
+    expect(dut, "touched", 1, failures)
+    yield from periods(dut, [70 + TOUCH]*300)
+    expect(dut, "held", 1, failures)
+    yield from periods(dut, [70]*10)
+    expect(dut, "released", 0, failures)
+
+    # Drift up while the pad is held and the baseline stops following it,
+    # then lift off at the new level
+    yield from periods(dut, [70 + TOUCH]*10)
+    expect(dut, "touched again", 1, failures)
+    for count in ramp(70 + TOUCH, 95 + TOUCH, 200):
+        yield from periods(dut, [count])
+        expect(dut, "drifting while held", 1, failures)
+    yield from periods(dut, [95]*10)
+    expect(dut, "released after drifting", 0, failures)
+    yield from periods(dut, [95]*100)
+    expect(dut, "after release", 0, failures)
+
+def main():
+    dut = Bench()
+    dut.trace = []
+    failures = []
+    run_simulation(dut, check(dut, failures))
+    for failure in failures:
+        print(failure)
+    if failures:
+        raise SystemExit("{} checks failed".format(len(failures)))
+    print("{} periods of drift, press and release as expected".format(len(dut.trace)))
+
+if __name__ == "__main__":
+    main()
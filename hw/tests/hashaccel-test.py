@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# This variable defines all the external programs that this module
+# relies on.  lxbuildenv reads this variable in order to ensure
+# the build will finish without exiting due to missing third-party
+# programs.
+LX_DEPENDENCIES = []
+
+# Import lxbuildenv to integrate the deps/ directory
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import lxbuildenv
+
+# Disable pylint's E1101, which breaks completely on migen
+#pylint:disable=E1101
+
+# Simulate the hash accelerator and compare its digests against the xxh32()
+# that booster/make-delta.py uses, and against zlib.crc32().  The lengths
+# sit either side of each tail and stripe boundary.
+#
+# Run from the hw/ directory:  python3 tests/hashaccel-test.py
+
+import importlib.util
+import random
+import zlib
+
+from migen import Module, run_simulation
+from litex.soc.interconnect import csr_bus
+
+from rtl.hashaccel import HashAccelerator, ALGORITHM_XXH32, ALGORITHM_CRC32
+
+LENGTHS = [0, 1, 2, 3, 4, 5, 7, 8, 12, 15, 16, 17, 19, 20, 31, 32, 33, 47, 48, 49, 63, 64, 65, 70]
+SEEDS = [0, 0x12345678]
+
+def load_xxh32():
+    """make-delta.py's name isn't a valid module name"""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "booster", "make-delta.py")
+    spec = importlib.util.spec_from_file_location("make_delta", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.xxh32
+
+class Bench(Module):
+    """The accelerator behind a CSR bank, which is what drives its fields"""
+    def __init__(self):
+        self.submodules.hash = HashAccelerator()
+        csrs = self.hash.get_csrs()
+        self.submodules.bank = csr_bus.CSRBank(csrs, bus=csr_bus.Interface(data_width=32))
+        # Every register fits in one 32-bit word, so each is at its index
+        self.names = [c.name for c in csrs]
+
+    def write(self, name, value):
+        bus = self.bank.bus
+        yield bus.adr.eq(self.names.index(name))
+        yield bus.dat_w.eq(value)
+        yield bus.we.eq(1)
+        yield
+        yield bus.we.eq(0)
+        yield
+
+    def read(self, name):
+        bus = self.bank.bus
+        yield bus.adr.eq(self.names.index(name))
+        yield
+        yield
+        return (yield bus.dat_r)
+
+STATUS_BUSY = 1 << 0
+STATUS_FULL = 1 << 1
+
+def ctrl(reset=0, algorithm=0, finish=0):
+    return (reset << 0) | (algorithm << 1) | (finish << 3)
+
+def digest(dut, algorithm, seed, data):
+    """Feed `data` a word at a time, then the leftover bytes one at a time"""
+    yield from dut.write("seed", seed)
+    yield from dut.write("ctrl", ctrl(reset=1, algorithm=algorithm))
+    words = len(data) // 4
+    for i in range(words):
+        while (yield from dut.read("status")) & STATUS_FULL:
+            pass
+        yield from dut.write("data", int.from_bytes(data[4*i:4*i + 4], "little"))
+    for b in data[4*words:]:
+        while (yield from dut.read("status")) & STATUS_FULL:
+            pass
+        yield from dut.write("byte", b)
+    yield from dut.write("ctrl", ctrl(algorithm=algorithm, finish=1))
+    while (yield from dut.read("status")) & STATUS_BUSY:
+        pass
+    return (yield from dut.read("digest"))
+
+def check(dut, xxh32, failures):
+    rng = random.Random(0)
+    for length in LENGTHS:
+        data = bytes(rng.randrange(256) for _ in range(length))
+        for seed in SEEDS:
+            for (name, algorithm, expected) in [
+                    ("xxh32", ALGORITHM_XXH32, xxh32(data, seed)),
+                    ("crc32", ALGORITHM_CRC32, zlib.crc32(data, seed))]:
+                result = yield from digest(dut, algorithm, seed, data)
+                if result != expected:
+                    failures.append("{} of {} bytes, seed {:08x}: got {:08x}, expected {:08x}".format(
+                        name, length, seed, result, expected))
+
+def main():
+    dut = Bench()
+    failures = []
+    run_simulation(dut, check(dut, load_xxh32(), failures))
+    for failure in failures:
+        print(failure)
+    if failures:
+        raise SystemExit("{} digests were wrong".format(len(failures)))
+    print("{} lengths and {} seeds match for xxh32 and crc32".format(len(LENGTHS), len(SEEDS)))
+
+if __name__ == "__main__":
+    main()
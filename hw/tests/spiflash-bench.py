@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+# This variable defines all the external programs that this module
+# relies on.  lxbuildenv reads this variable in order to ensure
+# the build will finish without exiting due to missing third-party
+# programs.
+LX_DEPENDENCIES = []
+
+# Import lxbuildenv to integrate the deps/ directory
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import lxbuildenv
+
+# Disable pylint's E1101, which breaks completely on migen
+#pylint:disable=E1101
+
+# Measure Wishbone read latency and throughput of the SPI flash controllers
+# against a behavioural flash model, to find the fastest mode that still
+# reads back the right data.
+#
+# SpiFlashDualQuad is simulated with migen.  PicoRVSpi wraps spimemio.v,
+# which migen can't simulate, so it is converted to Verilog and run under
+# Icarus Verilog when `iverilog` is on the path.
+#
+# Run from the hw/ directory:  python3 tests/spiflash-bench.py
+
+import argparse
+import random
+import shutil
+import subprocess
+import tempfile
+
+from migen import Module, Signal, Array, Cat, C, If, run_simulation
+from migen.fhdl import verilog
+from migen.fhdl.specials import Tristate
+from litex.soc.cores import spi_flash
+from litex.soc.interconnect import csr_bus
+
+from rtl.picorvspi import PicoRVSpi
+from rtl.flashmodel import FlashModel, SimPads, SimTristate
+
+RANDOM_READS = 16
+SEQUENTIAL_READS = 64
+# Keep to the first megabyte, which is all PicoRVSpi decodes of a 2 MB part
+FLASH_WORDS = 256*1024
+
+def flash_byte(adr):
+    """Contents of the flash at byte address `adr`, as a migen expression"""
+    return (adr[0:8] + (adr[8:16] ^ 0xa5) + 3*adr[16:24])[0:8]
+
+class ReadBench(Module):
+    """Reads from a Wishbone bus, checks the data against `flash_byte()`
+    and counts clocks.  The first read wakes the controller up and isn't
+    timed.  Then come `random_addrs`, then `seq_count` words from
+    `seq_start`."""
+    def __init__(self, bus, random_addrs, seq_start, seq_count, timeout=4096):
+        self.start = Signal()
+        self.done = Signal(name_override="done")
+        self.errors = Signal(16, name_override="errors")
+        self.random_cycles = Signal(32, name_override="random_cycles")
+        self.seq_cycles = Signal(32, name_override="seq_cycles")
+        self.timed_out = Signal(name_override="timed_out")
+
+        addrs = [random_addrs[0]] + random_addrs + [seq_start + i for i in range(seq_count)]
+        n_random = len(random_addrs)
+        table = Array(C(a, len(bus.adr)) for a in addrs)
+        index = Signal(max=len(addrs))
+        active = Signal()
+        wait = Signal(max=timeout + 1)
+        byte_adr = Signal(24)
+        expected = Signal(32)
+        self.comb += [
+            bus.adr.eq(table[index]),
+            bus.cyc.eq(active),
+            bus.stb.eq(active),
+            bus.we.eq(0),
+            bus.sel.eq(0xf),
+            byte_adr.eq(Cat(C(0, 2), bus.adr)),
+            expected.eq(Cat(*[flash_byte(byte_adr + k) for k in range(4)])),
+        ]
+        self.sync += [
+            If(active,
+                wait.eq(wait + 1),
+                If((index >= 1) & (index <= n_random),
+                    self.random_cycles.eq(self.random_cycles + 1),
+                ).Elif(index > n_random,
+                    self.seq_cycles.eq(self.seq_cycles + 1),
+                ),
+                If(bus.ack,
+                    wait.eq(0),
+                    If(bus.dat_r != expected,
+                        self.errors.eq(self.errors + 1),
+                    ),
+                    If(index == len(addrs) - 1,
+                        active.eq(0),
+                        self.done.eq(1),
+                    ).Else(
+                        index.eq(index + 1),
+                    ),
+                ).Elif(wait == timeout,
+                    active.eq(0),
+                    self.done.eq(1),
+                    self.timed_out.eq(1),
+                ),
+            ).Elif(self.start & ~self.done,
+                active.eq(1),
+            )
+        ]
+
+class LiteXBench(Module):
+    def __init__(self, dummy, flash_dummy, random_addrs, seq_start):
+        pads = SimPads([("clk", 1), ("cs_n", 1), ("dq", 4)])
+        self.submodules.spi = spi_flash.SpiFlashDualQuad(pads, dummy=dummy, endianness="little")
+        self.submodules.flash = FlashModel(pads.clk, pads.cs_n, pads.dq, flash_dummy, flash_byte)
+        self.comb += [
+            pads.pin["dq"].o.eq(self.flash.dq_o),
+            pads.pin["dq"].oe.eq(self.flash.dq_oe),
+        ]
+        self.submodules.bench = ReadBench(self.spi.bus, random_addrs, seq_start, SEQUENTIAL_READS)
+        self.comb += self.bench.start.eq(1)
+
+class SourceList:
+    """Collects the Verilog sources PicoRVSpi asks for"""
+    def __init__(self):
+        self.sources = []
+
+    def add_source(self, filename):
+        self.sources.append(filename)
+
+class PicoRVSpiBench(Module):
+    def __init__(self, platform, random_addrs, seq_start):
+        # Set from the Verilog testbench, so one build covers every mode
+        self.cfg3 = Signal(8, name_override="cfg3")
+        self.flash_dummy = Signal(5, name_override="flash_dummy")
+
+        pads = SimPads([("mosi", 1), ("miso", 1), ("wp", 1), ("hold", 1), ("cs_n", 1), ("clk", 1)])
+        self.submodules.spi = PicoRVSpi(platform, pads)
+        self.submodules.flash = FlashModel(pads.clk, pads.cs_n,
+            Cat(pads.mosi, pads.miso, pads.wp, pads.hold), self.flash_dummy, flash_byte)
+        for (n, name) in enumerate(["mosi", "miso", "wp", "hold"]):
+            self.comb += [
+                pads.pin[name].o.eq(self.flash.dq_o[n]),
+                pads.pin[name].oe.eq(self.flash.dq_oe[n]),
+            ]
+        self.submodules.bench = ReadBench(self.spi.bus, random_addrs, seq_start, SEQUENTIAL_READS)
+
+        # Write cfg3 through a CSR bank once out of reset, then start
+        csrs = self.spi.get_csrs()
+        self.submodules.bank = csr_bus.CSRBank(csrs)
+        cfg3_index = [c.name for c in csrs].index("cfg3")
+        boot = Signal(4)
+        self.sync += If(boot != 15, boot.eq(boot + 1))
+        self.comb += [
+            If(boot == 2,
+                self.bank.bus.adr.eq(cfg3_index),
+                self.bank.bus.we.eq(1),
+                self.bank.bus.dat_w.eq(self.cfg3),
+            ),
+            self.bench.start.eq(boot == 15),
+        ]
+
+    def ios(self):
+        return {self.cfg3, self.flash_dummy, self.bench.done, self.bench.errors,
+                self.bench.random_cycles, self.bench.seq_cycles, self.bench.timed_out}
+
+TESTBENCH = """
+`timescale 1ns / 1ps
+module tb;
+    reg sys_clk = 0;
+    reg sys_rst = 1;
+    reg [7:0] cfg3;
+    reg [4:0] flash_dummy;
+    wire done;
+    wire [15:0] errors;
+    wire [31:0] random_cycles;
+    wire [31:0] seq_cycles;
+    wire timed_out;
+
+    top dut(
+        .sys_clk(sys_clk), .sys_rst(sys_rst),
+        .cfg3(cfg3), .flash_dummy(flash_dummy),
+        .done(done), .errors(errors), .random_cycles(random_cycles),
+        .seq_cycles(seq_cycles), .timed_out(timed_out)
+    );
+
+    always #5 sys_clk = ~sys_clk;
+
+    initial begin
+        if (!$value$plusargs("cfg3=%d", cfg3)) cfg3 = 0;
+        if (!$value$plusargs("dummy=%d", flash_dummy)) flash_dummy = 6;
+        #20 sys_rst = 0;
+        wait(done);
+        $display("result %0d %0d %0d %0d", errors, random_cycles, seq_cycles, timed_out);
+        $finish;
+    end
+endmodule
+"""
+
+def litex_run(dummy, flash_dummy, random_addrs, seq_start):
+    dut = LiteXBench(dummy, flash_dummy, random_addrs, seq_start)
+    result = {}
+    def run():
+        while not (yield dut.bench.done):
+            yield
+        for name in ["errors", "random_cycles", "seq_cycles", "timed_out"]:
+            result[name] = yield getattr(dut.bench, name)
+    run_simulation(dut, run(), special_overrides={Tristate: SimTristate})
+    return result
+
+class PicoRVSpiRunner:
+    """Builds the PicoRVSpi bench once with Icarus Verilog, then runs it
+    for each configuration."""
+    def __init__(self, random_addrs, seq_start):
+        self.dir = tempfile.mkdtemp(prefix="spiflash-bench-")
+        platform = SourceList()
+        dut = PicoRVSpiBench(platform, random_addrs, seq_start)
+        verilog.convert(dut, ios=dut.ios(), name="top",
+                        special_overrides={Tristate: SimTristate}).write(os.path.join(self.dir, "top.v"))
+        with open(os.path.join(self.dir, "tb.v"), "w") as f:
+            f.write(TESTBENCH)
+        self.vvp = os.path.join(self.dir, "bench.vvp")
+        subprocess.run(["iverilog", "-o", self.vvp,
+                        os.path.join(self.dir, "tb.v"), os.path.join(self.dir, "top.v")] + platform.sources,
+                       check=True)
+
+    def run(self, cfg3, flash_dummy):
+        output = subprocess.run(["vvp", "-n", self.vvp, "+cfg3={}".format(cfg3), "+dummy={}".format(flash_dummy)],
+                                check=True, stdout=subprocess.PIPE).stdout.decode("utf-8")
+        for line in output.splitlines():
+            if line.startswith("result "):
+                (errors, random_cycles, seq_cycles, timed_out) = [int(x) for x in line.split()[1:]]
+                return {"errors": errors, "random_cycles": random_cycles,
+                        "seq_cycles": seq_cycles, "timed_out": timed_out}
+        raise RuntimeError("no result from the simulation:\n" + output)
+
+# PicoRVSpi cfg3: rlat[3:0], crm[4], qspi[5], ddr[6].  spimemio treats ddr
+# without qspi as dual I/O.
+PICORVSPI_MODES = [
+    ("single (03)",       0x00, False),
+    ("dual I/O (bb)",     0x40, True),
+    ("quad I/O (eb)",     0x20, True),
+    ("quad I/O crm",      0x30, True),
+    ("quad DDR (ed)",     0x60, True),
+    ("quad DDR crm",      0x70, True),
+]
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the SPI flash controllers against a flash model")
+    parser.add_argument("--flash-dummy", type=int, nargs="+", default=[4, 6],
+                        help="dummy cycles the flash needs for quad I/O reads, as in the platforms' spi_dummy")
+    parser.add_argument("--sys-clk-freq", type=float, default=12e6, help="clock used to turn clocks into MB/s")
+    parser.add_argument("--max-rlat", type=int, default=10, help="highest PicoRVSpi read latency to try")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    random_addrs = [rng.randrange(FLASH_WORDS) for _ in range(RANDOM_READS)]
+    seq_start = rng.randrange(FLASH_WORDS - SEQUENTIAL_READS)
+
+    rows = []
+    for flash_dummy in args.flash_dummy:
+        for dummy in range(max(flash_dummy - 2, 0), flash_dummy + 3):
+            rows.append(("SpiFlashDualQuad", "quad I/O (eb)", flash_dummy, "dummy={}".format(dummy),
+                         litex_run(dummy, flash_dummy, random_addrs, seq_start)))
+
+    if shutil.which("iverilog") and shutil.which("vvp"):
+        runner = PicoRVSpiRunner(random_addrs, seq_start)
+        for flash_dummy in args.flash_dummy:
+            for (name, cfg3, has_rlat) in PICORVSPI_MODES:
+                for rlat in range(args.max_rlat + 1) if has_rlat else [0]:
+                    rows.append(("PicoRVSpi", name, flash_dummy, "rlat={}".format(rlat),
+                                 runner.run(cfg3 | rlat, flash_dummy)))
+    else:
+        print("iverilog not found, skipping PicoRVSpi\n", file=sys.stderr)
+
+    def mbps(result):
+        return SEQUENTIAL_READS * 4 * args.sys_clk_freq / result["seq_cycles"] / 1e6
+
+    print("{:17} {:15} {:>5} {:>9} {:>13} {:>13} {:>7}  {}".format(
+        "controller", "mode", "flash", "setting", "clocks/random", "clocks/word", "MB/s", "result"))
+    for (controller, mode, flash_dummy, setting, result) in rows:
+        if result["timed_out"]:
+            status = "timed out"
+        elif result["errors"]:
+            status = "{} bad reads".format(result["errors"])
+        else:
+            status = "ok"
+        print("{:17} {:15} {:>5} {:>9} {:13.1f} {:13.2f} {:7.2f}  {}".format(
+            controller, mode, flash_dummy, setting,
+            result["random_cycles"] / RANDOM_READS, result["seq_cycles"] / SEQUENTIAL_READS,
+            mbps(result), status))
+
+    print("\nFastest mode that reads correctly:")
+    for flash_dummy in args.flash_dummy:
+        good = [r for r in rows if r[2] == flash_dummy and not r[4]["errors"] and not r[4]["timed_out"]]
+        if not good:
+            print("    flash dummy {}: none".format(flash_dummy))
+            continue
+        for (label, key) in [("random", "random_cycles"), ("sequential", "seq_cycles")]:
+            best = min(good, key=lambda r: r[4][key])
+            print("    flash dummy {}, {:10}: {} {} {}".format(flash_dummy, label, best[0], best[1], best[3]))
+
+if __name__ == "__main__":
+    main()
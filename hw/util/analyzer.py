@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Capture from the LiteScope analyzer.
+
+The SoC must have been built with `--with-analyzer GROUP ...` and a debug
+bridge, and `litex_server` (or `wishbone-tool --server wishbone`) must be
+connected to it.  Groups are numbered in the order they were given to
+`--with-analyzer`.  For example, to capture the USB group of a
+`--with-analyzer wishbone usb` build on the rising edge of a signal:
+
+    python3 util/analyzer.py --group 1 --trigger SIGNAL --output usb.vcd
+
+Signal names are listed in build/analyzer.csv.  Without `--trigger`, the
+capture starts straight away.
+"""
+
+import argparse
+
+from litex import RemoteClient
+from litescope import LiteScopeAnalyzerDriver
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Capture from the LiteScope analyzer")
+    parser.add_argument("--group", type=int, default=0, help="signal group to capture")
+    parser.add_argument("--trigger", help="signal whose rising edge starts the capture")
+    parser.add_argument("--value", help="instead of a rising edge, trigger when --trigger equals this value")
+    parser.add_argument("--offset", type=int, default=16, help="samples to keep from before the trigger")
+    parser.add_argument("--length", type=int, default=None, help="samples to capture (defaults to the full depth)")
+    parser.add_argument("--output", default="analyzer.vcd", help="file to write (.vcd, .csv, .py or .sr)")
+    parser.add_argument("--csr-csv", default="build/csr.csv", help="csr.csv from the build")
+    parser.add_argument("--analyzer-csv", default="build/analyzer.csv", help="analyzer.csv from the build")
+    parser.add_argument("--host", default="localhost", help="litex_server host")
+    parser.add_argument("--port", type=int, default=1234, help="litex_server port")
+    args = parser.parse_args()
+
+    wb = RemoteClient(host=args.host, port=args.port, csr_csv=args.csr_csv)
+    wb.open()
+    try:
+        analyzer = LiteScopeAnalyzerDriver(wb.regs, "analyzer", config_csv=args.analyzer_csv, debug=True)
+        analyzer.configure_group(args.group)
+        if args.trigger is None:
+            analyzer.add_trigger(cond={})
+        elif args.value is None:
+            analyzer.add_rising_edge_trigger(args.trigger)
+        else:
+            analyzer.add_trigger(cond={args.trigger: int(args.value, 0)})
+        analyzer.run(offset=args.offset, length=args.length)
+        analyzer.wait_done()
+        analyzer.upload()
+        analyzer.save(args.output)
+    finally:
+        wb.close()
+
+
+if __name__ == "__main__":
+    main()
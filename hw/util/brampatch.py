@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Swap the contents of a ROM inside a placed-and-routed design.
+
+This does the same job as `ecpbram` (ECP5 `.config` files) and `icebram`
+(ICE40 `.asc` files), but runs in-process and remembers where the ROM bits
+ended up, so that repacking new firmware into the same gateware is fast.
+
+Synthesis scatters the bits of a ROM across block RAMs in ways that are hard
+to predict, so the ROM is first filled with random data.  Each block RAM is
+then cut into "columns" -- one data bit, across consecutive addresses -- and
+every column that matches a column of the random ROM is recorded in an index.
+Patching replaces each of those columns with the matching column of the
+firmware image.  Because the index only depends on the gateware and the
+random ROM, it is cached on disk and keyed by the hash of both.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import struct
+import sys
+
+INDEX_VERSION = 1
+
+# Lookup tables for converting between words and runs of 0/1 bytes, LSB first
+_BITS8 = [bytes((v >> i) & 1 for i in range(8)) for v in range(256)]
+_BITS9 = [bytes((v >> i) & 1 for i in range(9)) for v in range(512)]
+_FROM_BITS8 = {b: v for v, b in enumerate(_BITS8)}
+_FROM_BITS9 = {b: v for v, b in enumerate(_BITS9)}
+
+
+class BRAMPatchError(Exception):
+    pass
+
+
+def read_hex_words(filename):
+    """Read a `$readmemh()`-style file with one word per line"""
+    words = []
+    with open(filename, "r") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                words.append(int(line, 16))
+    return words
+
+
+def read_bin_words(filename, width=32):
+    """Read a little-endian binary file as a list of words, zero-padding the end"""
+    nbytes = width // 8
+    with open(filename, "rb") as f:
+        data = f.read()
+    if len(data) % nbytes:
+        data += b'\x00' * (nbytes - len(data) % nbytes)
+    return [int.from_bytes(data[i:i+nbytes], "little") for i in range(0, len(data), nbytes)]
+
+
+def read_words(filename, width=32):
+    if filename.endswith(".bin"):
+        return read_bin_words(filename, width)
+    return read_hex_words(filename)
+
+
+class ECP5Config:
+    """Block RAM contents of an ECP5 `.config` file
+
+    Each `.bram_init` section contains 2048 9-bit words, which is 16 kbit
+    of data plus 2 kbit of parity.  Depending on the width the RAM was
+    configured for, the ROM data is either found in all 9 bits of every
+    word, or only in the lower 8."""
+    def __init__(self, text):
+        self.lines = text.split("\n")
+        self.brams = {}
+        i = 0
+        while i < len(self.lines):
+            line = self.lines[i]
+            if line.startswith(".bram_init"):
+                name = line.split()[1]
+                start = i + 1
+                i = start
+                words = []
+                layout = []
+                while i < len(self.lines) and self.lines[i].strip() and not self.lines[i].startswith("."):
+                    tokens = self.lines[i].split()
+                    layout.append((len(tokens), len(tokens[0])))
+                    words += [int(t, 16) for t in tokens]
+                    i += 1
+                self.brams[name] = (start, layout, words)
+            else:
+                i += 1
+
+    def streams(self, name):
+        words = self.brams[name][2]
+        return {
+            "full": bytearray(b''.join(_BITS9[w & 0x1ff] for w in words)),
+            "data": bytearray(b''.join(_BITS8[w & 0xff] for w in words)),
+        }
+
+    def store(self, name, kind, stream):
+        (start, layout, words) = self.brams[name]
+        if kind == "full":
+            words = [_FROM_BITS9[bytes(stream[i:i+9])] for i in range(0, len(stream), 9)]
+        else:
+            words = [(w & 0x100) | _FROM_BITS8[bytes(stream[i*8:i*8+8])] for i, w in enumerate(words)]
+        idx = 0
+        for (line_no, (count, digits)) in enumerate(layout):
+            self.lines[start + line_no] = " ".join(
+                "{:0{}x}".format(w, digits) for w in words[idx:idx+count])
+            idx += count
+        self.brams[name] = (start, layout, words)
+
+    def text(self):
+        return "\n".join(self.lines)
+
+
+class ICE40Asc:
+    """Block RAM contents of an ICE40 `.asc` file
+
+    Each `.ram_data` section contains 16 lines of 256 bits, with bit 0 at
+    the end of the line."""
+    def __init__(self, text):
+        self.lines = text.split("\n")
+        self.brams = {}
+        for i, line in enumerate(self.lines):
+            if line.startswith(".ram_data"):
+                name = " ".join(line.split()[1:3])
+                values = [int(l, 16) for l in self.lines[i+1:i+17]]
+                self.brams[name] = (i + 1, values)
+
+    def streams(self, name):
+        values = self.brams[name][1]
+        return {
+            "full": bytearray(b''.join(_BITS8[b] for v in values for b in v.to_bytes(32, "little"))),
+        }
+
+    def store(self, name, kind, stream):
+        (start, _) = self.brams[name]
+        values = []
+        for line_no in range(16):
+            chunk = stream[line_no*256:(line_no+1)*256]
+            raw = bytes(_FROM_BITS8[bytes(chunk[i:i+8])] for i in range(0, 256, 8))
+            values.append(int.from_bytes(raw, "little"))
+            self.lines[start + line_no] = "{:064x}".format(values[-1])
+        self.brams[name] = (start, values)
+
+    def text(self):
+        return "\n".join(self.lines)
+
+
+def load_design(filename):
+    with open(filename, "r") as f:
+        text = f.read()
+    if filename.endswith(".asc") or ".ram_data" in text:
+        return ICE40Asc(text)
+    return ECP5Config(text)
+
+
+# Column widths to try for each kind of stream.  These cover all of the
+# port widths the block RAMs can be configured for.
+CANDIDATE_WIDTHS = {
+    "full": [36, 18, 16, 9, 8, 4, 2, 1],
+    "data": [32, 16, 8, 4, 2, 1],
+}
+
+
+def _rom_columns(words, width):
+    """Return one run of 0/1 bytes per bit of the ROM, covering every address"""
+    return [bytes((w >> bit) & 1 for w in words) for bit in range(width)]
+
+
+def build_index(design, from_words, width=32):
+    """Find every column of `from_words` within the block RAMs of `design`.
+
+    Returns a list of `(bram, stream, stride, offset, address, bit)` tuples,
+    meaning that `stream[offset::stride]` of that block RAM holds bit `bit`
+    of ROM addresses `address` onwards."""
+    columns = _rom_columns(from_words, width)
+    patterns = {}
+    def patterns_for(depth):
+        if depth not in patterns:
+            table = {}
+            for start in range(0, len(from_words) - depth + 1, depth):
+                for bit, column in enumerate(columns):
+                    table.setdefault(column[start:start+depth], (start, bit))
+            patterns[depth] = table
+        return patterns[depth]
+
+    index = []
+    mapped = 0
+    for name in design.brams:
+        for (kind, stream) in design.streams(name).items():
+            found = []
+            for stride in CANDIDATE_WIDTHS[kind]:
+                if len(stream) % stride:
+                    continue
+                depth = len(stream) // stride
+                if depth > len(from_words):
+                    continue
+                table = patterns_for(depth)
+                found = []
+                for offset in range(stride):
+                    match = table.get(bytes(stream[offset::stride]))
+                    if match is not None:
+                        found.append((name, kind, stride, offset) + match)
+                if found:
+                    mapped += depth * len(found)
+                    break
+            if found:
+                index += found
+                break
+
+    needed = len(from_words) * width
+    if mapped < needed:
+        raise BRAMPatchError("only found {} of {} ROM bits in the design -- was it built with the random ROM?"
+                             .format(mapped, needed))
+    return index
+
+
+def _cache_key(design_filename, from_words):
+    h = hashlib.sha256()
+    with open(design_filename, "rb") as f:
+        h.update(f.read())
+    h.update(struct.pack("<{}I".format(len(from_words)), *from_words))
+    return h.hexdigest()
+
+
+def load_index(design_filename, design, from_words, width=32, cache_dir=None):
+    """Return the ROM index for `design`, reusing a cached copy if there is one"""
+    if cache_dir is None:
+        cache_dir = os.path.dirname(os.path.abspath(design_filename))
+    key = _cache_key(design_filename, from_words)
+    cache_file = os.path.join(cache_dir, "{}.{}.bramidx".format(os.path.basename(design_filename), key[:16]))
+    try:
+        with open(cache_file, "r") as f:
+            cached = json.load(f)
+        if cached["version"] == INDEX_VERSION and cached["key"] == key:
+            return [tuple(e) for e in cached["index"]]
+    except (OSError, ValueError, KeyError):
+        pass
+
+    index = build_index(design, from_words, width)
+    try:
+        with open(cache_file, "w") as f:
+            json.dump({"version": INDEX_VERSION, "key": key, "index": index}, f)
+    except OSError:
+        pass
+    return index
+
+
+def apply_index(design, index, to_words, width=32):
+    """Replace every indexed column with the corresponding column of `to_words`"""
+    columns = _rom_columns(to_words, width)
+    by_bram = {}
+    for entry in index:
+        by_bram.setdefault(entry[0], []).append(entry[1:])
+    for (name, entries) in by_bram.items():
+        streams = design.streams(name)
+        for (kind, stride, offset, address, bit) in entries:
+            stream = streams[kind]
+            depth = len(stream) // stride
+            stream[offset::stride] = columns[bit][address:address+depth]
+        for kind in {e[0] for e in entries}:
+            design.store(name, kind, streams[kind])
+
+
+def patch(input_file, output_file, from_words, to_words, width=32, cache_dir=None):
+    """Copy `input_file` to `output_file`, swapping ROM contents `from_words` for `to_words`"""
+    if len(to_words) > len(from_words):
+        raise BRAMPatchError("new ROM contents are {} words, but the ROM only holds {}"
+                             .format(len(to_words), len(from_words)))
+    to_words = list(to_words) + [0] * (len(from_words) - len(to_words))
+
+    design = load_design(input_file)
+    index = load_index(input_file, design, from_words, width, cache_dir)
+    apply_index(design, index, to_words, width)
+    with open(output_file, "w") as f:
+        f.write(design.text())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replace ROM contents in an ECP5 .config or ICE40 .asc file")
+    parser.add_argument("--input", required=True, help="placed-and-routed design (.config or .asc)")
+    parser.add_argument("--output", required=True, help="file to write the patched design to")
+    parser.add_argument("--from", dest="from_file", required=True, help="hex file the ROM was built with")
+    parser.add_argument("--to", dest="to_file", required=True, help="new ROM contents (.hex or .bin)")
+    parser.add_argument("--width", type=int, default=32, help="ROM word width, in bits")
+    parser.add_argument("--cache-dir", help="where to store the ROM index (default: next to the input)")
+    args = parser.parse_args()
+
+    try:
+        patch(args.input, args.output,
+              read_words(args.from_file, args.width),
+              read_words(args.to_file, args.width),
+              width=args.width, cache_dir=args.cache_dir)
+    except BRAMPatchError as e:
+        print("Error: {}".format(e), file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Regenerate rtl/colourramp.py from util/colours.png.
+
+The rainbow in the OrangeCrab's RGB block steps through the colours along
+the top row of the image.  Rather than read the image on every build, they
+are kept as a table in rtl/colourramp.py.  Run this after editing the image:
+
+    python3 util/colourramp.py
+
+This needs PIL, which the build itself does not.
+"""
+
+import argparse
+import os
+
+from PIL import Image
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def read_colours(filename):
+    """Return the top row of the image as 0xRRGGBB values"""
+    im = Image.open(filename).convert("RGB")
+    x, _ = im.size
+    colours = []
+    for i in range(x):
+        r, g, b = im.getpixel((i, 0))
+        colours.append((r << 16) | (g << 8) | b)
+    return colours
+
+
+def write_table(filename, colours, per_line=8):
+    with open(filename, "w") as f:
+        f.write("# Generated from util/colours.png by util/colourramp.py.  Do not edit.\n\n")
+        f.write("COLOURS = [\n")
+        for i in range(0, len(colours), per_line):
+            f.write("    " + " ".join("0x{:06x},".format(c) for c in colours[i:i + per_line]) + "\n")
+        f.write("]\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Regenerate the rainbow colour table")
+    parser.add_argument("--image", default=os.path.join(HERE, "colours.png"), help="image to read the colours from")
+    parser.add_argument("--output", default=os.path.join(HERE, "..", "rtl", "colourramp.py"), help="table to write")
+    args = parser.parse_args()
+
+    write_table(args.output, read_colours(args.image))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Find the interesting parts of a bitstream or SPI flash dump.
+
+This memory-maps the input, so even a full 16 MiB flash dump can be indexed
+quickly.  It looks for:
+
+    * ICE40 multiboot headers, along with the boot address of each entry
+    * ICE40 bitstreams, identified by their `7e aa 99 7e` sync header
+    * ECP5 bitstreams, identified by their `ff ff bd b3` preamble, along
+      with the IDCODE they were built for
+    * Foboot-Main images, identified by the `0x032bd37d` signature
+    * Boot configuration words, identified by the `0xb469075a` magic number
+    * Booster images, identified by the `0xfaa999b1` signature
+
+Each bitstream is assumed to extend until the next thing that was found,
+minus any trailing erased (0xff) bytes, and is reported with its SHA-256.
+
+It can be used as a library, or run directly:
+
+    python3 util/flashinspect.py [--json] flash-dump.bin ...
+"""
+
+import argparse
+import hashlib
+import json
+import mmap
+import struct
+import sys
+
+ICE40_SYNC_HEADER = bytes([0x7e, 0xaa, 0x99, 0x7e])
+ECP5_PREAMBLE = bytes([0xff, 0xff, 0xbd, 0xb3])
+ECP5_IDCODE_COMMAND = bytes([0xe2, 0x00, 0x00, 0x00])
+FBM_SIGNATURE = struct.pack("<I", 0x032bd37d)
+BOOT_CONFIG_MAGIC = struct.pack("<I", 0xb469075a)
+BOOSTER_SIGNATURE = struct.pack("<I", 0xfaa999b1)
+
+# The IDCODE command comes shortly after the ECP5 preamble
+IDCODE_SEARCH_LENGTH = 256
+
+# Each ICE40 multiboot entry is 32 bytes long
+MULTIBOOT_ENTRY_SIZE = 32
+
+
+def find_all(buf, pattern, start=0, end=None):
+    """Yield the offset of every occurrence of `pattern` in `buf`"""
+    if end is None:
+        end = len(buf)
+    offset = buf.find(pattern, start, end)
+    while offset >= 0:
+        yield offset
+        offset = buf.find(pattern, offset + 1, end)
+
+
+def parse_multiboot_entry(buf, offset):
+    """Decode an ICE40 multiboot entry, returning None if it isn't one.
+
+    See `make_multiboot_header()` in `rtl/platform/fomu.py` for the layout."""
+    entry = buf[offset:offset + 17]
+    if len(entry) < 17:
+        return None
+    if entry[4] != 0x92 or entry[7] != 0x44 or entry[8] != 0x03:
+        return None
+    if entry[12] != 0x82 or entry[15] != 0x01 or entry[16] != 0x08:
+        return None
+    return {
+        "offset": offset,
+        "cold_boot": entry[6] != 0,
+        "boot_address": (entry[9] << 16) | (entry[10] << 8) | entry[11],
+    }
+
+
+def find_idcode(buf, start=0, length=IDCODE_SEARCH_LENGTH):
+    """Return the IDCODE following the ECP5 bitstream starting at `start`, if any"""
+    pos = buf.find(ECP5_IDCODE_COMMAND, start, start + length)
+    if pos < 0 or pos + 8 > len(buf):
+        return None
+    (idcode,) = struct.unpack_from(">I", buf, pos + 4)
+    return idcode
+
+
+def _used_end(buf, start, end):
+    """Return the end of the data between `start` and `end`, ignoring erased bytes"""
+    while end > start and buf[end - 1] == 0xff:
+        end -= 1
+    return end
+
+
+def index(buf):
+    """Index a bitstream or flash image, returning a dict describing its contents"""
+    multiboot = []
+    entry_offsets = set()
+    for offset in find_all(buf, ICE40_SYNC_HEADER):
+        entry = parse_multiboot_entry(buf, offset)
+        if entry is None:
+            continue
+        entry_offsets.add(offset)
+        if multiboot and multiboot[-1]["offset"] + len(multiboot[-1]["entries"]) * MULTIBOOT_ENTRY_SIZE == offset:
+            multiboot[-1]["entries"].append(entry)
+        else:
+            multiboot.append({"offset": offset, "entries": [entry]})
+
+    images = []
+    for offset in find_all(buf, ICE40_SYNC_HEADER):
+        if offset in entry_offsets:
+            continue
+        # icepack emits a two-byte comment and padding ahead of the sync header
+        start = offset - 4 if offset >= 4 and buf[offset - 4:offset] == b'\xff\x00\x00\xff' else offset
+        images.append({"type": "ice40", "offset": start})
+    for offset in find_all(buf, ECP5_PREAMBLE):
+        image = {"type": "ecp5", "offset": offset}
+        idcode = find_idcode(buf, offset)
+        if idcode is not None:
+            image["idcode"] = idcode
+        images.append(image)
+
+    fbm = list(find_all(buf, FBM_SIGNATURE))
+    boot_configs = []
+    for offset in find_all(buf, BOOT_CONFIG_MAGIC):
+        if offset + 8 <= len(buf):
+            (value,) = struct.unpack_from("<I", buf, offset + 4)
+            boot_configs.append({"offset": offset, "value": value})
+    # The Booster signature is the second word of its header
+    boosters = [offset - 4 for offset in find_all(buf, BOOSTER_SIGNATURE) if offset >= 4]
+
+    # Anything that starts at a known offset ends the previous bitstream
+    boundaries = sorted({m["offset"] for m in multiboot}
+                      | {i["offset"] for i in images}
+                      | set(fbm) | set(boosters)
+                      | {len(buf)})
+    images.sort(key=lambda i: i["offset"])
+    for image in images:
+        next_boundary = next(b for b in boundaries if b > image["offset"])
+        end = _used_end(buf, image["offset"], next_boundary)
+        image["length"] = end - image["offset"]
+        image["sha256"] = hashlib.sha256(buf[image["offset"]:end]).hexdigest()
+
+    return {
+        "size": len(buf),
+        "sha256": hashlib.sha256(buf).hexdigest(),
+        "multiboot": multiboot,
+        "images": images,
+        "fbm": fbm,
+        "boot_configs": boot_configs,
+        "boosters": boosters,
+    }
+
+
+def inspect_file(filename):
+    """Memory-map `filename` and index it"""
+    with open(filename, "rb") as f:
+        try:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files can't be mapped
+            return index(b'')
+        with buf:
+            return index(buf)
+
+
+def print_report(filename, info, file=None):
+    print("{}: {} bytes, sha256 {}".format(filename, info["size"], info["sha256"]), file=file)
+    for header in info["multiboot"]:
+        print("  0x{:06x}  multiboot   {}".format(header["offset"], ", ".join(
+            "0x{:06x}{}".format(e["boot_address"], " (cold)" if e["cold_boot"] else "")
+            for e in header["entries"])), file=file)
+    for image in info["images"]:
+        extra = ""
+        if "idcode" in image:
+            extra = "  idcode 0x{:08x}".format(image["idcode"])
+        print("  0x{:06x}  {:<10}  {} bytes  sha256 {}{}".format(
+            image["offset"], image["type"], image["length"], image["sha256"], extra), file=file)
+    for offset in info["boosters"]:
+        print("  0x{:06x}  booster".format(offset), file=file)
+    for offset in info["fbm"]:
+        print("  0x{:06x}  fbm signature".format(offset), file=file)
+    for config in info["boot_configs"]:
+        print("  0x{:06x}  boot config 0x{:08x}".format(config["offset"], config["value"]), file=file)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index bitstreams and SPI flash dumps")
+    parser.add_argument("files", nargs="+", help="bitstream, multiboot image, or flash dump")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+
+    results = {}
+    for filename in args.files:
+        results[filename] = inspect_file(filename)
+
+    if args.json:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    else:
+        for filename, info in results.items():
+            print_report(filename, info)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Build a FAT disk image for the Foboot-Main mass storage device.
+
+`foboot-main/src/usb-msc.c` presents a disk made of `BLOCK_COUNT` blocks of
+`BLOCK_SIZE` bytes.  This script lays out a FAT12 (or, for larger disks,
+FAT16) filesystem of that size containing the given files.
+
+The image is written in a single pass: the boot sector, FATs and root
+directory are computed from the file sizes alone, and file contents are then
+copied in chunks straight into place.  Unused areas are skipped with seek(),
+so the output is sparse and no buffer the size of the disk is ever needed.
+
+Each file, as well as the finished image, is reported with its CRC-32.  This
+is the same CRC as `crc32()` in `foboot-main/src/crc32.c`, so the values can
+be checked on the device.
+
+    python3 util/mscimage.py -o disk.img README.TXT firmware.bin
+"""
+
+import argparse
+import os
+import struct
+import sys
+import time
+import zlib
+
+# These match foboot-main/src/usb-msc.c
+BLOCK_SIZE = 512
+DISK_SIZE = 117760
+
+ROOT_ENTRIES = 16
+NUM_FATS = 2
+MEDIA_DESCRIPTOR = 0xf8
+FAT12_MAX_CLUSTERS = 4084
+FAT16_MAX_CLUSTERS = 65524
+COPY_CHUNK = 64 * 1024
+
+
+class MSCImageError(Exception):
+    pass
+
+
+def short_name(filename):
+    """Convert a filename into a space-padded 8.3 directory entry name"""
+    base = os.path.basename(filename).upper()
+    name, _, ext = base.rpartition(".")
+    if not name:
+        name, ext = ext, ""
+    if not name or len(name) > 8 or len(ext) > 3:
+        raise MSCImageError("\"{}\" is not a valid 8.3 filename".format(base))
+    for c in name + ext:
+        if not (c.isalnum() or c in "_-~!#$%&'()@^`{}") or ord(c) > 127:
+            raise MSCImageError("\"{}\" is not a valid 8.3 filename".format(base))
+    return (name.ljust(8) + ext.ljust(3)).encode("ascii")
+
+
+def fat_datetime(timestamp):
+    t = time.localtime(timestamp)
+    year = max(t.tm_year, 1980)
+    date = ((year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+    tod = (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2)
+    return (date, tod)
+
+
+class Layout:
+    """Work out the geometry of a FAT filesystem for a disk of `total_sectors`"""
+    def __init__(self, total_sectors, root_entries=ROOT_ENTRIES):
+        self.total_sectors = total_sectors
+        self.root_entries = root_entries
+        self.reserved_sectors = 1
+        self.root_sectors = (root_entries * 32 + BLOCK_SIZE - 1) // BLOCK_SIZE
+
+        for self.fat_bits, max_clusters in ((12, FAT12_MAX_CLUSTERS), (16, FAT16_MAX_CLUSTERS)):
+            self.sectors_per_cluster = 1
+            while self.sectors_per_cluster <= 128:
+                if self._fit(max_clusters):
+                    return
+                self.sectors_per_cluster *= 2
+        raise MSCImageError("a disk of {} sectors is too large".format(total_sectors))
+
+    def _fit(self, max_clusters):
+        # The FAT size depends on the cluster count, which in turn depends on
+        # the FAT size, so iterate until it settles.
+        self.fat_sectors = 1
+        while True:
+            data_sectors = (self.total_sectors - self.reserved_sectors
+                            - NUM_FATS * self.fat_sectors - self.root_sectors)
+            if data_sectors <= 0:
+                return False
+            self.clusters = data_sectors // self.sectors_per_cluster
+            fat_bytes = ((self.clusters + 2) * self.fat_bits + 7) // 8
+            needed = (fat_bytes + BLOCK_SIZE - 1) // BLOCK_SIZE
+            if needed <= self.fat_sectors:
+                break
+            self.fat_sectors = needed
+        return self.clusters <= max_clusters
+
+    @property
+    def fat_start(self):
+        return self.reserved_sectors * BLOCK_SIZE
+
+    @property
+    def root_start(self):
+        return (self.reserved_sectors + NUM_FATS * self.fat_sectors) * BLOCK_SIZE
+
+    @property
+    def data_start(self):
+        return self.root_start + self.root_sectors * BLOCK_SIZE
+
+    @property
+    def cluster_size(self):
+        return self.sectors_per_cluster * BLOCK_SIZE
+
+    def boot_sector(self, label, volume_id):
+        total16 = self.total_sectors if self.total_sectors < 0x10000 else 0
+        total32 = self.total_sectors if total16 == 0 else 0
+        sector = struct.pack("<3s8sHBHBHHBHHHII",
+            b'\xeb\x3c\x90', b'FOBOOT  ',
+            BLOCK_SIZE, self.sectors_per_cluster, self.reserved_sectors,
+            NUM_FATS, self.root_entries, total16, MEDIA_DESCRIPTOR,
+            self.fat_sectors, 32, 2, 0, total32)
+        sector += struct.pack("<BBBI11s8s",
+            0x80, 0, 0x29, volume_id,
+            label.upper().encode("ascii")[:11].ljust(11),
+            "FAT{}".format(self.fat_bits).encode("ascii").ljust(8))
+        sector = sector.ljust(BLOCK_SIZE - 2, b'\x00') + b'\x55\xaa'
+        return sector
+
+    def fat(self, chains):
+        entries = [0xff00 | MEDIA_DESCRIPTOR, 0xffff] + [0] * self.clusters
+        end_of_chain = (1 << self.fat_bits) - 1
+        for (first, count) in chains:
+            for i in range(count):
+                cluster = first + i
+                entries[cluster] = cluster + 1 if i + 1 < count else end_of_chain
+        mask = (1 << self.fat_bits) - 1
+        if self.fat_bits == 16:
+            data = struct.pack("<{}H".format(len(entries)), *(e & mask for e in entries))
+        else:
+            if len(entries) & 1:
+                entries.append(0)
+            data = bytearray()
+            for i in range(0, len(entries), 2):
+                a = entries[i] & mask
+                b = entries[i + 1] & mask
+                data += bytes([a & 0xff, ((a >> 8) & 0x0f) | ((b & 0x0f) << 4), b >> 4])
+            data = bytes(data)
+        return data.ljust(self.fat_sectors * BLOCK_SIZE, b'\x00')
+
+
+def build(output, filenames, size=DISK_SIZE, label="FOMU", volume_id=None):
+    """Write a FAT image containing `filenames` to `output`.
+
+    Returns a list of `(filename, size, crc32)` tuples, followed by the
+    CRC-32 of the whole image."""
+    if size % BLOCK_SIZE:
+        raise MSCImageError("disk size must be a multiple of {} bytes".format(BLOCK_SIZE))
+    layout = Layout(size // BLOCK_SIZE)
+    if len(filenames) > layout.root_entries:
+        raise MSCImageError("only {} files fit in the root directory".format(layout.root_entries))
+    if volume_id is None:
+        volume_id = int(time.time()) & 0xffffffff
+
+    # Allocate clusters for every file up front, since the FAT and directory
+    # come before any of the file data.
+    files = []
+    names = set()
+    next_cluster = 2
+    for filename in filenames:
+        name = short_name(filename)
+        if name in names:
+            raise MSCImageError("more than one file is called \"{}\"".format(os.path.basename(filename)))
+        names.add(name)
+        st = os.stat(filename)
+        count = (st.st_size + layout.cluster_size - 1) // layout.cluster_size
+        first = next_cluster if count else 0
+        next_cluster += count
+        files.append((filename, name, st, first, count))
+    if next_cluster - 2 > layout.clusters:
+        raise MSCImageError("files need {} clusters, but the disk only has {}"
+                            .format(next_cluster - 2, layout.clusters))
+
+    directory = bytearray()
+    for (_, name, st, first, _) in files:
+        (date, tod) = fat_datetime(st.st_mtime)
+        directory += struct.pack("<11sBBBHHHHHHHI", name, 0x20, 0, 0, tod, date, date,
+                                 0, tod, date, first, st.st_size)
+
+    image_crc = 0
+    results = []
+    def emit(f, offset, data):
+        f.seek(offset)
+        f.write(data)
+
+    with open(output, "wb") as f:
+        emit(f, 0, layout.boot_sector(label, volume_id))
+        fat = layout.fat((first, count) for (_, _, _, first, count) in files if count)
+        for i in range(NUM_FATS):
+            emit(f, layout.fat_start + i * len(fat), fat)
+        emit(f, layout.root_start, bytes(directory))
+
+        for (filename, name, st, first, count) in files:
+            crc = 0
+            f.seek(layout.data_start + (first - 2) * layout.cluster_size)
+            with open(filename, "rb") as inp:
+                while True:
+                    chunk = inp.read(COPY_CHUNK)
+                    if not chunk:
+                        break
+                    crc = zlib.crc32(chunk, crc)
+                    f.write(chunk)
+            results.append((filename, st.st_size, crc))
+
+        # Leave the rest of the disk as a hole, but make sure the file is
+        # the full size of the disk.
+        f.truncate(size)
+
+    # Compute the CRC of the finished image by reading it back in chunks,
+    # which keeps memory use independent of the disk size.
+    with open(output, "rb") as f:
+        while True:
+            chunk = f.read(COPY_CHUNK)
+            if not chunk:
+                break
+            image_crc = zlib.crc32(chunk, image_crc)
+    return results, image_crc
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a FAT disk image for the Foboot-Main mass storage device")
+    parser.add_argument("files", nargs="*", help="files to place in the root directory (8.3 names)")
+    parser.add_argument("-o", "--output", required=True, help="disk image to write")
+    parser.add_argument("--size", type=lambda x: int(x, 0), default=DISK_SIZE,
+                        help="disk size in bytes (default: {}, as in usb-msc.c)".format(DISK_SIZE))
+    parser.add_argument("--label", default="FOMU", help="volume label")
+    args = parser.parse_args()
+
+    try:
+        (results, image_crc) = build(args.output, args.files, size=args.size, label=args.label)
+    except MSCImageError as e:
+        print("Error: {}".format(e), file=sys.stderr)
+        return 1
+
+    for (filename, size, crc) in results:
+        print("{:<32} {:>10} bytes  crc32 0x{:08x}".format(filename, size, crc))
+    print("Disk image written to \"{}\".  crc32 0x{:08x}".format(args.output, image_crc))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
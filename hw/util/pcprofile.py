@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Profile firmware using the PC sampler.
+
+The SoC must have been built with `--with-pc-sampler --with-debug=...`, and
+`litex_server` (or `wishbone-tool --server wishbone`) must be connected to
+the debug bridge.  This starts the sampler, drains its ring buffer for the
+requested time, and matches each sample against the symbols in one or more
+ELF files.
+
+The output is in the folded format that `flamegraph.pl` reads, with one
+line per function and the number of samples that landed in it:
+
+    python3 util/pcprofile.py --elf build/software/bios/bios.elf \\
+        --duration 10 > profile.folded
+    flamegraph.pl profile.folded > profile.svg
+
+Samples that fall outside every symbol are reported by address.
+"""
+
+import argparse
+import bisect
+import collections
+import subprocess
+import sys
+import time
+
+from litex import RemoteClient
+
+
+class Symbols:
+    """Function lookup by address, from the output of `nm`"""
+    def __init__(self, nm="riscv64-unknown-elf-nm"):
+        self.nm = nm
+        self.addrs = []
+        self.names = []
+
+    def load(self, elf):
+        output = subprocess.run([self.nm, "-n", "--defined-only", elf],
+                                check=True, stdout=subprocess.PIPE).stdout.decode("utf-8")
+        symbols = list(zip(self.addrs, self.names))
+        for line in output.splitlines():
+            fields = line.split()
+            if len(fields) != 3 or fields[1] not in "tTwW":
+                continue
+            symbols.append((int(fields[0], 16), fields[2]))
+        symbols.sort()
+        self.addrs = [addr for (addr, _) in symbols]
+        self.names = [name for (_, name) in symbols]
+
+    def lookup(self, pc):
+        index = bisect.bisect_right(self.addrs, pc) - 1
+        if index < 0:
+            return None
+        return self.names[index]
+
+
+def sample(wb, duration, period, interval=0.05):
+    """Run the sampler for `duration` seconds and return the PCs it took,
+    along with the number of samples that were overwritten before they
+    could be read."""
+    base = wb.mems.pcsampler.base
+    depth = wb.mems.pcsampler.size // 4
+
+    wb.regs.pcsampler_period.write(period)
+    wb.regs.pcsampler_ctrl.write(2)  # reset
+    wb.regs.pcsampler_ctrl.write(1)  # enable
+
+    pcs = []
+    lost = 0
+    read = 0
+    end = time.time() + duration
+    while True:
+        done = time.time() >= end
+        if done:
+            wb.regs.pcsampler_ctrl.write(0)
+        taken = wb.regs.pcsampler_samples.read()
+        if taken - read > depth:
+            lost += taken - read - depth
+            read = taken - depth
+        while read < taken:
+            start = read % depth
+            count = min(taken - read, depth - start)
+            pcs += wb.read(base + 4*start, count)
+            read += count
+        if done:
+            return (pcs, lost)
+        time.sleep(interval)
+
+
+def fold(pcs, symbols):
+    """Count samples per function, for flamegraph.pl"""
+    counts = collections.Counter()
+    for pc in pcs:
+        name = symbols.lookup(pc)
+        if name is None:
+            name = "0x{:08x}".format(pc)
+        counts[name] += 1
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sample the CPU program counter and fold the result for flamegraph.pl")
+    parser.add_argument("--elf", action="append", default=[], help="ELF file to take symbols from (can be repeated)")
+    parser.add_argument("--nm", default="riscv64-unknown-elf-nm", help="nm program that understands the ELF files")
+    parser.add_argument("--csr-csv", default="build/csr.csv", help="csr.csv from the build")
+    parser.add_argument("--host", default="localhost", help="litex_server host")
+    parser.add_argument("--port", type=int, default=1234, help="litex_server port")
+    parser.add_argument("--duration", type=float, default=5, help="seconds to sample for")
+    parser.add_argument("--period", type=int, default=1000, help="clocks between samples")
+    parser.add_argument("--output", help="file to write folded samples to, instead of stdout")
+    args = parser.parse_args()
+
+    symbols = Symbols(args.nm)
+    for elf in args.elf:
+        symbols.load(elf)
+
+    wb = RemoteClient(host=args.host, port=args.port, csr_csv=args.csr_csv)
+    wb.open()
+    try:
+        (pcs, lost) = sample(wb, args.duration, args.period)
+    finally:
+        wb.close()
+
+    print("{} samples, {} lost".format(len(pcs), lost), file=sys.stderr)
+    out = open(args.output, "w") if args.output else sys.stdout
+    for (name, count) in fold(pcs, symbols).most_common():
+        out.write("{} {}\n".format(name, count))
+    if args.output:
+        out.close()
+
+
+if __name__ == "__main__":
+    main()
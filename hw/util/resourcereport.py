@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""Summarise the FPGA resources used by a build, from its yosys log.
+
+The final `stat` that synth_ice40 and synth_ecp5 print lists every cell
+type in the flattened design.  These are grouped into LUTs, flip-flops,
+block RAM, SPRAM and DSP blocks for both iCE40 and ECP5.
+
+Run directly on a log to print a summary:
+
+    python3 util/resourcereport.py build/gateware/top.rpt
+"""
+
+import json
+import re
+import sys
+
+# Cell types counted under each heading.  Flip-flops come in many flavours,
+# so they are matched by prefix.
+RESOURCES = [
+    ("LUT",   ["SB_LUT4", "LUT4"], []),
+    ("FF",    ["TRELLIS_FF"], ["SB_DFF"]),
+    ("BRAM",  ["SB_RAM40_4K", "DP16KD"], []),
+    ("SPRAM", ["SB_SPRAM256KA"], []),
+    ("DSP",   ["SB_MAC16", "MULT18X18D", "ALU54B"], []),
+]
+
+def read_cells(filename):
+    """Return a dict of cell type to count from the last `stat` in a yosys log."""
+    cells = {}
+    in_cells = False
+    with open(filename, "r") as f:
+        for line in f:
+            if "Number of cells:" in line:
+                cells = {}
+                in_cells = True
+                continue
+            if in_cells:
+                m = re.match(r"^\s+(\S+)\s+(\d+)\s*$", line)
+                if m is None:
+                    in_cells = False
+                    continue
+                cells[m.group(1)] = int(m.group(2))
+    return cells
+
+def summarise(cells):
+    """Group cell counts into the headings in `RESOURCES`."""
+    summary = {}
+    for (name, types, prefixes) in RESOURCES:
+        summary[name] = sum(count for (cell, count) in cells.items()
+                            if cell in types or any(cell.startswith(p) for p in prefixes))
+    return summary
+
+def format_summary(summary, title=None):
+    lines = []
+    if title is not None:
+        lines.append(title)
+    for (name, _, _) in RESOURCES:
+        lines.append("    {:6} {:6}".format(name, summary[name]))
+    return "\n".join(lines)
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: {} yosys-log [summary.json]".format(sys.argv[0]))
+        sys.exit(1)
+    summary = summarise(read_cells(sys.argv[1]))
+    print(format_summary(summary, sys.argv[1]))
+    if len(sys.argv) > 2:
+        with open(sys.argv[2], "w") as f:
+            json.dump(summary, f, indent=4)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Read and decode the USB transaction log.
+
+The SoC must have been built with `--with-usb-logger`.  With `litex_server`
+(or `wishbone-tool --server wishbone`) connected to a debug bridge, this
+reads the log out of the device.  It can also decode a log that was saved
+earlier with `--save`:
+
+    python3 util/usblog.py --save dfu.log --dump
+    python3 util/usblog.py --load dfu.log
+
+It reports how long enumeration took, the latency of each kind of control
+request, and how DFU downloads spent their time.  Timestamps count the
+12 MHz USB clock, so each is 83.3 ns.
+"""
+
+import argparse
+import collections
+import struct
+
+USB_CLOCK = 12e6
+
+PID_OUT = 0x1
+PID_IN = 0x9
+PID_SETUP = 0xd
+PID_NAMES = {PID_OUT: "OUT", PID_IN: "IN", PID_SETUP: "SETUP"}
+
+HANDSHAKE_ACK = 0
+HANDSHAKE_NAK = 1
+HANDSHAKE_STALL = 2
+HANDSHAKE_NAMES = ["ACK", "NAK", "STALL", "-"]
+
+SET_CONFIGURATION = 9
+DFU_DNLOAD = 1
+DFU_GETSTATUS = 3
+REQUEST_NAMES = {
+    0: "GET_STATUS", 1: "CLEAR_FEATURE/DFU_DNLOAD", 3: "SET_FEATURE/DFU_GETSTATUS",
+    5: "SET_ADDRESS", 6: "GET_DESCRIPTOR", 8: "GET_CONFIGURATION",
+    9: "SET_CONFIGURATION", 10: "GET_INTERFACE", 11: "SET_INTERFACE",
+}
+
+Entry = collections.namedtuple("Entry", ["time", "pid", "endp", "handshake", "length", "byte"])
+
+
+def decode(words):
+    """Turn pairs of words into entries, with timestamps made monotonic"""
+    entries = []
+    offset = 0
+    last = 0
+    for i in range(0, len(words) - 1, 2):
+        (stamp, info) = (words[i], words[i + 1])
+        if stamp < last:
+            offset += 1 << 32
+        last = stamp
+        entries.append(Entry(
+            time=stamp + offset,
+            pid=info & 0xf,
+            endp=(info >> 4) & 0xf,
+            handshake=(info >> 8) & 0x3,
+            length=(info >> 10) & 0x7ff,
+            byte=(info >> 24) & 0xff,
+        ))
+    return entries
+
+
+def read_device(wb):
+    """Read the log in order, oldest first, from a live device"""
+    base = wb.mems.usblogger.base
+    depth = wb.mems.usblogger.size // 8
+    count = wb.regs.usblogger_count.read()
+    if count <= depth:
+        return wb.read(base, 2*count) if count else []
+    # The log has wrapped, so the oldest entry is the next one to be written
+    first = count % depth
+    words = wb.read(base + 8*first, 2*(depth - first))
+    if first:
+        words += wb.read(base, 2*first)
+    return words
+
+
+def control_transfers(entries):
+    """Group endpoint 0 transactions into control transfers.  Each transfer
+    starts with an acknowledged SETUP and runs until the next one."""
+    transfers = []
+    current = None
+    for entry in entries:
+        if entry.endp != 0:
+            continue
+        if entry.pid == PID_SETUP and entry.handshake == HANDSHAKE_ACK:
+            current = {"request": entry.byte, "start": entry.time, "end": entry.time,
+                       "naks": 0, "bytes": 0}
+            transfers.append(current)
+        elif current is not None:
+            if entry.handshake == HANDSHAKE_NAK:
+                current["naks"] += 1
+            elif entry.handshake == HANDSHAKE_ACK:
+                current["end"] = entry.time
+                # The logger leaves the CRC16 out of received lengths
+                if entry.pid == PID_OUT:
+                    current["bytes"] += entry.length
+    return transfers
+
+
+def ms(clocks):
+    return clocks * 1000 / USB_CLOCK
+
+
+def report(entries):
+    if not entries:
+        print("No transactions logged")
+        return
+    transfers = control_transfers(entries)
+
+    print("{} transactions over {:.3f} ms".format(len(entries), ms(entries[-1].time - entries[0].time)))
+
+    configured = [t for t in transfers if t["request"] == SET_CONFIGURATION]
+    if transfers and configured:
+        print("Enumeration: {:.3f} ms from the first SETUP to SET_CONFIGURATION completing".format(
+            ms(configured[0]["end"] - transfers[0]["start"])))
+
+    print("\nControl requests:")
+    print("    {:28} {:>6} {:>10} {:>10} {:>6}".format("bRequest", "count", "mean ms", "max ms", "NAKs"))
+    by_request = collections.defaultdict(list)
+    for t in transfers:
+        by_request[t["request"]].append(t)
+    for request, ts in sorted(by_request.items()):
+        latencies = [ms(t["end"] - t["start"]) for t in ts]
+        print("    {:28} {:6} {:10.3f} {:10.3f} {:6}".format(
+            REQUEST_NAMES.get(request, str(request)), len(ts),
+            sum(latencies) / len(latencies), max(latencies), sum(t["naks"] for t in ts)))
+
+    # During a DFU download, time goes to three places: the host moving data
+    # in DNLOAD, the device NAKing while it works, and gaps where the host
+    # hasn't asked for anything yet.
+    dnloads = [i for (i, t) in enumerate(transfers) if t["request"] == DFU_DNLOAD]
+    if dnloads:
+        dfu = transfers[dnloads[0]:dnloads[-1] + 2]
+        start = dfu[0]["start"]
+        end = dfu[-1]["end"]
+        total = sum(t["bytes"] for t in dfu if t["request"] == DFU_DNLOAD)
+        in_transfers = sum(t["end"] - t["start"] for t in dfu)
+        polls = [t for t in dfu if t["request"] == DFU_GETSTATUS]
+        print("\nDFU download: {} bytes in {:.3f} ms, {:.1f} kB/s".format(
+            total, ms(end - start), total / 1024 / max(ms(end - start) / 1000, 1e-9)))
+        print("    In control transfers:   {:10.3f} ms".format(ms(in_transfers)))
+        print("    Between transfers:      {:10.3f} ms".format(ms(end - start - in_transfers)))
+        print("    GETSTATUS polls:        {:10}".format(len(polls)))
+        print("    NAKs from the device:   {:10}".format(sum(t["naks"] for t in dfu)))
+
+
+def dump(entries):
+    first = entries[0].time if entries else 0
+    for e in entries:
+        print("{:12.3f} ms  {:5} ep{:<2} {:5} {:4} bytes  {:02x}".format(
+            ms(e.time - first), PID_NAMES.get(e.pid, hex(e.pid)), e.endp,
+            HANDSHAKE_NAMES[e.handshake], e.length, e.byte))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Read and decode the USB transaction log")
+    parser.add_argument("--load", help="decode a log saved with --save instead of reading the device")
+    parser.add_argument("--save", help="save the raw log to this file")
+    parser.add_argument("--dump", action="store_true", help="print every transaction")
+    parser.add_argument("--csr-csv", default="build/csr.csv", help="csr.csv from the build")
+    parser.add_argument("--host", default="localhost", help="litex_server host")
+    parser.add_argument("--port", type=int, default=1234, help="litex_server port")
+    args = parser.parse_args()
+
+    if args.load:
+        with open(args.load, "rb") as f:
+            data = f.read()
+        words = list(struct.unpack("<{}I".format(len(data) // 4), data))
+    else:
+        from litex import RemoteClient
+        wb = RemoteClient(host=args.host, port=args.port, csr_csv=args.csr_csv)
+        wb.open()
+        try:
+            words = read_device(wb)
+        finally:
+            wb.close()
+
+    if args.save:
+        with open(args.save, "wb") as f:
+            f.write(struct.pack("<{}I".format(len(words)), *words))
+
+    entries = decode(words)
+    if args.dump:
+        dump(entries)
+    report(entries)
+
+
+if __name__ == "__main__":
+    main()
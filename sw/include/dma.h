@@ -0,0 +1,8 @@
+#ifndef _DMA_H_
+#define _DMA_H_
+
+#include <stdint.h>
+
+void dma_copy(void *dst, const void *src, uint32_t length);
+
+#endif /* _DMA_H_ */
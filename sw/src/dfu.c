@@ -25,6 +25,7 @@
 #include <string.h>
 
 #include <dfu.h>
+#include <dma.h>
 #include <rgb.h>
 #include <generated/mem.h>
 #include <generated/soc.h>
@@ -131,7 +132,7 @@ static void ftfl_write_more_bytes(void)
     if (dfu_bytes_remaining < bytes_to_write)
         bytes_to_write = dfu_bytes_remaining;
     if (ram_mode) {
-        memcpy((void *)dfu_target_address, &dfu_buffer[dfu_buffer_offset/4], bytes_to_write);
+        dma_copy((void *)dfu_target_address, &dfu_buffer[dfu_buffer_offset/4], bytes_to_write);
     }
     else {
         ftfl_busy_wait();
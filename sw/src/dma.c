@@ -0,0 +1,25 @@
+#include <string.h>
+#include <dma.h>
+#include <generated/csr.h>
+
+// Copy `length` bytes from `src` to `dst`, using the DMA engine if the
+// gateware has one.  The engine only moves whole words, so any unaligned
+// copy, as well as the tail of an aligned one, is done with memcpy().
+void dma_copy(void *dst, const void *src, uint32_t length)
+{
+#if defined(CSR_DMA_BASE)
+    uint32_t words = length & ~3;
+    if (words && !(((uint32_t)dst | (uint32_t)src) & 3)) {
+        dma_src_write((uint32_t)src);
+        dma_dst_write((uint32_t)dst);
+        dma_length_write(words);
+        dma_ctrl_write(1);
+        while (dma_status_read() & 1)
+            ;
+        dst = (uint8_t *)dst + words;
+        src = (const uint8_t *)src + words;
+        length -= words;
+    }
+#endif
+    memcpy(dst, src, length);
+}
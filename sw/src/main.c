@@ -116,7 +116,10 @@ static int nerve_pinch(void) {
 #endif
 
 static int button_pressed(void){
-#ifdef CSR_BUTTON_BASE
+#if defined(CSR_BUTTON_STATE_ADDR)
+    // Debounced in hardware, and valid straight out of reset
+    return button_state_read() & 1;
+#elif defined(CSR_BUTTON_BASE)
     return button_i_read() != 1;
 #else
     return 1;
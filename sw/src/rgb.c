@@ -48,12 +48,14 @@ void rgb_init(void) {
     // Turn on the RGB block and current enable, as well as enabling led control
     rgb_ctrl_write((1 << 0) | (1 << 1) | (1 << 2));
 
+    // Set clock register to sys clock / 64 kHz - 1.  At more than 16 MHz this
+    // needs the two extra prescaler bits at the bottom of LEDDCR0.
+    uint32_t prescale = (CONFIG_CLOCK_FREQUENCY/64000)-1;
+
     // Enable the LED driver, and set 250 Hz mode.
     // Also set quick stop, which we'll use to switch patterns quickly.
-    rgb_write((1 << 7) | (1 << 6) | (1 << 3), LEDDCR0);
-
-    // Set clock register to 12 MHz / 64 kHz - 1
-    rgb_write((12000000/64000)-1, LEDDBR);
+    rgb_write((1 << 7) | (1 << 6) | (1 << 3) | ((prescale >> 8) & 3), LEDDCR0);
+    rgb_write(prescale & 0xff, LEDDBR);
 
     rgb_mode_idle();
 }
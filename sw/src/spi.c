@@ -19,6 +19,33 @@ enum pin {
 	PIN_MISO = 4, // Value is ignored
 };
 
+#ifdef CSR_SPI_PROGRAMMER_BASE
+// Bits of the spi_programmer CTRL register
+enum spi_programmer_ctrl {
+	SPI_PROGRAMMER_START = (1 << 0),
+	SPI_PROGRAMMER_WREN = (1 << 1),
+	SPI_PROGRAMMER_ADDR = (1 << 2),
+	SPI_PROGRAMMER_DATA = (1 << 3),
+	SPI_PROGRAMMER_POLL = (1 << 4),
+};
+
+// Have the hardware send `cmd`, followed by `addr` and `count` bytes of
+// `data`, then wait for the flash to finish.  spiIsBusy() returns 1 until
+// the whole thing is done.
+static void spi_programmer_start(uint8_t cmd, uint32_t addr, const void *data, unsigned int count) {
+	uint32_t ctrl = SPI_PROGRAMMER_START | SPI_PROGRAMMER_WREN | SPI_PROGRAMMER_ADDR | SPI_PROGRAMMER_POLL;
+
+	spi_programmer_cmd_write(cmd);
+	spi_programmer_addr_write(addr);
+	if (count) {
+		spi_programmer_src_write((uint32_t)data);
+		spi_programmer_length_write(count);
+		ctrl |= SPI_PROGRAMMER_DATA;
+	}
+	spi_programmer_ctrl_write(ctrl);
+}
+#endif
+
 void spiBegin(void) {
 	lxspi_bitbang_write((0 << PIN_CLK) | (0 << PIN_CS));
 }
@@ -69,7 +96,13 @@ static uint8_t spi_read_status(void) {
 }
 
 int spiIsBusy(void) {
+#ifdef CSR_SPI_PROGRAMMER_BASE
+	// The programmer polls the status register itself, and owns the
+	// bit-bang port while it does so.
+	return spi_programmer_status_read() & 1;
+#else
   	return spi_read_status() & (1 << 0);
+#endif
 }
 
 __attribute__((used))
@@ -99,6 +132,9 @@ uint32_t spiId(void) {
 }
 
 int spiBeginErase4(uint32_t erase_addr) {
+#ifdef CSR_SPI_PROGRAMMER_BASE
+	spi_programmer_start(0x20, erase_addr, NULL, 0);
+#else
 	// Enable Write-Enable Latch (WEL)
 	spiBegin();
 	spi_single_tx(0x06);
@@ -110,6 +146,7 @@ int spiBeginErase4(uint32_t erase_addr) {
 	spi_single_tx(erase_addr >> 8);
 	spi_single_tx(erase_addr >> 0);
 	spiEnd();
+#endif
 	return 0;
 }
 
@@ -146,6 +183,10 @@ int spiBeginErase64(uint32_t erase_addr) {
 int spiBeginWrite(uint32_t addr, const void *v_data, unsigned int count) {
 	const uint8_t write_cmd = 0x02;
 	const uint8_t *data = v_data;
+
+#ifdef CSR_SPI_PROGRAMMER_BASE
+	spi_programmer_start(write_cmd, addr, data, (count < 256) ? count : 256);
+#else
 	unsigned int i;
 
 	// Enable Write-Enable Latch (WEL)
@@ -161,6 +202,7 @@ int spiBeginWrite(uint32_t addr, const void *v_data, unsigned int count) {
 	for (i = 0; (i < count) && (i < 256); i++)
 		spi_single_tx(*data++);
 	spiEnd();
+#endif
 
 	return 0;
 }